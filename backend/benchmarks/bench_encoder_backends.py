@@ -0,0 +1,90 @@
+"""
+Encoder backend parity + latency/throughput benchmark.
+
+Encodes real job descriptions from data/*.csv (or synthetic text when there are
+none) with every requested backend and reports, against full-precision torch:
+  - parity: min / mean cosine similarity per text (fails below --min-cosine)
+  - single-text latency p50/p95 (the get_embeddings request path)
+  - batched throughput in texts/s (the corpus embedding path)
+
+Run from backend/:
+    python -m benchmarks.bench_encoder_backends --backends torch torch:int8 onnx onnx:int8
+Exits non-zero when any backend misses the parity threshold.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from services.embedding_store import l2_normalize
+from services.encoder_backends import load_encoder, parse_backend_spec
+from services.job_corpus import DATA_DIR, load_jobs
+
+HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _sample_texts(n: int, folder_path: str):
+    jobs, _, _ = load_jobs(folder_path)
+    if not jobs.empty:
+        texts = [t for t in jobs.descriptions if t.strip() and t != "nan"]
+        if texts:
+            return (texts * (n // len(texts) + 1))[:n]
+    rng = np.random.default_rng(0)
+    words = "python data model pipeline team api cloud sql react testing deploy analytics".split()
+    return [" ".join(rng.choice(words, size=rng.integers(20, 400))) for _ in range(n)]
+
+
+def _percentile_ms(samples, q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch:int8", "onnx", "onnx:int8"])
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--texts", type=int, default=256, help="texts for parity and throughput")
+    parser.add_argument("--single", type=int, default=50, help="single-text calls for latency")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    texts = _sample_texts(args.texts, args.data_dir)
+    reference = l2_normalize(load_encoder(HF_MODEL_NAME, "torch", "none", args.threads).encode(texts))
+
+    print(
+        f"{'backend':>12} {'min cos':>8} {'mean cos':>9} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>9}"
+    )
+    failed = []
+    for spec in args.backends:
+        backend, quantize = parse_backend_spec(spec)
+        encoder = load_encoder(HF_MODEL_NAME, backend, quantize, args.threads)
+
+        start = time.perf_counter()
+        embeddings = l2_normalize(encoder.encode(texts))
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        cosines = np.sum(embeddings * reference, axis=1)
+        if cosines.min() < args.min_cosine:
+            failed.append(spec)
+
+        encoder.encode(texts[:1])  # warm up
+        latencies = []
+        for text in texts[: args.single]:
+            start = time.perf_counter()
+            encoder.encode([text])
+            latencies.append(time.perf_counter() - start)
+
+        print(
+            f"{encoder.label:>12} {cosines.min():>8.4f} {cosines.mean():>9.4f} "
+            f"{_percentile_ms(latencies, 50):>8.2f} {_percentile_ms(latencies, 95):>8.2f} {throughput:>9.1f}"
+        )
+
+    if failed:
+        print(f"Parity below {args.min_cosine} for: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"✓ All backends within cosine {args.min_cosine} of torch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark: per-request job matching latency vs. corpus size.
+
+Compares the old path (np.array + sklearn cosine_similarity + full argsort)
+with ScoringKernel.top_k and the batched ScoringKernel.top_k_batch.
+
+Run from backend/:  python -m benchmarks.bench_matching_kernel --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.matching_kernel import ScoringKernel
+
+
+def _time_ms(fn, repeats: int) -> float:
+    """Median wall time of fn() in milliseconds."""
+    fn()  # warm up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=64, help="users per batched call")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        from sklearn.metrics.pairwise import cosine_similarity
+    except ImportError:
+        cosine_similarity = None
+
+    rng = np.random.default_rng(0)
+    print(f"{'jobs':>10} {'legacy ms':>10} {'kernel ms':>10} {'batch ms/user':>14}")
+    for n in args.sizes:
+        jobs = rng.standard_normal((n, args.dim), dtype=np.float32)
+        job_list = jobs.tolist() if cosine_similarity is not None and n <= 100_000 else None
+        user = rng.standard_normal(args.dim, dtype=np.float32)
+        users = rng.standard_normal((args.batch, args.dim), dtype=np.float32)
+        kernel = ScoringKernel(jobs)
+
+        def legacy():
+            sims = cosine_similarity(np.array(user).reshape(1, -1), np.array(job_list))[0]
+            return np.argsort(sims)[-args.top_n:][::-1]
+
+        legacy_ms = _time_ms(legacy, max(1, args.repeats // 4)) if job_list is not None else float("nan")
+        kernel_ms = _time_ms(lambda: kernel.top_k(user, args.top_n), args.repeats)
+        batch_ms = _time_ms(lambda: kernel.top_k_batch(users, args.top_n), args.repeats) / args.batch
+        print(f"{n:>10} {legacy_ms:>10.2f} {kernel_ms:>10.2f} {batch_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Recall@k and tail latency of the IVF-PQ index vs. the exact scan.
+
+Sweeps nprobe for each corpus size so the recall/latency trade-off can be
+tuned (VECTOR_INDEX_NPROBE / VECTOR_INDEX_REFINE) before deploying.
+
+Run from backend/:  python -m benchmarks.bench_vector_index --sizes 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.embedding_store import l2_normalize
+from services.vector_index import ExactIndex, IVFPQIndex, measure_recall
+
+
+def _synthetic_corpus(n: int, dim: int, rng) -> np.ndarray:
+    """Clustered vectors; uniform noise would make every ANN look bad."""
+    centers = rng.standard_normal((max(8, n // 500), dim), dtype=np.float32)
+    x = centers[rng.integers(0, len(centers), n)]
+    x += 0.5 * rng.standard_normal((n, dim), dtype=np.float32)
+    return l2_normalize(x)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 200_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'jobs':>9} {'nprobe':>6} {'recall':>7} {'ann p99 ms':>11} {'exact p99 ms':>13}")
+    for n in args.sizes:
+        corpus = _synthetic_corpus(n, args.dim, rng)
+        picks = corpus[rng.choice(n, args.queries, replace=False)]
+        queries = picks + rng.normal(scale=0.05, size=picks.shape).astype(np.float32)
+
+        exact = ExactIndex(corpus, normalized=True)
+        _, exact_p99 = measure_recall(exact, exact, queries, args.top_n)
+
+        start = time.perf_counter()
+        index = IVFPQIndex(refine_matrix=corpus).build(corpus)
+        print(f"  built in {time.perf_counter() - start:.1f}s")
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            recall, p99 = measure_recall(index, exact, queries, args.top_n)
+            print(f"{n:>9} {nprobe:>6} {recall:>7.3f} {p99:>11.2f} {exact_p99:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Deterministic local stand-in for the OpenAI chat completions API.
+
+Recognizes every prompt the backend sends (question generation, profile,
+job enrichment) and answers with well-formed, plausible output derived from a
+hash of the prompt, so identical prompts always get identical answers.
+Latency is configurable: a base delay (time to first token) plus a per-token
+delay, both with jitter. Streaming (stream=true, include_usage) and usage
+token counts follow the real API's shapes, and --error-rate injects 429s.
+
+Run from backend/:
+    python -m benchmarks.fake_openai --port 8900 --latency-ms 800 --ms-per-token 5
+then start the API with OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOPICS = ["Python", "SQL", "React", "Docker", "Pandas", "Machine Learning", "REST APIs", "Git", "AWS", "TypeScript"]
+KNOWLEDGE = ["Algorithms", "Data Structures", "Machine Learning", "Web Development", "Database Systems", "Cloud Computing"]
+SOFT_SKILLS = ["Communication", "Teamwork", "Problem Solving", "Ownership"]
+WORDS = (
+    "design build deploy maintain scalable services data pipelines models dashboards tests "
+    "reviews stakeholders requirements performance reliability documentation features"
+).split()
+
+app = FastAPI(title="Fake OpenAI")
+config = {"latency_ms": 500.0, "jitter": 0.2, "ms_per_token": 0.0, "error_rate": 0.0, "seed": 0}
+
+
+# -----------------------------
+# Deterministic content
+# -----------------------------
+def _rng(prompt: str) -> random.Random:
+    digest = hashlib.sha256(f"{config['seed']}\n{prompt}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _mcq(rng: random.Random, n: int, difficulty: str, category: str) -> dict:
+    options = [f"Option {c} for question {n}" for c in "ABCD"]
+    question = f"Question {n}: {_sentence(rng, 10)}"
+    if category == "Coding":
+        question = f"```python\nvalues = [{rng.randint(1, 9)}, {rng.randint(1, 9)}]\nprint(sum(values))\n```\n{question}"
+    return {
+        "question": question,
+        "options": options,
+        "answer": rng.choice(options),
+        "difficulty": difficulty,
+        "category": category,
+    }
+
+
+def _difficulties(counts: dict) -> list:
+    return [level for level, count in counts.items() for _ in range(count)]
+
+
+def _single_shot(rng: random.Random) -> str:
+    coding = _difficulties({"Easy": 1, "Medium": 1, "Hard": 3})
+    non_coding = _difficulties({"Easy": 1, "Medium": 3, "Hard": 6})
+    questions = [_mcq(rng, i, d, "Coding") for i, d in enumerate(coding)]
+    questions += [_mcq(rng, len(coding) + i, d, "Non-coding") for i, d in enumerate(non_coding)]
+    return json.dumps(
+        {"topics": ", ".join(rng.sample(TOPICS, 4)), "primary_language": "Python", "questions": questions}
+    )
+
+
+def _question_list(rng: random.Random, category: str, difficulties: list) -> str:
+    return json.dumps(
+        [{"question": _sentence(rng, 10), "difficulty": d, "category": category} for d in difficulties]
+    )
+
+
+def _convert(rng: random.Random, prompt: str) -> str:
+    category = "Coding" if "following coding questions" in prompt else "Non-coding"
+    match = re.search(r"MCQs\):\s*(\[.*?\])\s*Rules:", prompt, re.S)
+    try:
+        items = json.loads(match.group(1)) if match else []
+    except json.JSONDecodeError:
+        items = []
+    difficulties = [i.get("difficulty", "Medium") if isinstance(i, dict) else "Medium" for i in items]
+    difficulties = difficulties or ["Medium"] * 5
+    return json.dumps([_mcq(rng, n, d, category) for n, d in enumerate(difficulties)])
+
+
+def complete(prompt: str, body: dict) -> str:
+    """The canned answer for one prompt."""
+    rng = _rng(prompt)
+    schema = (body.get("response_format") or {}).get("json_schema") or {}
+    if schema.get("name") == "follow_up_questions":
+        return _single_shot(rng)
+    if "Extract all **coding-related**" in prompt:
+        return ", ".join(rng.sample(TOPICS, 4))
+    if "primary **programming language**" in prompt:
+        return "Python"
+    if "coding problems based on" in prompt:
+        return _question_list(rng, "Coding", _difficulties({"Easy": 1, "Medium": 1, "Hard": 3}))
+    if "non-coding conceptual questions based on" in prompt:
+        return _question_list(rng, "Non-coding", _difficulties({"Easy": 1, "Medium": 3, "Hard": 6}))
+    if "into JSON multiple-choice questions" in prompt:
+        return _convert(rng, prompt)
+    if "EXTRACT ALL REQUIRED SKILLS" in prompt:
+        return ", ".join(rng.sample(TOPICS, 5) + rng.sample(SOFT_SKILLS, 2))
+    if "EXTRACT ALL REQUIRED KNOWLEDGE AREAS" in prompt:
+        return ", ".join(rng.sample(KNOWLEDGE, 4))
+    if "clear, comprehensive job description" in prompt:
+        return " ".join(_sentence(rng) for _ in range(4))
+    # Profile and anything else: one descriptive paragraph
+    return "; ".join(_sentence(rng, 8) for _ in range(6))
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# -----------------------------
+# API
+# -----------------------------
+async def _sleep_ms(ms: float) -> None:
+    jitter = config["jitter"]
+    await asyncio.sleep(max(0.0, ms * random.uniform(1 - jitter, 1 + jitter)) / 1000)
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if config["error_rate"] and random.random() < config["error_rate"]:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (injected)", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"retry-after": "1"},
+        )
+
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []) if m.get("role") == "user")
+    text = complete(prompt, body)
+    usage = {
+        "prompt_tokens": _tokens(prompt),
+        "completion_tokens": _tokens(text),
+        "total_tokens": _tokens(prompt) + _tokens(text),
+    }
+    base = {
+        "id": f"chatcmpl-{hashlib.md5(prompt.encode()).hexdigest()[:12]}",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+    }
+
+    if not body.get("stream"):
+        await _sleep_ms(config["latency_ms"] + config["ms_per_token"] * usage["completion_tokens"])
+        return {
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def events():
+        await _sleep_ms(config["latency_ms"])
+        chunk = {**base, "object": "chat.completion.chunk"}
+        for start in range(0, len(text), 16):
+            piece = text[start : start + 16]
+            await _sleep_ms(config["ms_per_token"] * _tokens(piece))
+            delta = {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+            yield f"data: {json.dumps({**chunk, 'choices': [delta]})}\n\n"
+        yield f"data: {json.dumps({**chunk, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+        if include_usage:
+            yield f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="base latency / time to first token")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="added per completion token")
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform +/- fraction applied to each delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    config.update(
+        latency_ms=args.latency_ms,
+        ms_per_token=args.ms_per_token,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+End-to-end load test of the assessment flow, fully offline.
+
+Each virtual user walks a scenario against the HTTP API and every request is
+timed; the report gives p50/p95/p99 per step, error counts and throughput.
+
+Scenarios:
+    full       /submit-test -> /generate-questions -> /submit-follow-up -> /user-profile-match
+    questions  /submit-test -> /generate-questions
+    match      set up users once (untimed), then time only /user-profile-match
+
+With --spawn, the harness starts everything itself in a temp directory: the
+fake OpenAI server (benchmarks/fake_openai.py), a SQLite database and the API
+under uvicorn, optionally over a synthetic corpus of --jobs postings
+(benchmarks/synth_corpus.py). Without it, point --base-url at a running server.
+
+Run from backend/:
+    python -m benchmarks.load_assessment_flow --spawn --users 200 --concurrency 20
+    python -m benchmarks.load_assessment_flow --spawn --jobs 100000 --llm-latency-ms 800 \\
+        --max-p95 user-profile-match=15000 --json results.json
+Exits non-zero when a --max-p95 budget is exceeded (for CI regression checks).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+SCENARIOS = {
+    "full": ["submit-test", "generate-questions", "submit-follow-up", "user-profile-match"],
+    "questions": ["submit-test", "generate-questions"],
+    "match": ["user-profile-match"],
+}
+LANGUAGES = ["Python", "Java", "JavaScript", "C++", "SQL", "TypeScript", "Go"]
+REFLECTIONS = [
+    "I build REST APIs in {lang} and deploy them with Docker; comfortable with SQL and Git.",
+    "Mostly data analysis in {lang} with pandas and scikit-learn, some React dashboards.",
+    "I know {lang} basics, did a university project on algorithms and data structures.",
+    "Full-stack work: {lang} backend, React frontend, CI pipelines and cloud deployments on AWS.",
+]
+
+
+# -----------------------------
+# Virtual user
+# -----------------------------
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, step: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(step, []).append(seconds)
+        if not ok:
+            self.errors[step] = self.errors.get(step, 0) + 1
+
+
+async def _post(client: httpx.AsyncClient, recorder: Recorder, step: str, payload: dict):
+    start = time.perf_counter()
+    try:
+        response = await client.post(f"/{step}", json=payload)
+        body = response.json()
+        ok = response.status_code == 200 and not (isinstance(body, dict) and "error" in body)
+    except (httpx.HTTPError, ValueError) as e:
+        body, ok = {"error": str(e)}, False
+    recorder.add(step, time.perf_counter() - start, ok)
+    return body if ok else None
+
+
+def _user_payload(rng: random.Random) -> dict:
+    lang = rng.choice(LANGUAGES)
+    return {
+        "educationLevel": rng.choice(["Diploma", "Bachelor", "Master"]),
+        "cgpa": round(rng.uniform(2.5, 4.0), 2),
+        "major": rng.choice(["Computer Science", "Software Engineering", "Data Science"]),
+        "programmingLanguages": rng.sample(LANGUAGES, 2),
+        "courseworkExperience": "Capstone project, internship",
+        "skillReflection": rng.choice(REFLECTIONS).format(lang=lang),
+    }
+
+
+async def run_flow(client, recorder: Recorder, steps: List[str], rng: random.Random, user_test_id=None, top_n=3):
+    """One virtual user through `steps`; returns the user_test_id (None if a step failed)."""
+    questions = []
+    for step in steps:
+        if step == "submit-test":
+            body = await _post(client, recorder, step, _user_payload(rng))
+            if body is None:
+                return None
+            user_test_id = body["id"]
+        elif step == "generate-questions":
+            body = await _post(client, recorder, step, {"user_test_id": user_test_id})
+            if body is None:
+                return None
+            questions = body.get("questions", [])
+        elif step == "submit-follow-up":
+            responses = [
+                {
+                    "questionId": q["id"],
+                    # Roughly 60% correct answers
+                    "selectedOption": q["answer"] if rng.random() < 0.6 else rng.choice(q["options"]),
+                    "user_test_id": user_test_id,
+                }
+                for q in questions
+            ]
+            if await _post(client, recorder, step, {"responses": responses}) is None:
+                return None
+        elif step == "user-profile-match":
+            if await _post(client, recorder, step, {"user_test_id": user_test_id, "top_n": top_n}) is None:
+                return None
+    return user_test_id
+
+
+async def run_load(base_url: str, scenario: str, users: int, concurrency: int, seed: int = 0) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        setup_ids: List[int] = []
+        if scenario == "match":
+            # Users with answers exist up front; only the match step is timed
+            setup = Recorder()
+            for i in range(min(users, concurrency)):
+                uid = await run_flow(client, setup, SCENARIOS["full"][:3], random.Random(seed + i))
+                if uid is not None:
+                    setup_ids.append(uid)
+            if not setup_ids:
+                raise RuntimeError("Scenario setup failed: no users could be created")
+
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            async with slots:
+                rng = random.Random(seed + i)
+                start = time.perf_counter()
+                uid = setup_ids[i % len(setup_ids)] if setup_ids else None
+                ok = await run_flow(client, recorder, SCENARIOS[scenario], rng, user_test_id=uid) is not None
+                recorder.add("flow", time.perf_counter() - start, ok)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+
+    report = {
+        "scenario": scenario,
+        "users": users,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "steps": {},
+    }
+    requests = 0
+    for step, samples in recorder.latencies.items():
+        ms = np.asarray(samples) * 1000
+        if step != "flow":
+            requests += len(samples)
+        report["steps"][step] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(step, 0),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1),
+            "mean_ms": round(float(ms.mean()), 1),
+        }
+    report["flows_per_s"] = round(users / elapsed, 3)
+    report["requests_per_s"] = round(requests / elapsed, 3)
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"\nScenario {report['scenario']}: {report['users']} users, concurrency {report['concurrency']}, "
+        f"{report['seconds']}s, {report['flows_per_s']} flows/s, {report['requests_per_s']} req/s"
+    )
+    print(f"{'step':>20} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for step, s in report["steps"].items():
+        print(
+            f"{step:>20} {s['count']:>6} {s['errors']:>6} {s['p50_ms']:>9.1f} "
+            f"{s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['mean_ms']:>9.1f}"
+        )
+
+
+# -----------------------------
+# Spawned stack
+# -----------------------------
+def _wait_until(url: str, ready, timeout: float, what: str) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            response = httpx.get(url, timeout=5)
+            if ready(response):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(1)
+    raise RuntimeError(f"{what} not ready after {timeout:.0f}s ({url})")
+
+
+def spawn_stack(args, workdir: str) -> List[subprocess.Popen]:
+    """Fake OpenAI + API on SQLite in `workdir`; returns the processes to terminate."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = os.path.join(backend_dir, "data")
+    if args.jobs:
+        from benchmarks.synth_corpus import generate
+
+        data_dir = os.path.join(workdir, "corpus")
+        print(f"Generating {args.jobs} synthetic postings...")
+        generate(args.jobs, data_dir, source_dir=os.path.join(backend_dir, "data"), seed=args.seed)
+
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="fake",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1",
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        JOB_DATA_DIR=data_dir,
+        ENRICHMENT_CACHE_PATH=os.path.join(workdir, "job_enrichment.sqlite"),
+        PROMPT_CACHE_PATH=os.path.join(workdir, "prompt_cache.sqlite"),
+        JOB_STORE_BLOB_PATH=os.path.join(workdir, "job_descriptions.bin"),
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+    )
+    procs = [
+        subprocess.Popen(
+            [
+                sys.executable, "-m", "benchmarks.fake_openai",
+                "--port", str(args.llm_port),
+                "--latency-ms", str(args.llm_latency_ms),
+                "--ms-per-token", str(args.llm_ms_per_token),
+                "--error-rate", str(args.llm_error_rate),
+                "--seed", str(args.seed),
+            ],
+            cwd=backend_dir,
+            env=env,
+        )
+    ]
+    procs.append(
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.api_port), "--log-level", "warning"],
+            cwd=backend_dir,
+            env=env,
+        )
+    )
+    try:
+        _wait_until(f"http://127.0.0.1:{args.llm_port}/docs", lambda r: r.status_code == 200, 60, "Fake OpenAI")
+        _wait_until(
+            f"http://127.0.0.1:{args.api_port}/health",
+            lambda r: r.json().get("status") in ("ready", "failed"),
+            args.startup_timeout,
+            "API",
+        )
+        health = httpx.get(f"http://127.0.0.1:{args.api_port}/health").json()
+        if health["status"] != "ready":
+            raise RuntimeError(f"API failed to start: {json.dumps(health['stages'])}")
+        print(f"✓ Stack ready: {json.dumps(health['stages'])}")
+    except Exception:
+        stop_stack(procs)
+        raise
+    return procs
+
+
+def stop_stack(procs: List[subprocess.Popen]) -> None:
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _budgets(specs: List[str]) -> Dict[str, float]:
+    budgets = {}
+    for spec in specs:
+        step, _, ms = spec.partition("=")
+        budgets[step] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="full")
+    parser.add_argument("--users", type=int, default=50, help="virtual users (flows) in total")
+    parser.add_argument("--concurrency", type=int, default=10, help="flows in flight at once")
+    parser.add_argument("--base-url", default=None, help="running API; default spawns one with --spawn")
+    parser.add_argument("--spawn", action="store_true", help="start fake OpenAI + SQLite-backed API locally")
+    parser.add_argument("--jobs", type=int, default=0, help="synthetic corpus size (0 = bundled data/)")
+    parser.add_argument("--api-port", type=int, default=8800)
+    parser.add_argument("--llm-port", type=int, default=8900)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--startup-timeout", type=float, default=1800.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-p95", nargs="*", default=[], metavar="STEP=MS", help="fail if a step's p95 exceeds MS")
+    parser.add_argument("--keep", action="store_true", help="keep the spawned temp directory")
+    args = parser.parse_args()
+
+    if not args.spawn and not args.base_url:
+        parser.error("pass --spawn or --base-url")
+
+    procs, workdir = [], None
+    base_url = args.base_url
+    if args.spawn:
+        workdir = tempfile.mkdtemp(prefix="codemap-bench-")
+        procs = spawn_stack(args, workdir)
+        base_url = f"http://127.0.0.1:{args.api_port}"
+    try:
+        report = asyncio.run(run_load(base_url, args.scenario, args.users, args.concurrency, args.seed))
+    finally:
+        stop_stack(procs)
+        if workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failed = [
+        f"{step} p95 {report['steps'][step]['p95_ms']}ms > {budget}ms"
+        for step, budget in _budgets(args.max_p95).items()
+        if step in report["steps"] and report["steps"][step]["p95_ms"] > budget
+    ]
+    errors = sum(s["errors"] for step, s in report["steps"].items() if step != "flow")
+    if failed or errors:
+        print("✗ " + "; ".join(failed + ([f"{errors} failed requests"] if errors else [])))
+        sys.exit(1)
+    print("✓ All steps within budget")
+
+
+if __name__ == "__main__":
+    main()
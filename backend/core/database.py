@@ -1,10 +1,14 @@
+import asyncio
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
 from contextlib import contextmanager
 
+from core.metrics import instrument_engine
+
 load_dotenv()
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
@@ -13,12 +17,64 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 
-DATABASE_URL = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+# DATABASE_URL overrides the POSTGRES_* settings, e.g. "sqlite:///bench.db" for offline benchmarks;
+# the async URL is derived from it unless ASYNC_DATABASE_URL is set too
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}",
+)
+_ASYNC_DRIVERS = {
+    "postgresql+psycopg2://": "postgresql+asyncpg://",
+    "postgresql://": "postgresql+asyncpg://",
+    "sqlite://": "sqlite+aiosqlite://",
+}
+
+
+def _async_url(url: str) -> str:
+    for sync_prefix, async_prefix in _ASYNC_DRIVERS.items():
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Log every SQL statement (off by default; very noisy under load)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+# Connection pool (per engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Test connections on checkout so a restarted Postgres doesn't surface as request errors
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Recycle connections older than this many seconds (-1 disables)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Seconds to wait for a free connection before raising
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_timeout": DB_POOL_TIMEOUT,
+}
+
+# Sync engine: schema creation at startup and offline scripts
+engine = create_engine(DATABASE_URL, echo=DB_ECHO, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine (asyncpg): used by the request path
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=DB_ECHO, **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Per-statement latency histograms and pool gauges for /metrics
+instrument_engine("sync", engine)
+instrument_engine("async", async_engine.sync_engine)
+
 # Dependency injection
 def get_db():
     db = SessionLocal()
@@ -34,4 +90,49 @@ def get_db_context():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async dependency injection: the one session per request used by every route.
+# Uncommitted work is rolled back on error and the connection always returns to the pool.
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
+# -----------------------------
+# Pool management
+# -----------------------------
+async def warmup_pool(size: int = DB_POOL_SIZE) -> int:
+    """Open `size` pooled connections concurrently so the first burst doesn't pay connect latency."""
+    # Hold every connection until all are open, otherwise the pool would just reuse one
+    conns = await asyncio.gather(*(async_engine.connect().start() for _ in range(size)))
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns))
+    return async_engine.sync_engine.pool.checkedin()
+
+
+def _pool_stats(pool) -> dict:
+    size = pool.size()
+    checked_out = pool.checkedout()
+    return {
+        "pool_size": size,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "utilization": round(checked_out / (size + DB_MAX_OVERFLOW), 4) if size + DB_MAX_OVERFLOW else 0.0,
+    }
+
+
+def pool_stats() -> dict:
+    """Utilization of the request-path (async) and startup (sync) connection pools."""
+    return {
+        "async": _pool_stats(async_engine.sync_engine.pool),
+        "sync": _pool_stats(engine.pool),
+    }
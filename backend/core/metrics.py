@@ -0,0 +1,245 @@
+"""
+Prometheus metrics and per-request timing logs.
+
+Every stage that can dominate a request (OpenAI calls, encoder forward passes,
+the similarity scan, DB queries) is timed with `timed(...)`, which observes the
+stage's histogram and adds the duration to the current request's breakdown.
+RequestTimingMiddleware logs that breakdown as one JSON line per request on
+the "codemap.requests" logger; /metrics exposes the histograms and gauges.
+"""
+import contextvars
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+request_logger = logging.getLogger("codemap.requests")
+
+# -----------------------------
+# Metrics
+# -----------------------------
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "codemap_http_request_seconds",
+    "HTTP request latency, until the last body chunk is sent",
+    ["method", "route", "status"],
+    buckets=LLM_BUCKETS,
+)
+OPENAI_REQUEST_SECONDS = Histogram(
+    "codemap_openai_request_seconds",
+    "OpenAI chat completion latency by prompt kind",
+    ["kind", "outcome"],
+    buckets=LLM_BUCKETS,
+)
+OPENAI_TOKENS = Histogram(
+    "codemap_openai_tokens",
+    "Tokens per OpenAI call, from the response usage",
+    ["kind", "type"],
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000),
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "codemap_llm_queue_seconds",
+    "Time an LLM request waited for an in-flight slot and rate-limit tokens",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+LLM_IN_FLIGHT = Gauge(
+    "codemap_llm_in_flight",
+    "LLM requests currently sent upstream",
+)
+LLM_RETRIES = Counter(
+    "codemap_llm_retries",
+    "LLM attempts retried after a rate-limit or transient error",
+    ["kind", "error"],
+)
+LLM_COALESCED = Counter(
+    "codemap_llm_coalesced",
+    "LLM calls served by an identical call already in flight",
+    ["kind"],
+)
+LLM_PROMPT_CACHE = Counter(
+    "codemap_llm_prompt_cache",
+    "Prompt cache lookups by prompt kind and result (hit/miss)",
+    ["kind", "result"],
+)
+ENCODE_SECONDS = Histogram(
+    "codemap_encode_seconds",
+    "Encoder forward time (single query text or a batch)",
+    ["mode"],
+    buckets=FAST_BUCKETS,
+)
+SIMILARITY_SECONDS = Histogram(
+    "codemap_similarity_search_seconds",
+    "Vector index top-k search time",
+    ["mode"],
+    buckets=FAST_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "codemap_db_query_seconds",
+    "Time per executed SQL statement",
+    ["engine", "statement"],
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "codemap_db_pool_connections",
+    "Connections per pool state",
+    ["engine", "state"],
+)
+THREADPOOL_TASKS = Gauge(
+    "codemap_threadpool_tasks",
+    "Tasks submitted to a thread pool and not yet finished (running + queued)",
+    ["pool"],
+)
+THREADPOOL_WORKERS = Gauge(
+    "codemap_threadpool_workers",
+    "Configured worker threads per pool",
+    ["pool"],
+)
+
+# -----------------------------
+# Per-request stage timings
+# -----------------------------
+# Shared (mutable) dict per request; copied contexts (to_thread, run_inference) add to the same one
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Add `seconds` to the current request's `stage` total (no-op outside a request)."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+        timings[f"{stage}_count"] = timings.get(f"{stage}_count", 0) + 1
+
+
+@contextmanager
+def timed(histogram: Histogram, stage: str, **labels):
+    """Observe the block's duration on `histogram` and in the request breakdown under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        (histogram.labels(**labels) if labels else histogram).observe(elapsed)
+        record_stage(stage, elapsed)
+
+
+@contextmanager
+def timed_openai(kind: str):
+    """timed() for one OpenAI call, labelled by prompt kind and whether it raised."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        OPENAI_REQUEST_SECONDS.labels(kind=kind, outcome=outcome).observe(elapsed)
+        record_stage("openai", elapsed)
+
+
+def observe_openai_usage(kind: str, usage) -> None:
+    """Token counts from a chat completion's `usage` (None when the API omitted it)."""
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(kind=kind, type="prompt").observe(usage.prompt_tokens)
+    OPENAI_TOKENS.labels(kind=kind, type="completion").observe(usage.completion_tokens)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings["openai_tokens"] = timings.get("openai_tokens", 0) + usage.total_tokens
+
+
+# -----------------------------
+# Gauges
+# -----------------------------
+def track_pool(engine_label: str, pool) -> None:
+    """Export a SQLAlchemy QueuePool's state, read at scrape time (other pool classes have none)."""
+    if not hasattr(pool, "checkedout"):
+        return
+    DB_POOL_CONNECTIONS.labels(engine=engine_label, state="checked_out").set_function(pool.checkedout)
+    DB_POOL_CONNECTIONS.labels(engine=engine_label, state="checked_in").set_function(pool.checkedin)
+    DB_POOL_CONNECTIONS.labels(engine=engine_label, state="overflow").set_function(
+        lambda: max(0, pool.overflow())
+    )
+
+
+def instrument_engine(engine_label: str, sync_engine) -> None:
+    """Time every statement on this engine (for an AsyncEngine pass .sync_engine)."""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(engine=engine_label, statement=verb).observe(elapsed)
+        record_stage("db", elapsed)
+
+    track_pool(engine_label, sync_engine.pool)
+
+
+def metrics_payload():
+    """(body, content type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# -----------------------------
+# Request middleware
+# -----------------------------
+class RequestTimingMiddleware:
+    """
+    Pure ASGI middleware so streaming responses are timed to their last chunk.
+    Logs e.g. {"method": "POST", "route": "/user-profile-match", "status": 200,
+    "ms": 8123.4, "openai_ms": 7901.2, "openai_count": 4, "db_ms": 12.3, ...}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_timings.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                # Unmatched paths share one label so scanners can't blow up cardinality
+                route = scope["path"] if status["code"] != 404 else "unmatched"
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"], route=route, status=str(status["code"])
+            ).observe(elapsed)
+            entry = {
+                "method": scope["method"],
+                "route": route,
+                "status": status["code"],
+                "ms": round(elapsed * 1000, 1),
+            }
+            for key, value in timings.items():
+                if key.endswith(("_count", "_tokens")):
+                    entry[key] = value
+                else:
+                    entry[f"{key}_ms"] = round(value * 1000, 1)
+            request_logger.info(json.dumps(entry))
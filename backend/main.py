@@ -1,49 +1,115 @@
-from fastapi import FastAPI
-from core.database import Base, engine, SessionLocal
+from fastapi import FastAPI, Response
+from sqlalchemy import inspect
+from sqlalchemy.schema import AddConstraint
+from core.database import Base, engine, pool_stats, warmup_pool
+from core.metrics import RequestTimingMiddleware, metrics_payload
 from routes import assessment_routes
-from sqlalchemy import text
 import asyncio
-from services.embedding_service import initialize_ai_models, is_initialized
+import logging
+import os
+from services.embedding_service import get_readiness, initialize_ai_models
+
+# Request timing lines (codemap.requests) and service logs; LOG_LEVEL=DEBUG adds generation details
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+
+def _add_missing_foreign_keys():
+    """create_all never alters existing tables: add model foreign keys the live schema lacks."""
+    if engine.dialect.name == "sqlite":
+        return  # SQLite cannot add constraints to an existing table
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {
+            (tuple(fk["constrained_columns"]), fk["referred_table"])
+            for fk in inspector.get_foreign_keys(table.name)
+        }
+        for constraint in table.foreign_key_constraints:
+            key = (tuple(constraint.column_keys), constraint.referred_table.name)
+            if key in existing:
+                continue
+            try:
+                with engine.begin() as conn:
+                    conn.execute(AddConstraint(constraint))
+                print(f"✓ Added foreign key {table.name}({', '.join(key[0])}) -> {key[1]}")
+            except Exception as e:
+                # e.g. orphaned rows from before the constraint existed; clean up and restart
+                print(f"Could not add foreign key {table.name}({', '.join(key[0])}) -> {key[1]}: {e}")
+
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist; add indexes and foreign keys introduced since
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    _add_missing_foreign_keys()
 
 # Create FastAPI app
 app = FastAPI(title="CodeMap API")
+# Per-request latency histogram + one structured timing log line per request
+app.add_middleware(RequestTimingMiddleware)
 
-# Health check endpoint
+# Background model/corpus/index loading (kept referenced so it isn't garbage collected)
+_model_loading_task = None
+
+# Health check endpoint: per-stage startup progress (model, corpus, index)
 @app.get("/health")
 async def health_check():
-    if is_initialized():
-        return {"status": "ready", "message": "Server is running"}
-    else:
-        return {"status": "starting", "message": "Server is initializing"}
+    readiness = get_readiness()
+    messages = {
+        "ready": "Server is running",
+        "starting": "Server is initializing",
+        "failed": "Server failed to initialize",
+    }
+    return {"message": messages[readiness["status"]], **readiness}
+
+# Connection pool utilization
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    return pool_stats()
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
 
 async def warmup_database():
-    """Simple database connection warmup"""
+    """Open the full connection pool up front"""
     try:
-        # Use SessionLocal instead of async_session
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()  # Close the session
-        print("Database connection warmed up")
+        opened = await warmup_pool()
+        print(f"Database pool warmed up ({opened} connections)")
     except Exception as e:
         print(f"Database warmup failed: {e}")
 
+async def load_ai_models():
+    """Run the blocking model/corpus/index stages in a worker thread"""
+    try:
+        await asyncio.to_thread(initialize_ai_models)
+    except Exception:
+        pass  # recorded per stage and reported by /health
+
 # Run initialization when FastAPI starts
 @app.on_event("startup")
 async def on_startup():
-    # Initialize database
-    init_db()
+    global _model_loading_task
+
+    # Initialize database (sync engine, off the event loop)
+    await asyncio.to_thread(init_db)
     print("✓ Database initialized")
     
     # Warm up database connection
     await warmup_database()
     
-    # Initialize AI models and load job data
-    initialize_ai_models()  # This will load everything
+    # Initialize AI models and load job data without holding up the server;
+    # matching routes answer 503 until every stage is ready
+    _model_loading_task = asyncio.create_task(load_ai_models())
     
-    print("✓ Server startup complete - Ready for requests!")
+    print("✓ Server startup complete - AI models loading in background")
 
 # Register routers
 app.include_router(assessment_routes.router)
\ No newline at end of file
@@ -1,8 +1,14 @@
 # SQLAlchemy models (database tables)
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, Text
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String, Float, Text
+from sqlalchemy.orm import relationship
 from core.database import Base
 
+# Relationships use lazy="raise": under AsyncSession an implicit lazy load would
+# fail anyway, and this turns accidental per-row (N+1) loads into loud errors.
+# Load related rows with an explicit join or selectinload().
+
 class UserTest(Base):
     __tablename__ = "user_test"
 
@@ -14,20 +20,63 @@ class UserTest(Base):
     courseworkExperience = Column(String, nullable=True)
     skillReflection = Column(Text, nullable=True)
 
+    questions = relationship("GeneratedQuestion", back_populates="user_test", lazy="raise")
+    answers = relationship("FollowUpAnswers", back_populates="user_test", lazy="raise")
+
 class GeneratedQuestion(Base):
     __tablename__ = "generated_questions"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_test_id = Column(Integer, nullable=False)  # FK to UserTest.id
+    user_test_id = Column(Integer, ForeignKey("user_test.id"), nullable=False, index=True)
     question_text = Column(Text, nullable=False)
     options = Column(Text, nullable=True)
     answer = Column(String, nullable=True)
     difficulty = Column(String, nullable=True)
     question_type = Column(String, nullable=True)
-    
+
+    user_test = relationship("UserTest", back_populates="questions", lazy="raise")
+    answers = relationship("FollowUpAnswers", back_populates="question", lazy="raise")
+
 class FollowUpAnswers(Base):
     __tablename__ = "follow_up_answers"
     id = Column(Integer, primary_key=True, index=True)
-    user_test_id = Column(Integer, ForeignKey("user_test.id"), nullable=False)
-    question_id = Column(Integer, ForeignKey("generated_questions.id"), nullable=False)
+    user_test_id = Column(Integer, ForeignKey("user_test.id"), nullable=False, index=True)
+    question_id = Column(Integer, ForeignKey("generated_questions.id"), nullable=False, index=True)
     selected_option = Column(String, nullable=False)
+
+    user_test = relationship("UserTest", back_populates="answers", lazy="raise")
+    question = relationship("GeneratedQuestion", back_populates="answers", lazy="raise")
+
+
+class QuestionBankSet(Base):
+    """One generated question set, reusable for users with a similar skill reflection."""
+    __tablename__ = "question_bank_sets"
+    id = Column(Integer, primary_key=True, index=True)
+    topics = Column(Text, nullable=True)  # normalized, sorted comma-separated topic list
+    primary_language = Column(String, nullable=True)
+    reflection_embedding = Column(LargeBinary, nullable=False)  # float32, L2-normalized
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_served_at = Column(DateTime, nullable=True)
+    times_served = Column(Integer, default=0, nullable=False)
+
+
+class QuestionBankQuestion(Base):
+    __tablename__ = "question_bank_questions"
+    id = Column(Integer, primary_key=True, index=True)
+    set_id = Column(Integer, ForeignKey("question_bank_sets.id", ondelete="CASCADE"), nullable=False, index=True)
+    question_text = Column(Text, nullable=False)
+    options = Column(Text, nullable=True)
+    answer = Column(String, nullable=True)
+    difficulty = Column(String, nullable=True)
+    question_type = Column(String, nullable=True)
+
+
+class UserProfileCache(Base):
+    """Generated profile text + its embedding for one assessment state (see services/profile_cache.py)."""
+    __tablename__ = "user_profile_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    user_test_id = Column(Integer, ForeignKey("user_test.id", ondelete="CASCADE"), nullable=False, index=True)
+    data_hash = Column(String(64), nullable=False)  # sha256 of combined_data + prompt/model version
+    profile_text = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # float32
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
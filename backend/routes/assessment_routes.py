@@ -1,151 +1,262 @@
+import logging
 from typing import List
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from core.database import SessionLocal, get_db
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import AsyncSessionLocal, get_async_db
 from models.assessment import UserTest, GeneratedQuestion, FollowUpAnswers
 from schemas.assessment import (
     UserResponses,
     SkillReflectionRequest,
+    CohortProfileMatchRequest,
     FollowUpResponses,
     JobMatch,
+    UserProfileMatchRequest,
     UserProfileMatchResponse,
 )
-from services.openai_service import generate_questions
-from services.embedding_service import create_user_embedding, match_user_to_job
+from services.question_bank import get_bank_stats, get_or_generate_questions, stream_or_generate_questions
+from services.embedding_service import (
+    create_user_embedding,
+    get_readiness,
+    match_cohort,
+    match_user_to_job,
+    stream_user_profile_match,
+)
+from services.profile_cache import get_profile_cache_stats, invalidate_profiles
+from services.prompt_cache import get_prompt_cache_stats
 import json
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def require_matching_ready():
+    """503 until the model, job corpus and vector index have finished loading."""
+    readiness = get_readiness()
+    if readiness["status"] != "ready":
+        raise HTTPException(
+            status_code=503,
+            detail={"message": "Job matching is not ready yet", **readiness},
+            headers={"Retry-After": "10"},
+        )
 
 
 # -----------------------------
 # Submit user test responses
 # -----------------------------
 @router.post("/submit-test")
-def submit_test(data: UserResponses):
-    db = SessionLocal()
-    try:
-        prog_langs_str = ",".join(data.programmingLanguages)
-        new_entry = UserTest(
-            educationLevel=data.educationLevel,
-            cgpa=data.cgpa,
-            major=data.major,
-            programmingLanguages=prog_langs_str,
-            courseworkExperience=data.courseworkExperience,
-            skillReflection=data.skillReflection,
-        )
-        db.add(new_entry)
-        db.commit()
-        db.refresh(new_entry)
-        return {"message": "Data saved successfully", "id": new_entry.id}
-    finally:
-        db.close()
+async def submit_test(data: UserResponses, db: AsyncSession = Depends(get_async_db)):
+    prog_langs_str = ",".join(data.programmingLanguages)
+    new_entry = UserTest(
+        educationLevel=data.educationLevel,
+        cgpa=data.cgpa,
+        major=data.major,
+        programmingLanguages=prog_langs_str,
+        courseworkExperience=data.courseworkExperience,
+        skillReflection=data.skillReflection,
+    )
+    db.add(new_entry)
+    await db.commit()
+    await db.refresh(new_entry)
+    return {"message": "Data saved successfully", "id": new_entry.id}
 
 
 # -----------------------------
 # Generate follow-up questions
 # -----------------------------
+def _question_row(user_test_id: int, q: dict):
+    """GeneratedQuestion insert values for one MCQ, or None if it is incomplete."""
+    question_text = q.get("question")
+    options = q.get("options", [])
+    if not question_text or not options:
+        return None
+    return {
+        "user_test_id": user_test_id,
+        "question_text": question_text,
+        "options": json.dumps(options),  # Convert list to JSON string
+        "answer": q.get("answer"),  # Save the correct answer
+        "difficulty": q.get("difficulty", "easy"),
+        "question_type": q.get("category", "general"),  # Use "category" from OpenAI
+    }
+
+
+def _saved_question(question_id: int, row: dict) -> dict:
+    return {
+        "id": question_id,
+        "question": row["question_text"],
+        "options": json.loads(row["options"]),  # Convert back to list
+        "answer": row["answer"],  # Include the answer in response
+        "difficulty": row["difficulty"],
+        "category": row["question_type"],
+    }
+
+
+def _sse(event: str, data) -> str:
+    """One Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/generate-questions")
-def create_follow_up_questions(
+async def create_follow_up_questions(
     data: SkillReflectionRequest,
-    db: Session = Depends(get_db),
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db),
 ):
+    if stream:
+        return _sse_response(_stream_follow_up_questions(data.user_test_id))
     try:
         # 1) Fetch the UserTest
-        user_test = db.query(UserTest).filter(UserTest.id == data.user_test_id).first()
+        user_test = await db.scalar(select(UserTest).where(UserTest.id == data.user_test_id))
         if not user_test or not user_test.skillReflection:
             return {"error": "No skill reflection found for this user_test_id"}
 
-        # 2) Generate questions using OpenAI service
-        result = generate_questions(
-            user_test.skillReflection
+        # 2) Serve from the question bank, generating via OpenAI on a miss
+        result = await get_or_generate_questions(
+            db, user_test.skillReflection
         )  # This returns a dict with "questions" key
 
-        # 3) Extract the actual MCQ questions from the response
-        raw_questions = result.get("questions", [])
-        if not raw_questions:
+        # 3) Prepare question rows from the MCQs
+        new_questions = [
+            row
+            for row in (_question_row(data.user_test_id, q) for q in result.get("questions", []))
+            if row is not None
+        ]
+        if not new_questions:
             return {"questions": []}
 
-        # 4) Prepare and insert questions
-        new_questions = []
-        for q in raw_questions:
-            # Extract data from the OpenAI response
-            question_text = q.get("question")
-            options = q.get("options", [])
-            answer = q.get("answer")
-            difficulty = q.get("difficulty", "easy")
-            question_type = q.get("category", "general")  # Use "category" from OpenAI
-
-            if not question_text or not options:
-                continue
-
-            new_q = GeneratedQuestion(
-                user_test_id=data.user_test_id,
-                question_text=question_text,
-                options=json.dumps(options),  # Convert list to JSON string
-                answer=answer,  # Save the correct answer
-                difficulty=difficulty,
-                question_type=question_type,
+        # 4) Insert the whole batch in one statement and commit
+        new_ids = (
+            await db.scalars(
+                insert(GeneratedQuestion).returning(GeneratedQuestion.id, sort_by_parameter_order=True),
+                new_questions,
             )
-            db.add(new_q)
-            db.flush()
-            new_questions.append(new_q)
-
-        # 5) Commit all inserts
-        db.commit()
-
-        # 6) Prepare response
-        saved_questions = [
-            {
-                "id": q.id,
-                "question": q.question_text,
-                "options": json.loads(q.options),  # Convert back to list
-                "answer": q.answer,  # Include the answer in response
-                "difficulty": q.difficulty,
-                "category": q.question_type,
-            }
-            for q in new_questions
-        ]
+        ).all()
+        await db.commit()
+
+        # 5) Prepare response
+        saved_questions = [_saved_question(question_id, q) for question_id, q in zip(new_ids, new_questions)]
 
         return {"questions": saved_questions}
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return {"error": f"Internal Server Error: {str(e)}"}
 
 
+async def _stream_follow_up_questions(user_test_id: int):
+    """
+    SSE for /generate-questions?stream=true: a "question" event per saved MCQ as
+    soon as it is parsed, then "done" (topics, primary_language, source, count).
+    """
+    # The stream outlives request-scoped dependencies, so it owns its session
+    async with AsyncSessionLocal() as db:
+        try:
+            user_test = await db.scalar(select(UserTest).where(UserTest.id == user_test_id))
+            if not user_test or not user_test.skillReflection:
+                yield _sse("error", {"error": "No skill reflection found for this user_test_id"})
+                return
+
+            count = 0
+            async for kind, payload in stream_or_generate_questions(db, user_test.skillReflection):
+                if kind == "summary":
+                    await db.commit()
+                    yield _sse("done", {**payload, "count": count})
+                    continue
+                row = _question_row(user_test_id, payload)
+                if row is None:
+                    continue
+                # Committed one by one so each question has its id (and no transaction
+                # is held open) while the rest are still being generated
+                question_id = await db.scalar(insert(GeneratedQuestion).returning(GeneratedQuestion.id), row)
+                await db.commit()
+                count += 1
+                yield _sse("question", _saved_question(question_id, row))
+        except Exception as e:
+            await db.rollback()
+            yield _sse("error", {"error": f"Internal Server Error: {str(e)}"})
+
+
+# -----------------------------
+# Question bank hit-rate metrics
+# -----------------------------
+@router.get("/question-bank/stats")
+async def question_bank_stats():
+    return get_bank_stats()
+
+
+# -----------------------------
+# Profile cache hit-rate metrics
+# -----------------------------
+@router.get("/profile-cache/stats")
+async def profile_cache_stats():
+    return get_profile_cache_stats()
+
+
+# -----------------------------
+# LLM prompt cache hit-rate metrics
+# -----------------------------
+@router.get("/prompt-cache/stats")
+async def prompt_cache_stats():
+    return get_prompt_cache_stats()
+
+
 # -----------------------------
 # Submit follow-up answers
 # -----------------------------
 @router.post("/submit-follow-up")
-def submit_follow_up(data: FollowUpResponses):
-    db = SessionLocal()
+async def submit_follow_up(data: FollowUpResponses, db: AsyncSession = Depends(get_async_db)):
     try:
-        for resp in data.responses:
-            db.add(
-                FollowUpAnswers(
-                    user_test_id=resp.user_test_id,
-                    question_id=resp.questionId,
-                    selected_option=resp.selectedOption,
-                )
+        if data.responses:
+            # One executemany for the whole answer batch
+            await db.execute(
+                insert(FollowUpAnswers),
+                [
+                    {
+                        "user_test_id": resp.user_test_id,
+                        "question_id": resp.questionId,
+                        "selected_option": resp.selectedOption,
+                    }
+                    for resp in data.responses
+                ],
             )
-        db.commit()
+            # New answers change the assessment state; drop any cached profile
+            await invalidate_profiles(db, [resp.user_test_id for resp in data.responses])
+        await db.commit()
         return {"message": "Follow-up answers saved successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return {"error": str(e)}
-    finally:
-        db.close()
 
 
 # -----------------------------
 # Generate user profile and job matches
 # -----------------------------
-@router.post("/user-profile-match", response_model=UserProfileMatchResponse)
-def user_profile_match(request: SkillReflectionRequest):
+@router.post(
+    "/user-profile-match",
+    response_model=UserProfileMatchResponse,
+    dependencies=[Depends(require_matching_ready)],
+)
+async def user_profile_match(
+    request: UserProfileMatchRequest,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
     user_test_id = request.user_test_id
+    if stream:
+        return _sse_response(_stream_profile_match(user_test_id, request.top_n))
 
     # Create user embedding + profile text
-    user_data = create_user_embedding(user_test_id)
+    user_data = await create_user_embedding(db, user_test_id)
     if "error" in user_data:
         return UserProfileMatchResponse(
             profile_text="",
@@ -153,7 +264,9 @@ def user_profile_match(request: SkillReflectionRequest):
         )
 
     # Match jobs
-    matches = match_user_to_job(user_test_id, user_data["user_embedding"])
+    matches = await match_user_to_job(
+        user_test_id, user_data["user_embedding"], top_n=request.top_n
+    )
     if "error" in matches:
         return UserProfileMatchResponse(
             profile_text=user_data["profile_text"],
@@ -169,3 +282,48 @@ def user_profile_match(request: SkillReflectionRequest):
         top_matches=top_matches_list
     )
 
+
+
+async def _stream_profile_match(user_test_id: int, top_n: int):
+    """
+    SSE for /user-profile-match?stream=true: "profile", then a "match" per job
+    (raw description, skills/knowledge null), then an "enrichment" per job as it
+    completes, then "done". Failures arrive as an "error" event.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            async for event, data in stream_user_profile_match(db, user_test_id, top_n=top_n):
+                if event == "match":
+                    data = JobMatch(**data).model_dump()
+                yield _sse(event, data)
+        except Exception as e:
+            await db.rollback()
+            yield _sse("error", {"error": f"Internal Server Error: {str(e)}"})
+
+
+# -----------------------------
+# Cohort profile match (NDJSON stream)
+# -----------------------------
+@router.post("/cohort-profile-match", dependencies=[Depends(require_matching_ready)])
+async def cohort_profile_match(request: CohortProfileMatchRequest):
+    """
+    Match many users in one pass. Streams one JSON line per user
+    ({"user_test_id", "profile_text", "top_matches"} or {"user_test_id", "error"})
+    followed by a {"done": true, ...} summary line. A failure after the stream
+    has started ends it with {"done": true, "error": ...} instead.
+    """
+
+    async def stream():
+        # The stream outlives request-scoped dependencies, so it owns its session
+        async with AsyncSessionLocal() as db:
+            try:
+                async for item in match_cohort(db, request.user_test_ids, top_n=request.top_n):
+                    if "top_matches" in item:
+                        item["top_matches"] = [JobMatch(**job).model_dump() for job in item["top_matches"]]
+                    yield json.dumps(item) + "\n"
+            except Exception as e:
+                logger.exception("Cohort profile match failed")
+                await db.rollback()
+                yield json.dumps({"done": True, "error": f"Internal Server Error: {str(e)}"}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 
@@ -34,6 +34,11 @@ class FollowUpResponses(BaseModel):
 # -----------------------------
 # Job matching / profile schemas
 # -----------------------------
+class UserProfileMatchRequest(BaseModel):
+    user_test_id: int
+    top_n: int = Field(3, ge=1, le=20)
+
+
 class JobMatch(BaseModel):
     job_index: int
     similarity_score: float
@@ -47,3 +52,8 @@ class JobMatch(BaseModel):
 class UserProfileMatchResponse(BaseModel):
     profile_text: str
     top_matches: List[JobMatch]
+
+
+class CohortProfileMatchRequest(BaseModel):
+    user_test_ids: List[int] = Field(..., min_length=1, max_length=500)
+    top_n: int = Field(3, ge=1, le=20)
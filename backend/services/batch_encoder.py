@@ -0,0 +1,255 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import torch
+
+# -----------------------------
+# Tunables (env overridable)
+# -----------------------------
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Upper bound on (rows x padded length) per forward pass, keeps long-document
+# batches from blowing up memory while short ones can use the full batch size.
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "16384"))
+# 0 keeps the runtime default (usually the number of physical cores).
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+# >1 splits the corpus into shards encoded by separate processes.
+EMBEDDING_NUM_WORKERS = int(os.getenv("EMBEDDING_NUM_WORKERS", "1"))
+EMBEDDING_MAX_LENGTH = 512
+# Long documents: "none" truncates at EMBEDDING_MAX_LENGTH tokens; "mean", "max"
+# or "weighted" (token-count weighted mean) split them into overlapping windows
+# and aggregate the per-window embeddings.
+EMBEDDING_CHUNK_AGGREGATE = os.getenv("EMBEDDING_CHUNK_AGGREGATE", "mean").lower()
+# Tokens shared by consecutive windows.
+EMBEDDING_WINDOW_STRIDE = int(os.getenv("EMBEDDING_WINDOW_STRIDE", "128"))
+CHUNK_AGGREGATES = ("none", "mean", "max", "weighted")
+
+
+# -----------------------------
+# Pooling
+# -----------------------------
+def mean_pool(last_hidden_state: "torch.Tensor", attention_mask: "torch.Tensor") -> "torch.Tensor":
+    """
+    Mean of the token embeddings, ignoring padded positions.
+    For an unpadded single text this is identical to last_hidden_state.mean(dim=1).
+    """
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)  # [batch, seq, 1]
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+    return summed / counts
+
+
+def aggregate_windows(
+    window_vecs: np.ndarray,
+    owners: Sequence[int],
+    window_lengths: Sequence[int],
+    num_docs: int,
+    aggregate: str = EMBEDDING_CHUNK_AGGREGATE,
+) -> np.ndarray:
+    """Combine per-window embeddings into one row per document (owners[i] = doc of window i)."""
+    owners = np.asarray(owners, dtype=np.int64)
+    out = np.zeros((num_docs, window_vecs.shape[1]), dtype=np.float32)
+    if aggregate == "max":
+        out.fill(-np.inf)
+        np.maximum.at(out, owners, window_vecs)
+        return out
+    if aggregate == "weighted":
+        weights = np.asarray(window_lengths, dtype=np.float32)
+    else:  # "mean", and "none" where every document has exactly one window
+        weights = np.ones(len(owners), dtype=np.float32)
+    np.add.at(out, owners, window_vecs * weights[:, None])
+    totals = np.bincount(owners, weights=weights, minlength=num_docs).astype(np.float32)
+    return out / np.clip(totals, 1e-9, None)[:, None]
+
+
+def pooling_label(aggregate: str = EMBEDDING_CHUNK_AGGREGATE, stride: int = EMBEDDING_WINDOW_STRIDE) -> str:
+    """Identifies how document vectors were produced (stored in the embedding store header)."""
+    if aggregate == "none":
+        return f"truncate-{EMBEDDING_MAX_LENGTH}"
+    return f"chunked-{aggregate}-{EMBEDDING_MAX_LENGTH}/{stride}"
+
+
+# -----------------------------
+# Batch planning
+# -----------------------------
+def plan_batches(
+    lengths: Sequence[int],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+) -> List[List[int]]:
+    """
+    Group row indices into length-sorted batches.
+    Rows are sorted longest first so every batch pads to a similar length, and a
+    batch is closed once it hits batch_size rows or max_batch_tokens padded tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_max = 0
+    for i in order:
+        padded_len = max(current_max, lengths[i])
+        if current and (
+            len(current) >= batch_size or padded_len * (len(current) + 1) > max_batch_tokens
+        ):
+            batches.append(current)
+            current, padded_len = [], lengths[i]
+        current.append(i)
+        current_max = padded_len
+    if current:
+        batches.append(current)
+    return batches
+
+
+class _ProgressReporter:
+    """Prints done/total, throughput and ETA at most every `interval` seconds."""
+
+    def __init__(self, total: int, label: str = "jobs", interval: float = 5.0):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    def update(self, n: int) -> None:
+        self.done += n
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval or self.done >= self.total:
+            self._last_report = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else float("inf")
+        print(
+            f"Embedded {self.done}/{self.total} {self.label} "
+            f"({rate:.1f} {self.label}/s, elapsed {elapsed:.0f}s, eta {remaining:.0f}s)"
+        )
+
+
+# -----------------------------
+# Single-process encoder
+# -----------------------------
+def encode_texts(
+    texts: Sequence[str],
+    encoder,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+    progress: Optional[_ProgressReporter] = None,
+    aggregate: str = EMBEDDING_CHUNK_AGGREGATE,
+    stride: int = EMBEDDING_WINDOW_STRIDE,
+) -> np.ndarray:
+    """
+    Encode many texts with dynamic, length-sorted batches on an EncoderBackend.
+    Unless aggregate is "none", texts longer than EMBEDDING_MAX_LENGTH tokens are
+    split into overlapping windows; the windows of all texts are batched together
+    and pooled per text afterwards.
+    Returns a float32 array of shape (len(texts), hidden) in the input order.
+    """
+    if aggregate not in CHUNK_AGGREGATES:
+        raise ValueError(f"Unknown chunk aggregate {aggregate!r}; expected one of {CHUNK_AGGREGATES}")
+    if not texts:
+        return np.zeros((0, encoder.dim), dtype=np.float32)
+
+    tokenizer = encoder.tokenizer
+    chunked = aggregate != "none"
+    # Tokenize once without padding; batches are padded on the fly.
+    encoded = tokenizer(
+        list(texts),
+        truncation=True,
+        max_length=EMBEDDING_MAX_LENGTH,
+        padding=False,
+        **({"stride": stride, "return_overflowing_tokens": True} if chunked else {}),
+    )
+    input_ids = encoded["input_ids"]
+    owners = encoded["overflow_to_sample_mapping"] if chunked else list(range(len(texts)))
+    lengths = [len(ids) for ids in input_ids]
+
+    # Progress counts texts, which finish once their last window is encoded
+    windows_left = np.bincount(owners, minlength=len(texts))
+    window_vecs = np.empty((len(input_ids), encoder.dim), dtype=np.float32)
+    for batch in plan_batches(lengths, batch_size, max_batch_tokens):
+        inputs = tokenizer.pad(
+            {"input_ids": [input_ids[i] for i in batch]}, return_tensors="np"
+        )
+        window_vecs[batch] = encoder.forward(inputs)
+        if progress is not None:
+            batch_owners = [owners[i] for i in batch]
+            np.subtract.at(windows_left, batch_owners, 1)
+            progress.update(int(np.count_nonzero(windows_left[np.unique(batch_owners)] == 0)))
+
+    if not chunked:
+        return window_vecs
+    return aggregate_windows(window_vecs, owners, lengths, len(texts), aggregate)
+
+
+# -----------------------------
+# Multi-process sharded encoder
+# -----------------------------
+_worker_encoder = None
+
+
+def _init_worker(model_name: str, backend: str, quantize: str, num_threads: int) -> None:
+    global _worker_encoder
+    from services.encoder_backends import load_encoder
+
+    _worker_encoder = load_encoder(model_name, backend, quantize, num_threads=num_threads)
+
+
+def _encode_shard(texts: List[str]) -> np.ndarray:
+    return encode_texts(texts, _worker_encoder)
+
+
+def encode_corpus(
+    texts: Sequence[str],
+    encoder,
+    num_workers: int = EMBEDDING_NUM_WORKERS,
+    num_threads: int = EMBEDDING_NUM_THREADS,
+) -> np.ndarray:
+    """
+    Encode a whole corpus, printing a progress/throughput report.
+    With num_workers > 1 the corpus is split into contiguous shards that are
+    encoded by a process pool (each worker loads its own copy of the same
+    encoder backend and gets an even share of the CPU threads); otherwise the
+    already loaded encoder is used in-process.
+    """
+    texts = list(texts)
+    total = len(texts)
+    start = time.perf_counter()
+    progress = _ProgressReporter(total)
+
+    if num_workers <= 1 or total < num_workers * EMBEDDING_BATCH_SIZE:
+        encoder.set_num_threads(num_threads)
+        embeddings = encode_texts(texts, encoder, progress=progress)
+    else:
+        threads_per_worker = num_threads or max(1, (os.cpu_count() or 1) // num_workers)
+        shard_size = -(-total // num_workers)
+        shards = [texts[i : i + shard_size] for i in range(0, total, shard_size)]
+        print(
+            f"Encoding {total} texts in {len(shards)} shards "
+            f"({encoder.label}, {threads_per_worker} threads per worker)..."
+        )
+        parts: List[np.ndarray] = []
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            # fork() after torch has spun up its thread pool can deadlock
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(encoder.model_name, encoder.name, encoder.quantize, threads_per_worker),
+        ) as pool:
+            # map() preserves shard order, so rows stay aligned with the corpus
+            for part in pool.map(_encode_shard, shards):
+                parts.append(part)
+                progress.update(len(part))
+        embeddings = np.concatenate(parts, axis=0)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"✓ Embedded {total} texts in {elapsed:.1f}s ({rate:.1f} texts/s)")
+    return embeddings
@@ -0,0 +1,127 @@
+"""
+Incremental ingestion of the job corpus into the embedding store.
+
+Store rows are keyed by content-addressed job IDs (see job_corpus.job_id), so a
+refresh only embeds postings whose title/description is new or changed, reuses
+every other vector by ID, and drops postings that are no longer in data/*.csv.
+The store is rewritten in corpus row order, so row i of the mmap'd matrix is
+always row i of the JobStore.
+
+The server runs the same sync at startup when the store and corpus disagree;
+running it after a scrape keeps that startup step a no-op.
+
+Usage (from backend/):
+    python -m services.corpus_ingest
+"""
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services import embedding_store
+from services.batch_encoder import encode_corpus, pooling_label
+from services.embedding_store import EmbeddingStoreError
+from services.job_corpus import DATA_DIR, load_jobs
+
+STORE_NAME = "job_embeddings"
+
+
+def store_path_for(folder_path: str = DATA_DIR) -> str:
+    return os.path.join(folder_path, STORE_NAME)
+
+
+def _existing_vectors(
+    store_path: str, model_name: str, pooling: str, corpus_ids: List[str]
+) -> Dict[str, np.ndarray]:
+    """ID -> stored (normalized) vector for a compatible store; empty if none is usable."""
+    try:
+        store = embedding_store.load_embedding_store(store_path, model_name=model_name, pooling=pooling)
+    except FileNotFoundError:
+        return {}
+    except EmbeddingStoreError as e:
+        print(f"Existing embedding store not reusable: {e}")
+        return {}
+
+    # Copy out of the mmap: the store file is replaced (not rewritten in place) below
+    matrix, ids = np.array(store.matrix), store.ids
+    del store
+    # Pre-ID stores were keyed by row position; trust them only if the row count still matches
+    if ids == [str(i) for i in range(len(ids))]:
+        if len(ids) != len(corpus_ids):
+            print("Row-indexed store does not match the corpus size; re-embedding everything")
+            return {}
+        ids = corpus_ids
+    return {job: matrix[row] for row, job in enumerate(ids)}
+
+
+def sync_embedding_store(
+    jobs,
+    encoder,
+    store_path: str,
+    model_name: str,
+    pooling: Optional[str] = None,
+) -> dict:
+    """
+    Make the store match the JobStore: embed only new/changed job IDs, reuse the
+    rest and drop removed ones. Returns counts of total/embedded/reused/removed rows.
+    """
+    pooling = pooling or pooling_label()
+    corpus_ids = list(jobs.ids)
+    existing = _existing_vectors(store_path, model_name, pooling, corpus_ids)
+
+    to_embed: Dict[str, str] = {}
+    for row, job in enumerate(corpus_ids):
+        if job not in existing and job not in to_embed:
+            to_embed[job] = jobs.description(row)
+
+    removed = len(set(existing) - set(corpus_ids))
+    reused = len(set(corpus_ids)) - len(to_embed)
+    print(f"Corpus sync: {len(to_embed)} new/changed, {reused} unchanged, {removed} removed")
+
+    start = time.perf_counter()
+    vectors = dict(existing)
+    if to_embed:
+        new_matrix = embedding_store.l2_normalize(encode_corpus(list(to_embed.values()), encoder))
+        vectors.update(zip(to_embed.keys(), new_matrix))
+
+    dim = len(next(iter(vectors.values()))) if vectors else encoder.dim
+    matrix = np.empty((len(corpus_ids), dim), dtype=np.float32)
+    for row, job in enumerate(corpus_ids):
+        matrix[row] = vectors[job]
+
+    embedding_store.save_embedding_store(store_path, matrix, corpus_ids, model_name, pooling=pooling)
+    print(f"✓ Synced {len(corpus_ids)} embeddings to {store_path}.npy in {time.perf_counter() - start:.1f}s")
+    return {"total": len(corpus_ids), "embedded": len(to_embed), "reused": reused, "removed": removed}
+
+
+def store_matches_corpus(store_path: str, jobs, model_name: str, pooling: Optional[str] = None) -> bool:
+    """True when the store holds exactly the JobStore's IDs, in row order, for this model/pooling."""
+    try:
+        store = embedding_store.load_embedding_store(
+            store_path, model_name=model_name, expected_count=len(jobs), pooling=pooling or pooling_label()
+        )
+    except (FileNotFoundError, EmbeddingStoreError):
+        return False
+    return store.ids == list(jobs.ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+
+    from services.embedding_service import HF_MODEL_NAME
+    from services.encoder_backends import load_encoder
+
+    jobs, _, _ = load_jobs(args.data_dir)
+    if jobs.empty:
+        print("No valid data found in CSV files.")
+        return
+    print(f"✓ Loaded {len(jobs)} job records")
+    sync_embedding_store(jobs, load_encoder(HF_MODEL_NAME), store_path_for(args.data_dir), HF_MODEL_NAME)
+
+
+if __name__ == "__main__":
+    main()
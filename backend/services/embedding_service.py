@@ -1,124 +1,239 @@
-import glob
+import asyncio
+import contextvars
+import functools
+import logging
 import os
-import pickle
-from typing import Any, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Tuple
 from dotenv import load_dotenv
-import openai
-import pandas as pd
-from sqlalchemy.orm import Session
-import torch
-from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import numpy as np
 
-from core.database import SessionLocal
+from core.metrics import (
+    ENCODE_SECONDS,
+    SIMILARITY_SECONDS,
+    THREADPOOL_TASKS,
+    THREADPOOL_WORKERS,
+    timed,
+)
 from models.assessment import (
     FollowUpAnswers,
     GeneratedQuestion,
     UserTest,
 )
 from services.scoring_service import calculate_score
+from services import llm_gateway
+from services import embedding_store
+from services import vector_index
+from services.vector_index import ExactIndex, IVFPQIndex
+from services.job_enrichment import enrich_jobs
+from services.job_corpus import DATA_DIR, load_jobs
+from services.batch_encoder import pooling_label
+from services import corpus_ingest
+from services.profile_cache import (
+    get_cached_profile,
+    get_cached_profiles,
+    profile_data_hash,
+    store_profile,
+    store_profiles,
+)
+
+logger = logging.getLogger(__name__)
 
 # -----------------------------
-# Env & OpenAI client
+# Env & inference pool
 # -----------------------------
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file.")
 
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# Model inference is CPU-bound: run it on a small dedicated pool so the event
+# loop stays free and concurrent requests queue here instead of oversubscribing
+# torch's own intra-op threads.
+INFERENCE_MAX_WORKERS = int(os.getenv("INFERENCE_MAX_WORKERS", "2"))
+_inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_MAX_WORKERS, thread_name_prefix="inference"
+)
+THREADPOOL_WORKERS.labels(pool="inference").set(INFERENCE_MAX_WORKERS)
+# Profile texts generated concurrently per /cohort-profile-match request.
+COHORT_MAX_CONCURRENCY = int(os.getenv("COHORT_MAX_CONCURRENCY", "8"))
 
 # -----------------------------
 # Global variables - Now initialized as None
 # -----------------------------
-_tokenizer = None
-_model = None
-df = pd.DataFrame()
-job_embeddings = []
+HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+_encoder = None  # EncoderBackend (torch / onnx, optionally int8), see EMBEDDING_BACKEND
+_jobs = None  # JobStore of all postings once the corpus stage is done
+job_sources = {}  # canonical job_id -> CSV rows ("file:row") collapsed into it by dedup
+job_embeddings = np.zeros((0, 0), dtype=np.float32)  # (num_jobs, dim), L2-normalized rows
+_index = None  # VectorIndex over job_embeddings, built once at startup
+
+# -----------------------------
+# Staged readiness
+# -----------------------------
+# Startup runs in the background in this order; each stage goes
+# pending -> loading -> ready (or failed, with the error kept for /health).
+STAGES = ("model", "corpus", "index")
+_readiness_lock = threading.Lock()
+_readiness = {stage: {"state": "pending"} for stage in STAGES}
+
+
+def _set_stage(stage: str, state: str, **info) -> None:
+    with _readiness_lock:
+        entry = _readiness[stage]
+        if state == "loading":
+            entry["started_at"] = time.time()
+        elif "started_at" in entry:
+            entry["seconds"] = round(time.time() - entry["started_at"], 2)
+        entry["state"] = state
+        entry.update(info)
+
+
+def get_readiness() -> Dict[str, Any]:
+    """Per-stage startup state plus overall progress, for /health."""
+    with _readiness_lock:
+        stages = {
+            stage: {k: v for k, v in entry.items() if k != "started_at"}
+            for stage, entry in _readiness.items()
+        }
+    done = sum(1 for s in stages.values() if s["state"] == "ready")
+    if any(s["state"] == "failed" for s in stages.values()):
+        status = "failed"
+    elif done == len(STAGES):
+        status = "ready"
+    else:
+        status = "starting"
+    return {"status": status, "progress": round(done / len(STAGES), 2), "stages": stages}
+
+
+def is_stage_ready(stage: str) -> bool:
+    with _readiness_lock:
+        return _readiness[stage]["state"] == "ready"
+
 
 def initialize_ai_models():
-    """Initialize AI models and load job data - call this on server startup"""
-    global _tokenizer, _model, df, job_embeddings
-    
-    print("Initializing AI models...")
-    
-    # Load HF model
-    hf_model_name = "sentence-transformers/all-MiniLM-L6-v2"
-    _tokenizer = AutoTokenizer.from_pretrained(hf_model_name)
-    _model = AutoModel.from_pretrained(hf_model_name)
-    print("✓ HuggingFace model loaded")
-    
-    # Load job data
-    folder_path = "data"
-    csv_files = glob.glob(f"{folder_path}/*.csv")
-    dfs: List[pd.DataFrame] = []
-
-    for file in csv_files:
-        try:
-            df_temp = pd.read_csv(file)
-            if not df_temp.empty:
-                dfs.append(df_temp)
-        except pd.errors.EmptyDataError:
-            print(f"Skipping empty file: {file}")
-            continue
+    """
+    Initialize AI models and load job data - blocking; on server startup this
+    runs in a background thread while the app already serves requests.
+    """
+    global _encoder, _jobs, job_sources, job_embeddings, _index
 
-    if dfs:
-        df = pd.concat(dfs, ignore_index=True)
-        print(f"✓ Loaded {len(df)} job records")
-        
-        # Try to load pre-generated embeddings
-        embeddings_file = os.path.join(folder_path, "job_embeddings.pkl")
-        if os.path.exists(embeddings_file):
-            print("Loading pre-generated embeddings...")
-            try:
-                with open(embeddings_file, 'rb') as f:
-                    job_embeddings = pickle.load(f)
-                print(f"✓ Loaded {len(job_embeddings)} pre-generated embeddings")
-            except Exception as e:
-                print(f"Error loading embeddings: {e}. Regenerating...")
-                job_embeddings = _generate_and_save_embeddings(df, embeddings_file)
-        else:
-            # Generate and save embeddings for first time
-            job_embeddings = _generate_and_save_embeddings(df, embeddings_file)
-    else:
-        print("No valid data found in CSV files.")
-        df = pd.DataFrame()
-    
-    print("✓ Server startup complete - Ready for requests!")
-
-def _generate_and_save_embeddings(df, embeddings_file):
-    """Generate embeddings and save to file"""
-    print("Generating embeddings for all job descriptions...")
-    print("This will take a while (5-15 minutes)...")
-    
-    job_descriptions = df["Full Job Description"].astype(str)
-    
-    # Show progress
-    total = len(job_descriptions)
-    embeddings = []
-    
-    for i, job_desc in enumerate(job_descriptions):
-        if i % 100 == 0:  # Print progress every 100 jobs
-            print(f"Processing {i}/{total} jobs...")
-        embeddings.append(get_embeddings(job_desc))
-    
-    # Save to file
+    print("Initializing AI models...")
+    stage = "model"
     try:
-        with open(embeddings_file, 'wb') as f:
-            pickle.dump(embeddings, f)
-        print(f"✓ Saved {len(embeddings)} embeddings to {embeddings_file}")
+        # Load HF model (heavy imports happen here, not when the app is imported)
+        _set_stage("model", "loading")
+        from services.encoder_backends import load_encoder
+
+        _encoder = load_encoder(HF_MODEL_NAME)
+        _set_stage("model", "ready", name=HF_MODEL_NAME, backend=_encoder.label)
+        print(f"✓ HuggingFace model loaded ({_encoder.label} backend)")
+
+        # Load job data
+        stage = "corpus"
+        _set_stage("corpus", "loading")
+        folder_path = DATA_DIR
+        corpus, job_sources, dedup_report = load_jobs(folder_path)
+        if corpus.empty:
+            print("No valid data found in CSV files.")
+        else:
+            print(f"✓ Loaded {len(corpus)} job records")
+        _set_stage(
+            "corpus", "ready", jobs=len(corpus), dedup=dedup_report, memory=corpus.memory_usage()
+        )
+
+        # Embeddings + vector index; the job store is published last so
+        # matching never sees a corpus without its index
+        stage = "index"
+        _set_stage("index", "loading")
+        if not corpus.empty:
+            job_embeddings = _load_or_build_embeddings(corpus, folder_path)
+            _index = _load_or_build_index(job_embeddings, folder_path)
+        _jobs = corpus
+        _set_stage("index", "ready", backend=getattr(_index, "backend", None))
     except Exception as e:
-        print(f"Error saving embeddings: {e}")
-    
-    return embeddings
+        _set_stage(stage, "failed", error=str(e))
+        print(f"Error initializing AI models ({stage}): {e}")
+        raise
+
+    print("✓ AI models and job index ready")
+
+def _load_or_build_embeddings(jobs, folder_path):
+    """
+    Memory-map the float32 embedding store (keyed by job ID, in corpus row order),
+    migrating a legacy pickle first. When the store does not match the corpus,
+    only new/changed postings are embedded (see services/corpus_ingest.py).
+    """
+    store_path = corpus_ingest.store_path_for(folder_path)
+    legacy_pkl = os.path.join(folder_path, "job_embeddings.pkl")
+
+    if not embedding_store.exists(store_path) and os.path.exists(legacy_pkl):
+        print("Migrating legacy job_embeddings.pkl to float32 store...")
+        try:
+            # The pickle was built from truncated single-window embeddings
+            embedding_store.migrate_legacy_pickle(
+                legacy_pkl, store_path, HF_MODEL_NAME, pooling=pooling_label("none")
+            )
+        except Exception as e:
+            print(f"Error migrating legacy embeddings: {e}")
+
+    if not corpus_ingest.store_matches_corpus(store_path, jobs, HF_MODEL_NAME):
+        print("Embedding store is out of date with the corpus. Syncing...")
+        corpus_ingest.sync_embedding_store(jobs, _encoder, store_path, HF_MODEL_NAME)
+
+    store = embedding_store.load_embedding_store(
+        store_path, model_name=HF_MODEL_NAME, expected_count=len(jobs), pooling=pooling_label()
+    )
+    print(f"✓ Memory-mapped {len(store)} pre-generated embeddings")
+    return store.matrix
+
+def _load_or_build_index(matrix, folder_path):
+    """
+    Exact scan for small corpora; for large ones load (or train and save) an
+    IVF-PQ index that re-scores its shortlist against the mmap'd matrix.
+    """
+    backend = vector_index.choose_backend(len(matrix))
+    if backend == ExactIndex.backend:
+        print(f"✓ Using exact vector index over {len(matrix)} jobs")
+        return ExactIndex(matrix, normalized=True)
+
+    index_path = os.path.join(folder_path, "job_index")
+    store_mtime = os.path.getmtime(corpus_ingest.store_path_for(folder_path) + ".npy")
+    meta = vector_index.read_index_meta(index_path)
+    if (
+        meta
+        and meta["backend"] == backend
+        and meta["count"] == len(matrix)
+        and meta["created_at"] >= int(store_mtime)
+    ):
+        try:
+            index = vector_index.load_index(index_path, refine_matrix=matrix)
+            print(f"✓ Loaded {backend} vector index over {len(index)} jobs")
+            return index
+        except Exception as e:
+            print(f"Error loading vector index: {e}. Rebuilding...")
+
+    index = IVFPQIndex(refine_matrix=matrix).build(matrix)
+    index.save(index_path)
+
+    # Report recall against the exact scan on perturbed corpus rows
+    rng = np.random.default_rng(0)
+    sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), min(200, len(matrix)), replace=False))])
+    queries = sample + rng.normal(scale=0.05, size=sample.shape).astype(np.float32)
+    recall, p99_ms = vector_index.measure_recall(index, ExactIndex(matrix, normalized=True), queries)
+    print(
+        f"✓ Built {backend} vector index over {len(index)} jobs "
+        f"(recall@10 {recall:.3f}, p99 {p99_ms:.2f} ms, nprobe {index.nprobe})"
+    )
+    return index
 
 # -----------------------------
 # Helper function to check if models are loaded
 # -----------------------------
 def _ensure_models_loaded():
     """Ensure models are loaded before using them"""
-    if _tokenizer is None or _model is None:
+    if _encoder is None:
         raise Exception("AI models not initialized. Call initialize_ai_models() first.")
 
 # -----------------------------
@@ -126,111 +241,152 @@ def _ensure_models_loaded():
 # -----------------------------
 def get_embeddings(text: str):
     """
-    Turn text into an embedding using the HF model.
+    Turn text into an embedding using the configured encoder backend.
     Returns a Python list (JSON-serializable).
     """
     _ensure_models_loaded()
-    
-    inputs = _tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    with torch.no_grad():
-        outputs = _model(**inputs)
-    # Simple mean pooling
-    emb = outputs.last_hidden_state.mean(dim=1)  # [1, hidden]
-    return emb.squeeze(0).cpu().numpy().tolist()
+    # Masked mean pooling; long texts are windowed like the job corpus (EMBEDDING_CHUNK_AGGREGATE)
+    with timed(ENCODE_SECONDS, "encode", mode="single"):
+        return _encoder.encode([text])[0].tolist()
+
+def encode_batch(texts: List[str]) -> np.ndarray:
+    """Encode many texts in one length-sorted batched pass."""
+    _ensure_models_loaded()
+    with timed(ENCODE_SECONDS, "encode", mode="batch"):
+        return _encoder.encode(texts)
+
+def search_jobs(query: np.ndarray, top_n: int):
+    """Top-n (rows, scores) for one query vector."""
+    with timed(SIMILARITY_SECONDS, "similarity", mode="single"):
+        return _index.search(query, top_n)
+
+def search_jobs_batch(queries: np.ndarray, top_n: int):
+    """Top-n (rows, scores) per query row."""
+    with timed(SIMILARITY_SECONDS, "similarity", mode="batch"):
+        return _index.search_batch(queries, top_n)
+
+async def run_inference(fn, *args):
+    """Run a CPU-bound model/scoring call on the bounded inference executor."""
+    loop = asyncio.get_running_loop()
+    # Carry the request context along so stage timings are attributed to it
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    tasks = THREADPOOL_TASKS.labels(pool="inference")
+    tasks.inc()
+    try:
+        return await loop.run_in_executor(_inference_executor, call)
+    finally:
+        tasks.dec()
+
+async def get_embeddings_async(text: str):
+    """get_embeddings without blocking the event loop."""
+    return await run_inference(get_embeddings, text)
 
 # -----------------------------
 # OpenAI call function
 # -----------------------------
-def call_openai(prompt: str, max_tokens=2000, temperature=0.2) -> str:
+async def call_openai(prompt: str, max_tokens=2000, temperature=0.2, kind: str = "generic") -> str:
     """
     Generate a descriptive profile text from OpenAI based on a prompt.
+    `kind` labels the latency/token metrics.
     """
-    resp = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an assistant that returns clean, concise outputs. "
-                    "Write in a professional, neutral tone; avoid buzzwords."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
+    return await llm_gateway.complete(
+        prompt,
+        system=(
+            "You are an assistant that returns clean, concise outputs. "
+            "Write in a professional, neutral tone; avoid buzzwords."
+        ),
         max_tokens=max_tokens,
         temperature=temperature,
+        kind=kind,
     )
-    return resp.choices[0].message.content.strip()
 
 # -----------------------------
 # Data aggregation for a user
 # -----------------------------
-def get_user_embedding_data(user_test_id: int) -> Dict[str, Any]:
+def _user_data_query():
+    """The user test, its follow-up answers and each answer's correct option (outer joins keep users with no answers)."""
+    return (
+        select(
+            UserTest,
+            FollowUpAnswers.question_id,
+            FollowUpAnswers.selected_option,
+            GeneratedQuestion.answer,
+        )
+        .outerjoin(FollowUpAnswers, FollowUpAnswers.user_test_id == UserTest.id)
+        .outerjoin(GeneratedQuestion, GeneratedQuestion.id == FollowUpAnswers.question_id)
+        .order_by(FollowUpAnswers.id)
+    )
+
+
+def _build_combined_data(user_test_id: int, rows) -> Dict[str, Any]:
+    """combined_data from one user's rows of _user_data_query()."""
+    user_res = rows[0][0]
+
+    # 1) Build results for scoring
+    results: List[Dict[str, Any]] = []
+    for _, question_id, selected_option, correct_answer in rows:
+        if question_id is None:
+            continue
+        results.append(
+            {
+                "question_id": question_id,
+                "selected_option": selected_option,
+                "answer": correct_answer,
+                "is_correct": correct_answer is not None and correct_answer == selected_option,
+            }
+        )
+
+    # 2) Calculate score (how true the skill reflection is)
+    score = calculate_score(results)
+
+    # 3) Normalize programmingLanguages to a list (in case stored as JSON/text)
+    prog_langs = user_res.programmingLanguages
+    if isinstance(prog_langs, str):
+        # naive split fallback; replace with json.loads if you store JSON text
+        prog_langs = [p.strip() for p in prog_langs.split(",") if p.strip()]
+
+    combined_data = {
+        "user_test_id": user_test_id,
+        "user_responses": {
+            "educationLevel": getattr(user_res, "educationLevel", None),
+            "cgpa": getattr(user_res, "cgpa", None),
+            "major": getattr(user_res, "major", None),
+            "programmingLanguages": prog_langs,
+            "courseworkExperience": getattr(user_res, "courseworkExperience", None),
+            "skillReflection": getattr(user_res, "skillReflection", None),
+        },
+        "follow_up_results": results,
+        "score": score,
+    }
+    return combined_data
+
+
+async def get_user_embedding_data(db: AsyncSession, user_test_id: int) -> Dict[str, Any]:
     """
     Fetch user responses and follow-up results; compute score; build combined_data.
     score reflects how consistent/true the skillReflection is relative to follow-up answers.
     """
-    db: Session = SessionLocal()
-    try:
-        # 1) Fetch user responses (ORM model)
-        user_res = (
-            db.query(UserTest).filter(UserTest.id == user_test_id).first()
-        )
-        if not user_res:
-            return {"error": f"No user responses found for user_test_id {user_test_id}"}
-
-        # 2) Fetch follow-up answers
-        follow_ups = (
-            db.query(FollowUpAnswers)
-            .filter(FollowUpAnswers.user_test_id == user_test_id)
-            .all()
+    # One round-trip for the user test and all its answers
+    rows = (await db.execute(_user_data_query().where(UserTest.id == user_test_id))).all()
+    if not rows:
+        return {"error": f"No user responses found for user_test_id {user_test_id}"}
+    return _build_combined_data(user_test_id, rows)
+
+
+async def get_users_embedding_data(db: AsyncSession, user_test_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """get_user_embedding_data for many users in one query; unknown IDs map to an error dict."""
+    rows = (await db.execute(_user_data_query().where(UserTest.id.in_(user_test_ids)))).all()
+    grouped: Dict[int, list] = {}
+    for row in rows:
+        grouped.setdefault(row[0].id, []).append(row)
+    return {
+        user_test_id: (
+            _build_combined_data(user_test_id, grouped[user_test_id])
+            if user_test_id in grouped
+            else {"error": f"No user responses found for user_test_id {user_test_id}"}
         )
-
-        # 3) Build results for scoring
-        results: List[Dict[str, Any]] = []
-        for f in follow_ups:
-            correct_q = (
-                db.query(GeneratedQuestion)
-                .filter(GeneratedQuestion.id == f.question_id)
-                .first()
-            )
-            is_correct = bool(
-                correct_q and correct_q.answer == f.selected_option
-            )
-            results.append(
-                {
-                    "question_id": f.question_id,
-                    "selected_option": f.selected_option,
-                    "answer": correct_q.answer if correct_q else None,
-                    "is_correct": is_correct,
-                }
-            )
-
-        # 4) Calculate score (how true the skill reflection is)
-        score = calculate_score(results)
-
-        # 5) Normalize programmingLanguages to a list (in case stored as JSON/text)
-        prog_langs = user_res.programmingLanguages
-        if isinstance(prog_langs, str):
-            # naive split fallback; replace with json.loads if you store JSON text
-            prog_langs = [p.strip() for p in prog_langs.split(",") if p.strip()]
-
-        combined_data = {
-            "user_test_id": user_test_id,
-            "user_responses": {
-                "educationLevel": getattr(user_res, "educationLevel", None),
-                "cgpa": getattr(user_res, "cgpa", None),
-                "major": getattr(user_res, "major", None),
-                "programmingLanguages": prog_langs,
-                "courseworkExperience": getattr(user_res, "courseworkExperience", None),
-                "skillReflection": getattr(user_res, "skillReflection", None),
-            },
-            "follow_up_results": results,
-            "score": score,
-        }
-        return combined_data
-    finally:
-        db.close()
+        for user_test_id in user_test_ids
+    }
 
 
 # -----------------------------
@@ -252,26 +408,48 @@ def _build_profile_prompt(combined_data: Dict[str, Any]) -> str:
     )
 
 
-def generate_user_profile_text(combined_data: Dict[str, Any]) -> str:
+def _profile_encoder_key() -> str:
+    """Model, backend and pooling behind user embeddings: changing any must miss the profile cache."""
+    return f"{HF_MODEL_NAME}|{_encoder.label}|{pooling_label()}"
+
+
+async def generate_user_profile_text(combined_data: Dict[str, Any]) -> str:
     prompt = _build_profile_prompt(combined_data)
-    return call_openai(prompt)
+    return await call_openai(prompt, kind="profile")
 
 
 # -----------------------------
 # Create user embedding
 # -----------------------------
-def create_user_embedding(user_test_id: int) -> Dict[str, Any]:
+async def create_user_embedding(db: AsyncSession, user_test_id: int) -> Dict[str, Any]:
     """
     1) Collect combined_data (user responses + follow-up results + score)
     2) Generate descriptive profile text via OpenAI
     3) Convert profile text into an embedding via HF encoder
+    Steps 2-3 are skipped when the same assessment state was profiled before.
     """
-    combined_data = get_user_embedding_data(user_test_id)
+    combined_data = await get_user_embedding_data(db, user_test_id)
     if "error" in combined_data:
+        await db.commit()
         return combined_data
 
-    profile_text = generate_user_profile_text(combined_data)
-    user_embedding = get_embeddings(profile_text)
+    data_hash = profile_data_hash(combined_data, _profile_encoder_key())
+    cached = await get_cached_profile(db, user_test_id, data_hash)
+    # End the read transaction so the connection goes back to the pool during the OpenAI call
+    await db.commit()
+
+    if cached is not None:
+        profile_text, embedding = cached
+        user_embedding = embedding.tolist()
+    else:
+        profile_text = await generate_user_profile_text(combined_data)
+        user_embedding = await get_embeddings_async(profile_text)
+        try:
+            await store_profile(db, user_test_id, data_hash, profile_text, user_embedding)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error("Error caching user profile: %s", e)
 
     return {
         "user_test_id": user_test_id,
@@ -283,138 +461,229 @@ def create_user_embedding(user_test_id: int) -> Dict[str, Any]:
 # -----------------------------
 # Match user to job 
 # -----------------------------
-def match_user_to_job(
+async def match_user_to_job(
     user_test_id: int,
     user_embedding: List[float], use_openai_summary: bool = True, # new flag to control summary generation
+    top_n: int = 3,
 ) -> Dict[str, Any]:
     """
     Compare user embedding to all job embeddings using cosine similarity.
-    df and job_embeddings are now global, no need to pass them.
+    The job store and the vector index are global, no need to pass them.
     """
 
-    global df, job_embeddings  # use the global variables defined when loading CSVs
-
-    if df.empty or not job_embeddings:
+    if _jobs is None or _jobs.empty or _index is None or len(_index) == 0:
         return {"error": "No jobs or embeddings available."}
 
-    # Convert to numpy
-    user_vec = np.array(user_embedding).reshape(1, -1)  # (1, dim)
-    job_matrix = np.array(job_embeddings)  # (num_jobs, dim)
+    # Exact matvec + argpartition, or IVF-PQ for large corpora
+    top_indices, top_scores = await run_inference(search_jobs, np.asarray(user_embedding), top_n)
+
+    enriched = await _enrich_job_rows([int(idx) for idx in top_indices], use_openai_summary)
+    return {"top_matches": _build_top_matches(user_test_id, top_indices, top_scores, enriched)}
 
-    # Compute cosine similarity
-    similarities = cosine_similarity(user_vec, job_matrix)[0]  # shape: (num_jobs,)
 
-    # Get indices of top 3 jobs (sorted by similarity score)
-    top_n = 3
-    top_indices = np.argsort(similarities)[-top_n:][::-1]  # descending order
+async def _enrich_job_rows(rows: List[int], use_openai_summary: bool = True) -> Dict[int, dict]:
+    """
+    Enrichment (clean description, skills, knowledge) for each distinct job row,
+    all rows concurrently; descriptions are decoded only for these rows.
+    Rows without enrichment map to their raw description.
+    """
+    rows = list(dict.fromkeys(rows))
+    jobs = {row: _jobs.job(row) for row in rows}
+    enriched = {
+        row: {
+            "job_description": job["description"],
+            "required_skills": ["Enable OpenAI extraction for detailed skills"],
+            "required_knowledge": ["Enable OpenAI extraction for detailed knowledge"],
+        }
+        for row, job in jobs.items()
+    }
+
+    # Enrich all top jobs concurrently (cached per job content + prompt version)
+    to_enrich = [
+        row for row, job in jobs.items()
+        if use_openai_summary and job["description"] not in ("", "nan")
+    ]
+    if to_enrich:
+        try:
+            results = await enrich_jobs(
+                [{"title": jobs[row]["title"], "description": jobs[row]["description"]} for row in to_enrich],
+                call_openai,
+            )
+            enriched.update(zip(to_enrich, results))
+        except Exception as e:
+            logger.error("OpenAI enrichment error: %s", e)
+            for row in to_enrich:
+                enriched[row] = {
+                    "job_description": jobs[row]["description"],
+                    "required_skills": ["Failed to extract skills"],
+                    "required_knowledge": ["Failed to extract knowledge"],
+                }
+    return enriched
+
 
-    # Collect job info
+def _build_top_matches(user_test_id: int, top_indices, top_scores, enriched: Dict[int, dict]) -> List[dict]:
     top_matches = []
-    for idx in top_indices:
-        job = df.iloc[idx]
-        similarity_score = float(similarities[idx])
+    for idx, score in zip(top_indices, top_scores):
+        row = int(idx)
+        similarity_score = float(score)
         similarity_percentage = round(similarity_score * 100, 2)
-        job_desc = job.get("Full Job Description", "N/A")
-        
-        # Initialize variables for skills and knowledge
-        required_skills = []
-        required_knowledge = []
-        
-        # Generate cleaned/comprehensive description using OpenAI
-        if use_openai_summary and job_desc != "N/A":
-            try:
-                summary_prompt = (
-                    "Extract a clear, comprehensive job description from the text below. "
-                    "Focus on responsibilities. "
-                    "Write it concisely in a professional tone (1 paragraph).\n\n"
-                    f"JOB DESCRIPTION TEXT:\n{job_desc}\n\n"
-                    "Return only the cleaned-up job description without any additional text."
-                )
-                
-                skills_prompt = (
-                    "ANALYZE THIS JOB DESCRIPTION AND EXTRACT ALL REQUIRED SKILLS:\n\n"
-                    f"{job_desc}\n\n"
-                    "EXTRACTION RULES:\n"
-                    "1. Extract BOTH technical skills (programming languages, tools, software) AND soft skills (communication, leadership, teamwork)\n"
-                    "2. Return ONLY a comma-separated list without any additional text\n"
-                    "3. Be specific - if it mentions 'Python', include 'Python', not just 'programming'\n"
-                    "4. Include skills mentioned in requirements, qualifications, or responsibilities sections\n"
-                    "5. Remove duplicates and keep the most specific term\n\n"
-                    "EXAMPLE OUTPUT: Python, Java, SQL, React, AWS, Communication, Teamwork, Problem Solving\n\n"
-                    "EXTRACTED SKILLS:"
-                )
-                
-                knowledge_prompt = (
-                    "ANALYZE THIS JOB DESCRIPTION AND EXTRACT ALL REQUIRED KNOWLEDGE AREAS:\n\n"
-                    f"{job_desc}\n\n"
-                    "EXTRACTION RULES:\n"
-                    "1. Extract knowledge domains, subject matter expertise, and specialized areas\n"
-                    "2. Include things like: algorithms, data structures, machine learning, web development, cybersecurity, etc.\n"
-                    "3. Return ONLY a comma-separated list without any additional text\n"
-                    "4. Focus on knowledge requirements, not just skills\n"
-                    "5. Remove duplicates\n\n"
-                    "EXAMPLE OUTPUT: Algorithms, Data Structures, Machine Learning, Web Development, Database Systems, Cloud Computing\n\n"
-                    "EXTRACTED KNOWLEDGE:"
-                )
-                
-                print(f"Processing job {idx} with OpenAI...")
-                
-                # Get job description summary
-                job_desc = call_openai(summary_prompt, max_tokens=800)
-                
-                # Extract skills with retry logic
-                try:
-                    skills_response = call_openai(skills_prompt, max_tokens=300)
-                    print(f"Raw skills response: {skills_response}")
-                    required_skills = [skill.strip() for skill in skills_response.split(',') if skill.strip()]
-                except Exception as skills_error:
-                    print(f"Skills extraction failed for job {idx}: {skills_error}")
-                    required_skills = ["Error extracting skills"]
-                
-                # Extract knowledge with retry logic
-                try:
-                    knowledge_response = call_openai(knowledge_prompt, max_tokens=300)
-                    print(f"Raw knowledge response: {knowledge_response}")
-                    required_knowledge = [knowledge.strip() for knowledge in knowledge_response.split(',') if knowledge.strip()]
-                except Exception as knowledge_error:
-                    print(f"Knowledge extraction failed for job {idx}: {knowledge_error}")
-                    required_knowledge = ["Error extracting knowledge"]
-                
-                # Debug prints after extraction
-                print(f"Extracted skills for job {idx}: {required_skills}")
-                print(f"Extracted knowledge for job {idx}: {required_knowledge}")
-                
-            except Exception as e:
-                print(f"OpenAI error for job index {idx}: {e}")
-                # fallback to original
-                job_desc = job.get("Full Job Description", "N/A")
-                required_skills = ["Failed to extract skills"]
-                required_knowledge = ["Failed to extract knowledge"]
-        else:
-            # If not using OpenAI summary, still try to extract basic info
-            job_desc = job.get("Full Job Description", "N/A")
-            required_skills = ["Enable OpenAI extraction for detailed skills"]
-            required_knowledge = ["Enable OpenAI extraction for detailed knowledge"]
-
         top_matches.append(
             {
                 "user_test_id": int(user_test_id),
-                "job_index": int(idx),
+                "job_index": row,
                 "similarity_score": similarity_score,
                 "similarity_percentage": similarity_percentage,
-                "job_title": job.get("Title", "N/A"),
-                "job_description": job_desc,
-                "required_skills": required_skills,
-                "required_knowledge": required_knowledge
+                "job_title": _jobs.title(row) or "N/A",
+                "job_description": enriched[row]["job_description"],
+                "required_skills": enriched[row]["required_skills"],
+                "required_knowledge": enriched[row]["required_knowledge"]
             }
         )
-    
-    return {"top_matches": top_matches}
+    return top_matches
+
+# -----------------------------
+# Streaming match
+# -----------------------------
+async def stream_user_profile_match(
+    db: AsyncSession,
+    user_test_id: int,
+    top_n: int = 3,
+    use_openai_summary: bool = True,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    create_user_embedding + match_user_to_job as (event, data) pairs, emitted as
+    each stage completes: "profile", one "match" per job with its raw description,
+    one "enrichment" per job as its LLM calls finish, then "done" (or "error").
+    """
+    start = time.perf_counter()
+    if _jobs is None or _jobs.empty or _index is None or len(_index) == 0:
+        yield "error", {"error": "No jobs or embeddings available."}
+        return
+
+    user_data = await create_user_embedding(db, user_test_id)
+    if "error" in user_data:
+        yield "error", {"error": user_data["error"]}
+        return
+    yield "profile", {"user_test_id": user_test_id, "profile_text": user_data["profile_text"]}
+
+    top_indices, top_scores = await run_inference(
+        search_jobs, np.asarray(user_data["user_embedding"]), top_n
+    )
+    rows = [int(idx) for idx in top_indices]
+    raw = {
+        row: {"job_description": _jobs.description(row), "required_skills": None, "required_knowledge": None}
+        for row in rows
+    }
+    for match in _build_top_matches(user_test_id, top_indices, top_scores, raw):
+        yield "match", match
+
+    async def _enrich(row: int):
+        return row, (await _enrich_job_rows([row], use_openai_summary))[row]
+
+    for next_done in asyncio.as_completed([_enrich(row) for row in dict.fromkeys(rows)]):
+        row, enriched = await next_done
+        yield "enrichment", {"job_index": row, **enriched}
+
+    yield "done", {"user_test_id": user_test_id, "seconds": round(time.perf_counter() - start, 3)}
+
+
+# -----------------------------
+# Cohort matching
+# -----------------------------
+async def match_cohort(
+    db: AsyncSession,
+    user_test_ids: List[int],
+    top_n: int = 3,
+    use_openai_summary: bool = True,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Profile-match many users at once, yielding one dict per user and a final summary:
+    1) one query for every user's answers, one for their cached profiles
+    2) missing profile texts generated concurrently (COHORT_MAX_CONCURRENCY)
+    3) one batched encode of the new texts and one batched index search
+    4) one enrichment pass over the union of matched jobs
+    """
+    start = time.perf_counter()
+    user_test_ids = list(dict.fromkeys(user_test_ids))
+    errors = 0
+
+    if _jobs is None or _jobs.empty or _index is None or len(_index) == 0:
+        yield {"done": True, "users": len(user_test_ids), "errors": len(user_test_ids),
+               "error": "No jobs or embeddings available."}
+        return
+
+    user_data = await get_users_embedding_data(db, user_test_ids)
+    valid = []
+    for user_test_id in user_test_ids:
+        if "error" in user_data[user_test_id]:
+            errors += 1
+            yield {"user_test_id": user_test_id, "error": user_data[user_test_id]["error"]}
+        else:
+            valid.append(user_test_id)
+
+    encoder_key = _profile_encoder_key()
+    data_hashes = {uid: profile_data_hash(user_data[uid], encoder_key) for uid in valid}
+    cached = await get_cached_profiles(db, data_hashes)
+    # End the read transaction so the connection goes back to the pool during the OpenAI calls
+    await db.commit()
+
+    profiles = {uid: entry[0] for uid, entry in cached.items()}
+    embeddings = {uid: entry[1] for uid, entry in cached.items()}
+
+    missing = [uid for uid in valid if uid not in cached]
+    semaphore = asyncio.Semaphore(COHORT_MAX_CONCURRENCY)
+
+    async def _generate(user_test_id: int) -> str:
+        async with semaphore:
+            return await generate_user_profile_text(user_data[user_test_id])
+
+    texts = await asyncio.gather(*(_generate(uid) for uid in missing), return_exceptions=True)
+    generated = []
+    for user_test_id, text in zip(missing, texts):
+        if isinstance(text, Exception):
+            errors += 1
+            yield {"user_test_id": user_test_id, "error": f"Profile generation failed: {text}"}
+        else:
+            profiles[user_test_id] = text
+            generated.append(user_test_id)
+
+    if generated:
+        matrix = await run_inference(encode_batch, [profiles[uid] for uid in generated])
+        embeddings.update(zip(generated, matrix))
+        try:
+            await store_profiles(
+                db, {uid: (data_hashes[uid], profiles[uid], embeddings[uid]) for uid in generated}
+            )
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error("Error caching user profiles: %s", e)
+
+    matched = [uid for uid in valid if uid in profiles]
+    if matched:
+        queries = np.stack([np.asarray(embeddings[uid], dtype=np.float32) for uid in matched])
+        top_indices, top_scores = await run_inference(search_jobs_batch, queries, top_n)
+        enriched = await _enrich_job_rows([int(idx) for idx in np.ravel(top_indices)], use_openai_summary)
+        for user_test_id, indices, scores in zip(matched, top_indices, top_scores):
+            yield {
+                "user_test_id": user_test_id,
+                "profile_text": profiles[user_test_id],
+                "top_matches": _build_top_matches(user_test_id, indices, scores, enriched),
+            }
+
+    yield {
+        "done": True,
+        "users": len(user_test_ids),
+        "errors": errors,
+        "profiles_cached": len(cached),
+        "profiles_generated": len(generated),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
 
 # -----------------------------
 # Check if everything is loaded
 # -----------------------------
 def is_initialized() -> bool:
     """Check if AI models and data are loaded"""
-    return _tokenizer is not None and _model is not None and not df.empty
+    return all(is_stage_ready(stage) for stage in STAGES)
 
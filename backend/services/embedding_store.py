@@ -0,0 +1,152 @@
+import json
+import os
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# -----------------------------
+# On-disk layout
+# -----------------------------
+# <base>.npy        float32 (count, dim) matrix, rows L2-normalized, loaded via mmap
+# <base>.ids.txt    one job ID per line, line i <-> matrix row i
+# <base>.meta.json  header: format version, model name, pooling, dims, count
+FORMAT_VERSION = 1
+
+
+class EmbeddingStoreError(Exception):
+    """Raised when an on-disk store is missing pieces or does not match the corpus."""
+
+
+class EmbeddingStore:
+    """Read-only view over a saved job-embedding matrix and its row IDs."""
+
+    def __init__(self, matrix: np.ndarray, ids: List[str], header: dict):
+        self.matrix = matrix
+        self.ids = ids
+        self.header = header
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+
+def _paths(base_path: str):
+    return f"{base_path}.npy", f"{base_path}.ids.txt", f"{base_path}.meta.json"
+
+
+def exists(base_path: str) -> bool:
+    return all(os.path.exists(p) for p in _paths(base_path))
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of `matrix` with unit-length rows (zero rows stay zero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def save_embedding_store(
+    base_path: str,
+    embeddings: np.ndarray,
+    ids: Sequence[str],
+    model_name: str,
+    pooling: Optional[str] = None,
+) -> None:
+    """Normalize and write the matrix, ID sidecar and header; each file is replaced atomically."""
+    matrix = l2_normalize(embeddings)
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise EmbeddingStoreError(
+            f"Embedding matrix {matrix.shape} does not match {len(ids)} IDs"
+        )
+
+    npy_path, ids_path, meta_path = _paths(base_path)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_name": model_name,
+        "pooling": pooling,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "dtype": "float32",
+        "normalized": True,
+        "created_at": int(time.time()),
+    }
+
+    with open(npy_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    with open(ids_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(str(i) for i in ids))
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+    # Header last: a store without a readable header is treated as missing.
+    os.replace(npy_path + ".tmp", npy_path)
+    os.replace(ids_path + ".tmp", ids_path)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def load_embedding_store(
+    base_path: str,
+    model_name: Optional[str] = None,
+    expected_count: Optional[int] = None,
+    pooling: Optional[str] = None,
+) -> EmbeddingStore:
+    """
+    Memory-map a saved store (zero-copy, read-only) after validating its header.
+    Raises FileNotFoundError if the store does not exist and EmbeddingStoreError
+    if it was written by another format version / model / pooling or for a
+    different corpus.
+    """
+    npy_path, ids_path, meta_path = _paths(base_path)
+    if not exists(base_path):
+        raise FileNotFoundError(f"No embedding store at {base_path}")
+
+    with open(meta_path, encoding="utf-8") as f:
+        header = json.load(f)
+
+    if header.get("format_version") != FORMAT_VERSION:
+        raise EmbeddingStoreError(
+            f"Unsupported store format {header.get('format_version')} (expected {FORMAT_VERSION})"
+        )
+    if model_name is not None and header.get("model_name") != model_name:
+        raise EmbeddingStoreError(
+            f"Store was built with {header.get('model_name')}, not {model_name}"
+        )
+    if pooling is not None and header.get("pooling") != pooling:
+        raise EmbeddingStoreError(
+            f"Store was pooled as {header.get('pooling')}, not {pooling}"
+        )
+    if expected_count is not None and header.get("count") != expected_count:
+        raise EmbeddingStoreError(
+            f"Store has {header.get('count')} rows but the corpus has {expected_count}"
+        )
+
+    matrix = np.load(npy_path, mmap_mode="r")
+    if matrix.dtype != np.float32 or matrix.shape != (header["count"], header["dim"]):
+        raise EmbeddingStoreError(
+            f"Matrix {matrix.dtype}{matrix.shape} does not match header"
+        )
+
+    with open(ids_path, encoding="utf-8") as f:
+        ids = f.read().split("\n") if header["count"] else []
+    if len(ids) != header["count"]:
+        raise EmbeddingStoreError(f"ID sidecar has {len(ids)} rows, header says {header['count']}")
+
+    return EmbeddingStore(matrix, ids, header)
+
+
+def migrate_legacy_pickle(
+    pkl_path: str, base_path: str, model_name: str, pooling: Optional[str] = None
+) -> None:
+    """Convert an old pickled list-of-lists into the mmap store (row index used as ID)."""
+    import pickle
+
+    with open(pkl_path, "rb") as f:
+        embeddings = np.asarray(pickle.load(f), dtype=np.float32)
+    save_embedding_store(
+        base_path, embeddings, [str(i) for i in range(len(embeddings))], model_name, pooling
+    )
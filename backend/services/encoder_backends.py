@@ -0,0 +1,225 @@
+"""
+Pluggable sentence-encoder backends for all-MiniLM-style models.
+
+Every backend takes the same padded numpy batch (input_ids + attention_mask)
+and returns mask-aware mean-pooled float32 embeddings, so tokenization,
+batching and pooling stay shared in services/batch_encoder.py.
+
+    torch        full-precision PyTorch (default)
+    torch:int8   torch.quantization.quantize_dynamic over the Linear layers
+    onnx         ONNX Runtime on an export of the same checkpoint
+    onnx:int8    ONNX Runtime with dynamically int8-quantized weights
+
+The ONNX graph is exported (and quantized) once into ONNX_CACHE_DIR; after
+that, onnx backends need neither torch nor transformers' model code at runtime.
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+import numpy as np
+
+# -----------------------------
+# Config (env overridable)
+# -----------------------------
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# "none" or "int8" (dynamic quantization of weights; activations stay float)
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "none").lower()
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join("data", "onnx"))
+ONNX_OPSET = 17
+
+BACKENDS = ("torch", "onnx")
+QUANTIZATIONS = ("none", "int8")
+
+
+def numpy_mean_pool(last_hidden_state: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Mean of the token embeddings, ignoring padded positions."""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (last_hidden_state * mask).sum(axis=1)
+    return (summed / np.clip(mask.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+
+class EncoderBackend(ABC):
+    """Tokenizer + a forward pass from padded token ids to pooled embeddings."""
+
+    name = "base"
+
+    def __init__(self, model_name: str, quantize: str = "none"):
+        from transformers import AutoTokenizer
+
+        if quantize not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantize!r}; expected one of {QUANTIZATIONS}")
+        self.model_name = model_name
+        self.quantize = quantize
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.dim = 0
+
+    @property
+    def label(self) -> str:
+        return self.name if self.quantize == "none" else f"{self.name}:{self.quantize}"
+
+    def set_num_threads(self, num_threads: int) -> None:
+        """Intra-op CPU threads (0 = leave the runtime default)."""
+
+    @abstractmethod
+    def forward(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """(batch, seq) input_ids/attention_mask -> (batch, dim) float32 pooled embeddings."""
+        ...
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        """Encode texts with length-sorted dynamic batches (see batch_encoder.encode_texts)."""
+        from services.batch_encoder import encode_texts
+
+        return encode_texts(texts, self, **kwargs)
+
+
+# -----------------------------
+# PyTorch
+# -----------------------------
+class TorchBackend(EncoderBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str, quantize: str = "none", num_threads: int = 0):
+        super().__init__(model_name, quantize)
+        import torch
+        from transformers import AutoModel
+
+        self.set_num_threads(num_threads)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        if quantize == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.dim = model.config.hidden_size
+
+    def set_num_threads(self, num_threads: int) -> None:
+        if num_threads > 0:
+            import torch
+
+            torch.set_num_threads(num_threads)
+
+    def forward(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        import torch
+
+        from services.batch_encoder import mean_pool
+
+        with torch.inference_mode():
+            input_ids = torch.from_numpy(inputs["input_ids"])
+            attention_mask = torch.from_numpy(inputs["attention_mask"])
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+            return mean_pool(outputs.last_hidden_state, attention_mask).cpu().numpy()
+
+
+# -----------------------------
+# ONNX Runtime
+# -----------------------------
+def _onnx_paths(model_name: str, cache_dir: str) -> Dict[str, str]:
+    folder = os.path.join(cache_dir, model_name.replace("/", "__"))
+    return {
+        "folder": folder,
+        "none": os.path.join(folder, "model.onnx"),
+        "int8": os.path.join(folder, "model.int8.onnx"),
+    }
+
+
+def export_onnx(model_name: str, cache_dir: str = ONNX_CACHE_DIR, quantize: str = "none") -> str:
+    """Export the HF checkpoint to ONNX (and its int8 variant) once; returns the model path."""
+    paths = _onnx_paths(model_name, cache_dir)
+    if not os.path.exists(paths["none"]):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        print(f"Exporting {model_name} to ONNX...")
+        os.makedirs(paths["folder"], exist_ok=True)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        sample = AutoTokenizer.from_pretrained(model_name)(["export sample"], return_tensors="pt")
+        dynamic = {0: "batch", 1: "sequence"}
+        tmp_path = paths["none"] + ".tmp"
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                tmp_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "last_hidden_state": dynamic},
+                opset_version=ONNX_OPSET,
+            )
+        os.replace(tmp_path, paths["none"])
+        print(f"✓ Exported {paths['none']}")
+
+    if quantize == "int8" and not os.path.exists(paths["int8"]):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = paths["int8"] + ".tmp"
+        quantize_dynamic(paths["none"], tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, paths["int8"])
+        print(f"✓ Quantized {paths['int8']}")
+
+    return paths[quantize]
+
+
+class OnnxBackend(EncoderBackend):
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: str = "none",
+        num_threads: int = 0,
+        cache_dir: str = ONNX_CACHE_DIR,
+    ):
+        super().__init__(model_name, quantize)
+        self.model_path = export_onnx(model_name, cache_dir, quantize)
+        self.num_threads = num_threads
+        self._open_session()
+
+    def _open_session(self) -> None:
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads > 0:
+            options.intra_op_num_threads = self.num_threads
+        self.session = ort.InferenceSession(
+            self.model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def set_num_threads(self, num_threads: int) -> None:
+        # Thread count is fixed per session; reopen only when it changes
+        if num_threads > 0 and num_threads != self.num_threads:
+            self.num_threads = num_threads
+            self._open_session()
+
+    def forward(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        feed = {k: np.asarray(v, dtype=np.int64) for k, v in inputs.items() if k in self._input_names}
+        (last_hidden_state,) = self.session.run(["last_hidden_state"], feed)
+        return numpy_mean_pool(last_hidden_state, feed["attention_mask"])
+
+
+# -----------------------------
+# Factory
+# -----------------------------
+def parse_backend_spec(spec: str) -> tuple:
+    """'onnx:int8' -> ('onnx', 'int8'); 'torch' -> ('torch', 'none')."""
+    backend, _, quantize = spec.lower().partition(":")
+    return backend, quantize or "none"
+
+
+def load_encoder(
+    model_name: str,
+    backend: Optional[str] = None,
+    quantize: Optional[str] = None,
+    num_threads: int = 0,
+) -> EncoderBackend:
+    """Build the configured encoder backend (EMBEDDING_BACKEND / EMBEDDING_QUANTIZE by default)."""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    quantize = (quantize or EMBEDDING_QUANTIZE).lower()
+    if backend == "torch":
+        return TorchBackend(model_name, quantize, num_threads=num_threads)
+    if backend == "onnx":
+        return OnnxBackend(model_name, quantize, num_threads=num_threads)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected one of {BACKENDS}")
@@ -0,0 +1,133 @@
+"""
+Offline pre-enrichment of the whole job corpus.
+
+Runs the summary/skills/knowledge prompts for every posting in data/*.csv and
+writes the results to the same SQLite store that match_user_to_job reads, so
+with ENRICHMENT_OFFLINE_ONLY=true the request path makes no LLM calls for job
+data. The run is resumable: postings already in the store for the current
+PROMPT_VERSION are skipped, and results are committed every --checkpoint-every
+jobs, so an interrupted run loses at most one checkpoint of work.
+
+Usage (from backend/):
+    python -m services.enrichment_pipeline --concurrency 8
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+from services import llm_gateway
+from services.job_corpus import DATA_DIR, load_jobs
+from services.job_enrichment import (
+    PROMPT_VERSION,
+    EnrichmentCache,
+    LLMCall,
+    enrich_job,
+)
+
+
+async def run_pipeline(
+    call_llm: LLMCall,
+    folder_path: str = DATA_DIR,
+    cache: Optional[EnrichmentCache] = None,
+    concurrency: int = 8,
+    checkpoint_every: int = 50,
+    limit: Optional[int] = None,
+) -> dict:
+    """Enrich every not-yet-enriched posting; returns counts of done/skipped/failed jobs."""
+    cache = cache or EnrichmentCache()
+    jobs, _, _ = load_jobs(folder_path)
+    if jobs.empty:
+        print("No valid data found in CSV files.")
+        return {"total": 0, "enriched": 0, "skipped": 0, "failed": 0}
+
+    done = cache.known_hashes(PROMPT_VERSION)
+    all_hashes, todo = set(), {}
+    # The enrichment cache is keyed by job ID (hash of title + description)
+    for h, desc in zip(jobs.ids, jobs.descriptions):
+        if not desc.strip() or desc == "nan":
+            continue
+        all_hashes.add(h)
+        if h not in done:
+            todo.setdefault(h, desc)
+    skipped = len(all_hashes) - len(todo)
+    work = list(todo.items())[:limit] if limit else list(todo.items())
+    print(f"{len(work)} postings to enrich ({skipped} already in store, prompt v{PROMPT_VERSION})")
+
+    pending_writes: List[tuple] = []
+    enriched = failed = 0
+    start = time.perf_counter()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def enrich_one(h: str, desc: str):
+        async with slots:
+            return h, await enrich_job(desc, call_llm)
+
+    # Bounded window: at most 2x concurrency tasks exist at any time
+    work_iter = iter(work)
+    in_flight = {}  # task -> job hash
+
+    def submit_next() -> None:
+        item = next(work_iter, None)
+        if item is not None:
+            in_flight[asyncio.create_task(enrich_one(*item))] = item[0]
+
+    for _ in range(concurrency * 2):
+        submit_next()
+
+    while in_flight:
+        finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            job_hash = in_flight.pop(task)
+            try:
+                pending_writes.append(task.result())
+                enriched += 1
+            except Exception as e:
+                failed += 1
+                print(f"Enrichment failed for job {job_hash[:12]}: {e}")
+            submit_next()
+
+        if len(pending_writes) >= checkpoint_every:
+            await asyncio.to_thread(cache.put_many, pending_writes, PROMPT_VERSION)
+            pending_writes = []
+            elapsed = time.perf_counter() - start
+            print(
+                f"Checkpoint: {enriched + failed}/{len(work)} jobs "
+                f"({enriched / elapsed:.2f} jobs/s, {failed} failed)"
+            )
+
+    if pending_writes:
+        cache.put_many(pending_writes, PROMPT_VERSION)
+
+    print(f"✓ Enriched {enriched} postings in {time.perf_counter() - start:.0f}s ({failed} failed)")
+    return {"total": len(jobs), "enriched": enriched, "skipped": skipped, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--concurrency", type=int, default=8, help="jobs enriched in parallel")
+    parser.add_argument("--checkpoint-every", type=int, default=50)
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--limit", type=int, default=None, help="only enrich the first N pending jobs")
+    args = parser.parse_args()
+
+    # A batch run should wait out rate limits rather than give up: more retries, no per-call deadline
+    llm_gateway.LLM_MAX_RETRIES = args.max_retries
+    llm_gateway.LLM_DEADLINE_SECONDS = 0
+    # Same system prompt as the request path, so cached outputs match.
+    from services.embedding_service import call_openai
+
+    asyncio.run(
+        run_pipeline(
+            call_openai,
+            folder_path=args.data_dir,
+            concurrency=args.concurrency,
+            checkpoint_every=args.checkpoint_every,
+            limit=args.limit,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
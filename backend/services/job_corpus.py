@@ -0,0 +1,215 @@
+import glob
+import hashlib
+import os
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from services.job_store import JOB_STORE_CHUNK_ROWS, JOB_STORE_DESCRIPTIONS_ON_DISK, JobStore, JobStoreBuilder
+
+# Folder of scraped CSVs (benchmarks point it at a synthetic corpus)
+DATA_DIR = os.getenv("JOB_DATA_DIR", "data")
+DESCRIPTION_COLUMN = "Full Job Description"
+TITLE_COLUMN = "Title"
+CLASSIFICATION_COLUMN = "Job Classification"
+SUBCLASSIFICATION_COLUMN = "Job SubClassification"
+# Everything else in the scraped CSVs is never read
+USED_COLUMNS = (TITLE_COLUMN, CLASSIFICATION_COLUMN, SUBCLASSIFICATION_COLUMN, DESCRIPTION_COLUMN)
+
+# -----------------------------
+# Dedup config (env overridable)
+# -----------------------------
+CORPUS_DEDUP = os.getenv("CORPUS_DEDUP", "true").lower() == "true"
+# Estimated Jaccard similarity of description shingles above which two postings are one job
+CORPUS_NEAR_DUP_THRESHOLD = float(os.getenv("CORPUS_NEAR_DUP_THRESHOLD", "0.9"))
+# ...provided their titles also share at least this fraction of words (boilerplate
+# descriptions are common to unrelated postings)
+CORPUS_NEAR_DUP_TITLE_THRESHOLD = float(os.getenv("CORPUS_NEAR_DUP_TITLE_THRESHOLD", "0.5"))
+MINHASH_PERMUTATIONS = 128
+# 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+LSH_BANDS = 16
+SHINGLE_WORDS = 5
+
+
+def job_id(title: str, job_desc: str) -> str:
+    """
+    Content-addressed job ID: stable across CSV order, file renames and re-scrapes,
+    and changes whenever the posting's title or description does.
+    """
+    return hashlib.sha256(f"{title}\n{job_desc}".encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Streaming load
+# -----------------------------
+def _cell(value) -> str:
+    # Same str() conversion the corpus has always used (missing -> "nan")
+    return str(value)
+
+
+def _stream_rows(folder_path: str):
+    """Yield (source, title, classification, subclassification, description) per CSV row, chunk by chunk."""
+    import pandas as pd  # heavy; imported on first load rather than with the app
+
+    for file in sorted(glob.glob(f"{folder_path}/*.csv")):
+        name = os.path.basename(file)
+        try:
+            reader = pd.read_csv(
+                file, usecols=lambda c: c in USED_COLUMNS, dtype=str, chunksize=JOB_STORE_CHUNK_ROWS
+            )
+            row = 0
+            for chunk in reader:
+                if DESCRIPTION_COLUMN not in chunk.columns:
+                    print(f"Skipping {file}: no '{DESCRIPTION_COLUMN}' column")
+                    break
+                n = len(chunk)
+                missing = [float("nan")] * n
+                columns = [
+                    chunk[c].tolist() if c in chunk.columns else missing
+                    for c in (TITLE_COLUMN, CLASSIFICATION_COLUMN, SUBCLASSIFICATION_COLUMN, DESCRIPTION_COLUMN)
+                ]
+                if TITLE_COLUMN not in chunk.columns:
+                    columns[0] = [""] * n
+                for offset, (title, cls, subcls, desc) in enumerate(zip(*columns)):
+                    yield f"{name}:{row + offset}", _cell(title), _cell(cls), _cell(subcls), _cell(desc)
+                row += n
+        except pd.errors.EmptyDataError:
+            print(f"Skipping empty file: {file}")
+            continue
+
+
+# -----------------------------
+# Deduplication
+# -----------------------------
+def _words(text: str) -> List[str]:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    """32-bit hashes of the normalized description's word 5-grams."""
+    words = _words(text)
+    if len(words) < SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i : i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64)
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = MINHASH_PERMUTATIONS, seed: int = 0) -> np.ndarray:
+    """(len(texts), num_perm) MinHash signatures over word shingles."""
+    rng = np.random.default_rng(seed)
+    # Multiply-shift hashing: (a * h + b) mod 2^64, keep the high 32 bits. a and b must
+    # span the full 64 bits; small ones leave small shingle hashes as the minimum of
+    # every permutation, which makes unrelated postings look identical.
+    a = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64, endpoint=False) | np.uint64(1)
+    b = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64, endpoint=False)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for i, text in enumerate(texts):
+            hashes = _shingle_hashes(text)[:, None]
+            signatures[i] = ((hashes * a + b) >> np.uint64(32)).min(axis=0)
+    return signatures
+
+
+def _similar_titles(a: str, b: str, threshold: float) -> bool:
+    words_a, words_b = set(_words(a)), set(_words(b))
+    if not words_a or not words_b:
+        return words_a == words_b
+    return len(words_a & words_b) / len(words_a | words_b) >= threshold
+
+
+def near_duplicate_groups(
+    texts: Sequence[str],
+    titles: Sequence[str],
+    threshold: float = CORPUS_NEAR_DUP_THRESHOLD,
+    title_threshold: float = CORPUS_NEAR_DUP_TITLE_THRESHOLD,
+    bands: int = LSH_BANDS,
+) -> List[int]:
+    """
+    MinHash/LSH clustering: returns, for each text, the index of the first text
+    in its near-duplicate cluster (itself when it is unique). Texts shorter than
+    one shingle (missing, "nan", stubs) are never clustered, and a pair only
+    merges when the titles are similar too.
+    """
+    parent = list(range(len(texts)))
+    eligible = [i for i, text in enumerate(texts) if len(_words(text)) >= SHINGLE_WORDS]
+    if not eligible:
+        return parent
+    signatures = minhash_signatures([texts[i] for i in eligible])
+    rows_per_band = signatures.shape[1] // bands
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        chunk = signatures[:, band * rows_per_band : (band + 1) * rows_per_band]
+        for k, key in enumerate(chunk):
+            buckets.setdefault(key.tobytes(), []).append(k)
+        for members in buckets.values():
+            first = eligible[members[0]]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(eligible[other])
+                if root_a == root_b:
+                    continue
+                # Verify the candidate pair on the full signature and the titles
+                if np.mean(signatures[members[0]] == signatures[other]) >= threshold and _similar_titles(
+                    titles[first], titles[eligible[other]], title_threshold
+                ):
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    return [find(i) for i in range(len(texts))]
+
+
+def load_jobs(
+    folder_path: str = DATA_DIR,
+    dedupe: bool = CORPUS_DEDUP,
+    near_threshold: float = CORPUS_NEAR_DUP_THRESHOLD,
+    title_threshold: float = CORPUS_NEAR_DUP_TITLE_THRESHOLD,
+) -> Tuple[JobStore, Dict[str, List[str]], dict]:
+    """
+    Stream every jobstreet CSV in folder_path into a JobStore, keeping only the
+    columns the app uses. With dedupe, exact duplicates (same job_id) are dropped
+    while streaming and near-duplicates (MinHash/LSH over description shingles,
+    with similar titles) are folded into their first occurrence afterwards.
+    Postings without a usable description are only ever dropped as exact duplicates.
+    Returns (store, canonical job_id -> source rows "file:row", counts).
+    """
+    builder = JobStoreBuilder()
+    sources: Dict[str, List[str]] = {}
+    rows = 0
+    for source, title, cls, subcls, desc in _stream_rows(folder_path):
+        rows += 1
+        jid = job_id(title, desc)
+        if dedupe and jid in sources:
+            sources[jid].append(source)
+            continue
+        sources.setdefault(jid, []).append(source)
+        builder.append(jid, title, cls, subcls, desc)
+
+    store = builder.build()
+    report = {"rows": rows, "exact_duplicates": rows - len(store), "near_duplicates": 0, "unique": len(store)}
+
+    if dedupe and not store.empty:
+        canonical_row = near_duplicate_groups(store.descriptions, store.titles, near_threshold, title_threshold)
+        keep = [i for i, root in enumerate(canonical_row) if i == root]
+        if len(keep) < len(store):
+            for i, root in enumerate(canonical_row):
+                if i != root:
+                    sources[store.ids[root]].extend(sources.pop(store.ids[i]))
+            store = store.take(keep)
+        report["near_duplicates"] = report["unique"] - len(store)
+        report["unique"] = len(store)
+        print(
+            f"✓ Deduplicated {report['rows']} job rows to {report['unique']} postings "
+            f"({report['exact_duplicates']} exact, {report['near_duplicates']} near duplicates removed)"
+        )
+
+    if JOB_STORE_DESCRIPTIONS_ON_DISK and not store.empty:
+        store.spill_descriptions()
+    return store, sources, report
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from services.job_corpus import job_id
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Config
+# -----------------------------
+# Bump whenever a prompt below changes so cached results are not reused.
+PROMPT_VERSION = "1"
+ENRICHMENT_CACHE_PATH = os.getenv("ENRICHMENT_CACHE_PATH", os.path.join("data", "job_enrichment.sqlite"))
+# Concurrent OpenAI calls per match request (3 prompts x top_n jobs).
+ENRICHMENT_MAX_CONCURRENCY = int(os.getenv("ENRICHMENT_MAX_CONCURRENCY", "9"))
+# When the corpus has been pre-enriched offline, never call the LLM on the request path.
+ENRICHMENT_OFFLINE_ONLY = os.getenv("ENRICHMENT_OFFLINE_ONLY", "false").lower() == "true"
+
+
+# -----------------------------
+# Prompts
+# -----------------------------
+def build_summary_prompt(job_desc: str) -> str:
+    return (
+        "Extract a clear, comprehensive job description from the text below. "
+        "Focus on responsibilities. "
+        "Write it concisely in a professional tone (1 paragraph).\n\n"
+        f"JOB DESCRIPTION TEXT:\n{job_desc}\n\n"
+        "Return only the cleaned-up job description without any additional text."
+    )
+
+
+def build_skills_prompt(job_desc: str) -> str:
+    return (
+        "ANALYZE THIS JOB DESCRIPTION AND EXTRACT ALL REQUIRED SKILLS:\n\n"
+        f"{job_desc}\n\n"
+        "EXTRACTION RULES:\n"
+        "1. Extract BOTH technical skills (programming languages, tools, software) AND soft skills (communication, leadership, teamwork)\n"
+        "2. Return ONLY a comma-separated list without any additional text\n"
+        "3. Be specific - if it mentions 'Python', include 'Python', not just 'programming'\n"
+        "4. Include skills mentioned in requirements, qualifications, or responsibilities sections\n"
+        "5. Remove duplicates and keep the most specific term\n\n"
+        "EXAMPLE OUTPUT: Python, Java, SQL, React, AWS, Communication, Teamwork, Problem Solving\n\n"
+        "EXTRACTED SKILLS:"
+    )
+
+
+def build_knowledge_prompt(job_desc: str) -> str:
+    return (
+        "ANALYZE THIS JOB DESCRIPTION AND EXTRACT ALL REQUIRED KNOWLEDGE AREAS:\n\n"
+        f"{job_desc}\n\n"
+        "EXTRACTION RULES:\n"
+        "1. Extract knowledge domains, subject matter expertise, and specialized areas\n"
+        "2. Include things like: algorithms, data structures, machine learning, web development, cybersecurity, etc.\n"
+        "3. Return ONLY a comma-separated list without any additional text\n"
+        "4. Focus on knowledge requirements, not just skills\n"
+        "5. Remove duplicates\n\n"
+        "EXAMPLE OUTPUT: Algorithms, Data Structures, Machine Learning, Web Development, Database Systems, Cloud Computing\n\n"
+        "EXTRACTED KNOWLEDGE:"
+    )
+
+
+def _split_list(response: str) -> List[str]:
+    return [item.strip() for item in response.split(",") if item.strip()]
+
+
+def job_row_hash(title: str, job_desc: str) -> str:
+    """Stable key for a posting's content, independent of its row position (= its job ID)."""
+    return job_id(title, job_desc)
+
+
+# -----------------------------
+# Persistent cache (SQLite)
+# -----------------------------
+class EnrichmentCache:
+    """job_hash + prompt_version -> (description, skills, knowledge)."""
+
+    def __init__(self, path: str = ENRICHMENT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS job_enrichment (
+                    job_hash TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    skills TEXT NOT NULL,
+                    knowledge TEXT NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    PRIMARY KEY (job_hash, prompt_version)
+                )"""
+            )
+        return self._conn
+
+    def get_many(self, job_hashes: List[str], prompt_version: str = PROMPT_VERSION) -> Dict[str, dict]:
+        if not job_hashes:
+            return {}
+        placeholders = ",".join("?" for _ in job_hashes)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT job_hash, description, skills, knowledge FROM job_enrichment "
+                f"WHERE prompt_version = ? AND job_hash IN ({placeholders})",
+                [prompt_version, *job_hashes],
+            ).fetchall()
+        return {
+            h: {"job_description": d, "required_skills": json.loads(s), "required_knowledge": json.loads(k)}
+            for h, d, s, k in rows
+        }
+
+    def put(self, job_hash: str, result: dict, prompt_version: str = PROMPT_VERSION) -> None:
+        self.put_many([(job_hash, result)], prompt_version)
+
+    def put_many(self, items: List[tuple], prompt_version: str = PROMPT_VERSION) -> None:
+        """Insert (job_hash, result) pairs in a single transaction."""
+        now = int(time.time())
+        rows = [
+            (
+                job_hash,
+                prompt_version,
+                result["job_description"],
+                json.dumps(result["required_skills"]),
+                json.dumps(result["required_knowledge"]),
+                now,
+            )
+            for job_hash, result in items
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO job_enrichment VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def known_hashes(self, prompt_version: str = PROMPT_VERSION) -> Set[str]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT job_hash FROM job_enrichment WHERE prompt_version = ?", (prompt_version,)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+
+LLMCall = Callable[..., Awaitable[str]]
+
+
+async def enrich_job(job_desc: str, call_llm: LLMCall) -> dict:
+    """Run the three prompts for one job concurrently; raises on any failure (offline pipeline)."""
+    summary, skills, knowledge = await asyncio.gather(
+        call_llm(build_summary_prompt(job_desc), max_tokens=800, kind="job_summary"),
+        call_llm(build_skills_prompt(job_desc), max_tokens=300, kind="job_skills"),
+        call_llm(build_knowledge_prompt(job_desc), max_tokens=300, kind="job_knowledge"),
+    )
+    return {
+        "job_description": summary,
+        "required_skills": _split_list(skills),
+        "required_knowledge": _split_list(knowledge),
+    }
+
+
+_cache = EnrichmentCache()
+_llm_slots = asyncio.Semaphore(ENRICHMENT_MAX_CONCURRENCY)
+
+
+async def _bounded(call_llm: LLMCall, prompt: str, max_tokens: int, kind: str) -> str:
+    async with _llm_slots:
+        return await call_llm(prompt, max_tokens=max_tokens, kind=kind)
+
+
+# -----------------------------
+# Enrichment
+# -----------------------------
+async def enrich_jobs(jobs: List[dict], call_llm: LLMCall) -> List[dict]:
+    """
+    Cleaned description, skills and knowledge for each job ({"title", "description"}).
+    Cached jobs are served from the SQLite cache; for the rest all prompts of all
+    jobs run concurrently. Only fully successful results are cached.
+    """
+    hashes = [job_row_hash(j["title"], j["description"]) for j in jobs]
+    # SQLite calls are quick but blocking; keep them off the event loop
+    cached = await asyncio.to_thread(_cache.get_many, list(set(hashes)))
+
+    pending = {}
+    for h, job in zip(hashes, jobs):
+        if h in cached or h in pending:
+            continue
+        if ENRICHMENT_OFFLINE_ONLY:
+            cached[h] = {
+                "job_description": job["description"],
+                "required_skills": ["Skills not yet extracted"],
+                "required_knowledge": ["Knowledge not yet extracted"],
+            }
+            continue
+        pending[h] = job["description"]
+
+    # Every prompt of every pending job in flight at once (bounded by _llm_slots)
+    calls = []
+    for desc in pending.values():
+        calls += [
+            _bounded(call_llm, build_summary_prompt(desc), 800, "job_summary"),
+            _bounded(call_llm, build_skills_prompt(desc), 300, "job_skills"),
+            _bounded(call_llm, build_knowledge_prompt(desc), 300, "job_knowledge"),
+        ]
+    responses = await asyncio.gather(*calls, return_exceptions=True)
+
+    to_store = []
+    for n, (h, desc) in enumerate(pending.items()):
+        summary_r, skills_r, knowledge_r = responses[3 * n : 3 * n + 3]
+        ok = True
+        if isinstance(summary_r, BaseException):
+            logger.warning("Summary extraction failed for job %s: %s", h[:12], summary_r)
+            description, ok = desc, False
+        else:
+            description = summary_r
+        if isinstance(skills_r, BaseException):
+            logger.warning("Skills extraction failed for job %s: %s", h[:12], skills_r)
+            skills, ok = ["Error extracting skills"], False
+        else:
+            skills = _split_list(skills_r)
+        if isinstance(knowledge_r, BaseException):
+            logger.warning("Knowledge extraction failed for job %s: %s", h[:12], knowledge_r)
+            knowledge, ok = ["Error extracting knowledge"], False
+        else:
+            knowledge = _split_list(knowledge_r)
+
+        result = {"job_description": description, "required_skills": skills, "required_knowledge": knowledge}
+        cached[h] = result
+        if ok:
+            to_store.append((h, result))
+
+    if to_store:
+        try:
+            await asyncio.to_thread(_cache.put_many, to_store)
+        except sqlite3.Error as e:
+            logger.error("Error caching job enrichment: %s", e)
+
+    logger.info("Job enrichment: %d cached, %d generated", len(set(hashes)) - len(pending), len(pending))
+    return [cached[h] for h in hashes]
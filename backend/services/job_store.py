@@ -0,0 +1,185 @@
+"""
+Compact, read-only in-memory job corpus.
+
+Replaces the concatenated pandas DataFrame: per job only the ID, an interned
+title and two small category codes stay as Python/numpy objects, while the
+long descriptions live in one UTF-8 byte blob addressed by an offsets array
+and are decoded only for the rows that are actually returned (top-k matches).
+The blob can also be spilled to disk and memory-mapped
+(JOB_STORE_DESCRIPTIONS_ON_DISK), so descriptions cost no resident memory
+until they are read.
+"""
+import os
+import sys
+from collections.abc import Sequence as SequenceABC
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# -----------------------------
+# Config (env overridable)
+# -----------------------------
+JOB_STORE_CHUNK_ROWS = int(os.getenv("JOB_STORE_CHUNK_ROWS", "5000"))
+JOB_STORE_DESCRIPTIONS_ON_DISK = os.getenv("JOB_STORE_DESCRIPTIONS_ON_DISK", "false").lower() == "true"
+JOB_STORE_BLOB_PATH = os.getenv("JOB_STORE_BLOB_PATH", os.path.join("data", "job_descriptions.bin"))
+
+
+class _Interner:
+    """Small categorical column: value <-> int32 code."""
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = list(values or [])
+        self._codes: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+
+class _Descriptions(SequenceABC):
+    """Lazy sequence view over the description blob (decodes one row per access)."""
+
+    def __init__(self, store: "JobStore"):
+        self._store = store
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._store.description(i) for i in range(*row.indices(len(self)))]
+        return self._store.description(row)
+
+
+class JobStore:
+    """Columnar job corpus; row i lines up with row i of the embedding store."""
+
+    def __init__(
+        self,
+        ids: List[str],
+        titles: List[str],
+        classification_codes: np.ndarray,
+        subclassification_codes: np.ndarray,
+        classifications: List[str],
+        subclassifications: List[str],
+        blob: np.ndarray,
+        offsets: np.ndarray,
+    ):
+        self.ids = ids
+        self.titles = titles
+        self.classification_codes = classification_codes
+        self.subclassification_codes = subclassification_codes
+        self.classifications = classifications
+        self.subclassifications = subclassifications
+        self.blob = blob  # uint8, possibly an np.memmap
+        self.offsets = offsets  # int64, len(ids) + 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.ids) == 0
+
+    def description(self, row: int) -> str:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    @property
+    def descriptions(self) -> _Descriptions:
+        """All descriptions as a lazy sequence; materialize with list() only when needed."""
+        return _Descriptions(self)
+
+    def title(self, row: int) -> str:
+        return self.titles[row]
+
+    def classification(self, row: int) -> str:
+        return self.classifications[self.classification_codes[row]]
+
+    def subclassification(self, row: int) -> str:
+        return self.subclassifications[self.subclassification_codes[row]]
+
+    def job(self, row: int) -> dict:
+        """One posting as a dict (decodes its description)."""
+        return {
+            "job_id": self.ids[row],
+            "title": self.titles[row],
+            "classification": self.classification(row),
+            "subclassification": self.subclassification(row),
+            "description": self.description(row),
+        }
+
+    def take(self, rows: Sequence[int]) -> "JobStore":
+        """A new store with just these rows, in this order (blob re-packed)."""
+        builder = JobStoreBuilder(self.classifications, self.subclassifications)
+        for row in rows:
+            builder.append(
+                self.ids[row],
+                self.titles[row],
+                self.classification(row),
+                self.subclassification(row),
+                self.blob[self.offsets[row] : self.offsets[row + 1]].tobytes(),
+            )
+        return builder.build()
+
+    def spill_descriptions(self, path: str = JOB_STORE_BLOB_PATH) -> None:
+        """Move the description blob to `path` and memory-map it read-only."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        self.blob.tofile(tmp_path)
+        os.replace(tmp_path, path)
+        size = int(self.offsets[-1])
+        self.blob = np.memmap(path, dtype=np.uint8, mode="r", shape=(size,)) if size else np.zeros(0, np.uint8)
+
+    def memory_usage(self) -> dict:
+        """Approximate resident bytes per component (blob counts 0 when memory-mapped)."""
+        ids_bytes = sum(sys.getsizeof(i) for i in self.ids)
+        titles_bytes = sum(sys.getsizeof(t) for t in set(self.titles))
+        return {
+            "jobs": len(self),
+            "ids_bytes": ids_bytes,
+            "titles_bytes": titles_bytes,
+            "categories_bytes": int(self.classification_codes.nbytes + self.subclassification_codes.nbytes),
+            "offsets_bytes": int(self.offsets.nbytes),
+            "descriptions_bytes": 0 if isinstance(self.blob, np.memmap) else int(self.blob.nbytes),
+        }
+
+
+class JobStoreBuilder:
+    """Append rows one at a time (e.g. while streaming CSV chunks), then build()."""
+
+    def __init__(self, classifications: Iterable[str] = (), subclassifications: Iterable[str] = ()):
+        self._ids: List[str] = []
+        self._titles: List[str] = []
+        self._classifications = _Interner(list(classifications))
+        self._subclassifications = _Interner(list(subclassifications))
+        self._classification_codes: List[int] = []
+        self._subclassification_codes: List[int] = []
+        self._blob = bytearray()
+        self._offsets: List[int] = [0]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def append(self, job_id: str, title: str, classification: str, subclassification: str, description) -> None:
+        self._ids.append(job_id)
+        self._titles.append(sys.intern(title))
+        self._classification_codes.append(self._classifications.code(classification))
+        self._subclassification_codes.append(self._subclassifications.code(subclassification))
+        self._blob += description if isinstance(description, bytes) else description.encode("utf-8")
+        self._offsets.append(len(self._blob))
+
+    def build(self) -> JobStore:
+        return JobStore(
+            ids=self._ids,
+            titles=self._titles,
+            classification_codes=np.asarray(self._classification_codes, dtype=np.int32),
+            subclassification_codes=np.asarray(self._subclassification_codes, dtype=np.int32),
+            classifications=self._classifications.values,
+            subclassifications=self._subclassifications.values,
+            blob=np.frombuffer(bytes(self._blob), dtype=np.uint8),
+            offsets=np.asarray(self._offsets, dtype=np.int64),
+        )
@@ -0,0 +1,401 @@
+"""
+Single entry point for every LLM call in the backend.
+
+openai_service, embedding_service and the offline enrichment pipeline all call
+complete() / stream(), which share one pooled client and add:
+  - an in-flight cap (LLM_MAX_IN_FLIGHT) and token buckets for requests and
+    tokens per minute (LLM_RPM, LLM_TPM), so bursts queue here instead of
+    coming back as 429s
+  - retries with full-jitter backoff on rate-limit/transient errors, honouring
+    Retry-After
+  - singleflight: identical concurrent (non-streaming) calls share one request
+  - a persistent prompt cache (services/prompt_cache.py) for the prompt kinds
+    whose output depends on the prompt alone
+Every call has a deadline (LLM_DEADLINE_SECONDS, tightened by an enclosing
+llm_deadline() block) that bounds queueing, each attempt's HTTP timeout and
+the retry sleeps.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+import openai
+from dotenv import load_dotenv
+
+from core.metrics import (
+    LLM_COALESCED,
+    LLM_IN_FLIGHT,
+    LLM_QUEUE_SECONDS,
+    LLM_RETRIES,
+    observe_openai_usage,
+    record_stage,
+    timed_openai,
+)
+from services import prompt_cache
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Env & client
+# -----------------------------
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Any OpenAI-compatible server, e.g. benchmarks/fake_openai.py for offline runs
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+if not OPENAI_API_KEY:
+    # Importable without a key (benchmarks, offline scripts); calls fail until one is set
+    print("Warning: OPENAI_API_KEY not found. Please set it in your .env file.")
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+# Set to the account's tier limits for the model; 0 disables a bucket
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+# Per attempt (for streams: the longest gap between chunks)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+# Per call, including queueing and retries; 0 = no deadline
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "300"))
+
+client = openai.AsyncOpenAI(
+    api_key=OPENAI_API_KEY or "not-set",
+    base_url=OPENAI_BASE_URL,
+    max_retries=0,  # retried below, within the deadline and the shared limits
+    http_client=openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_IN_FLIGHT, max_keepalive_connections=LLM_MAX_IN_FLIGHT
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+    ),
+)
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's deadline passed while queued, or before a retry could run."""
+
+
+class EmptyCompletion(ValueError):
+    """The model returned no text (a refusal or a filtered result); not retried."""
+
+
+# -----------------------------
+# Deadlines
+# -----------------------------
+# Absolute time.monotonic() by which every LLM call in the current context must finish
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def llm_deadline(seconds: float):
+    """Bound all LLM calls in the block, retries included, to `seconds` from now (nests: the tighter wins)."""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            pass  # an async generator closed from another context (e.g. at GC): nothing to restore
+
+
+def _call_deadline(seconds: Optional[float]) -> Optional[float]:
+    seconds = LLM_DEADLINE_SECONDS if seconds is None else seconds
+    own = time.monotonic() + seconds if seconds > 0 else None
+    outer = _deadline.get()
+    if own is None or outer is None:
+        return own if outer is None else outer
+    return min(own, outer)
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("LLM call deadline exceeded")
+    return remaining
+
+
+def _attempt_timeout(deadline: Optional[float]) -> httpx.Timeout:
+    remaining = _remaining(deadline)
+    seconds = LLM_TIMEOUT_SECONDS if remaining is None else min(LLM_TIMEOUT_SECONDS, remaining)
+    return httpx.Timeout(seconds, connect=min(seconds, LLM_CONNECT_TIMEOUT_SECONDS))
+
+
+# -----------------------------
+# Admission: in-flight cap + rate limits
+# -----------------------------
+class TokenBucket:
+    """`per_minute` units refilled continuously, bursting up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()  # waiters are served in arrival order
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        if self.capacity <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            if self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) * 60 / self.capacity)
+                self._refill()
+            self.tokens -= amount
+
+
+_in_flight = asyncio.Semaphore(LLM_MAX_IN_FLIGHT)
+_requests_bucket = TokenBucket(LLM_RPM)
+_tokens_bucket = TokenBucket(LLM_TPM)
+
+
+def _estimate_tokens(params: dict) -> int:
+    """What the API counts against TPM: prompt (~4 chars/token) plus max_tokens."""
+    chars = sum(len(m["content"]) for m in params["messages"])
+    return chars // 4 + params["max_tokens"]
+
+
+async def _admit(tokens: int) -> None:
+    await _in_flight.acquire()
+    try:
+        await _requests_bucket.acquire(1)
+        await _tokens_bucket.acquire(tokens)
+    except BaseException:
+        _in_flight.release()
+        raise
+
+
+@asynccontextmanager
+async def _admitted(tokens: int, deadline: Optional[float]):
+    """Hold an in-flight slot (after paying the rate limits) for one upstream attempt."""
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(_admit(tokens), timeout=_remaining(deadline))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("LLM call deadline exceeded while queued") from None
+    waited = time.perf_counter() - start
+    LLM_QUEUE_SECONDS.observe(waited)
+    record_stage("llm_queue", waited)
+    LLM_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        LLM_IN_FLIGHT.dec()
+        _in_flight.release()
+
+
+# -----------------------------
+# Retries
+# -----------------------------
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Honour the server's Retry-After header on 429s when present."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def _backoff(error: Exception, attempt: int, kind: str, deadline: Optional[float]) -> None:
+    """Sleep before retrying `error`, or re-raise it when out of attempts or time."""
+    delay = _retry_after_seconds(error) or random.uniform(
+        0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+    )
+    if attempt >= LLM_MAX_RETRIES or (deadline is not None and time.monotonic() + delay >= deadline):
+        raise error
+    LLM_RETRIES.labels(kind=kind, error=type(error).__name__).inc()
+    logger.warning(
+        "%s on %s call; retrying in %.1fs (attempt %d/%d)",
+        type(error).__name__, kind, delay, attempt + 1, LLM_MAX_RETRIES,
+    )
+    await asyncio.sleep(delay)
+
+
+# -----------------------------
+# Calls
+# -----------------------------
+def _params(prompt: str, system: str, max_tokens: int, temperature: float, response_format) -> dict:
+    params = {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    if response_format:
+        params["response_format"] = response_format
+    return params
+
+
+def request_key(params: dict) -> str:
+    """Content hash of everything that determines the completion."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def _complete(params: dict, kind: str, deadline: Optional[float], cache_key: Optional[str] = None) -> str:
+    text = await _complete_upstream(params, kind, deadline)
+    if cache_key is not None:
+        try:
+            await asyncio.to_thread(prompt_cache.store_response, cache_key, kind, text)
+        except Exception as e:  # a cache failure must not fail the call
+            logger.warning("Prompt cache write failed: %s", e)
+    return text
+
+
+async def _complete_upstream(params: dict, kind: str, deadline: Optional[float]) -> str:
+    tokens = _estimate_tokens(params)
+    attempt = 0
+    while True:
+        try:
+            async with _admitted(tokens, deadline):
+                with timed_openai(kind):
+                    response = await client.chat.completions.create(
+                        **params, timeout=_attempt_timeout(deadline)
+                    )
+            observe_openai_usage(kind, response.usage)
+        except RETRYABLE_ERRORS as e:
+            await _backoff(e, attempt, kind, deadline)
+            attempt += 1
+            continue
+        choice = response.choices[0]
+        if choice.message.content is None:
+            # Refusals and content-filtered results carry no text; the same prompt would fail again
+            reason = getattr(choice.message, "refusal", None) or getattr(choice, "finish_reason", None)
+            raise EmptyCompletion(f"{kind} call returned no content ({reason or 'no reason given'})")
+        return choice.message.content.strip()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+_flights: Dict[str, _Flight] = {}
+
+
+def _land(key: str, flight: _Flight) -> None:
+    """Stop routing new callers to `flight` (finished or abandoned)."""
+    if _flights.get(key) is flight:
+        del _flights[key]
+
+
+async def complete(
+    prompt: str,
+    system: str,
+    max_tokens: int = 2000,
+    temperature: float = 0.2,
+    response_format=None,
+    kind: str = "generic",
+    deadline: Optional[float] = None,
+) -> str:
+    """
+    The model's text output for `prompt`. `kind` labels the metrics; `deadline`
+    (seconds) overrides LLM_DEADLINE_SECONDS. Identical calls already in flight
+    are joined rather than sent again; the request is cancelled only once every
+    caller waiting on it has gone. Cacheable kinds are answered from the prompt
+    cache when possible.
+    """
+    params = _params(prompt, system, max_tokens, temperature, response_format)
+    key = request_key(params)
+    cache_key = None
+    if prompt_cache.cacheable(kind):
+        try:
+            cached = await asyncio.to_thread(prompt_cache.get_cached_response, key, kind)
+        except Exception as e:
+            logger.warning("Prompt cache read failed: %s", e)
+            cached = None
+        if cached is not None:
+            return cached
+        cache_key = key
+
+    flight = _flights.get(key)
+    if flight is None:
+        flight = _flights[key] = _Flight(
+            asyncio.ensure_future(_complete(params, kind, _call_deadline(deadline), cache_key))
+        )
+        flight.task.add_done_callback(lambda _: _land(key, flight))
+    else:
+        LLM_COALESCED.labels(kind=kind).inc()
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if not flight.waiters and not flight.task.done():
+            _land(key, flight)
+            flight.task.cancel()
+
+
+async def stream(
+    prompt: str,
+    system: str,
+    max_tokens: int = 2000,
+    temperature: float = 0.2,
+    response_format=None,
+    kind: str = "generic",
+    deadline: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    complete(), yielding the output text in pieces as the model produces it.
+    Retried only until the first piece arrives, and never coalesced.
+    """
+    params = _params(prompt, system, max_tokens, temperature, response_format)
+    # usage arrives on a final, choice-less chunk
+    params.update(stream=True, stream_options={"include_usage": True})
+    tokens = _estimate_tokens(params)
+    deadline = _call_deadline(deadline)
+    attempt = 0
+    while True:
+        started = False
+        try:
+            async with _admitted(tokens, deadline):
+                with timed_openai(kind):
+                    response = await client.chat.completions.create(
+                        **params, timeout=_attempt_timeout(deadline)
+                    )
+                    async for chunk in response:
+                        if chunk.usage is not None:
+                            observe_openai_usage(kind, chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            yield chunk.choices[0].delta.content
+            return
+        except RETRYABLE_ERRORS as e:
+            if started:
+                raise
+            await _backoff(e, attempt, kind, deadline)
+            attempt += 1
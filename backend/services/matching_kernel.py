@@ -0,0 +1,62 @@
+from typing import Tuple
+
+import numpy as np
+
+from services.embedding_store import l2_normalize
+
+
+class ScoringKernel:
+    """
+    Cosine-similarity top-k over a fixed job matrix.
+    Rows are L2-normalized once when the kernel is built, so scoring a user is a
+    single matvec and selection is an O(n) argpartition instead of a full sort.
+    """
+
+    def __init__(self, job_matrix: np.ndarray, normalized: bool = False):
+        # The embedding store already holds unit rows; avoid copying its mmap.
+        if normalized and job_matrix.dtype == np.float32:
+            self.matrix = job_matrix
+        else:
+            self.matrix = l2_normalize(job_matrix)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def scores(self, user_vec: np.ndarray) -> np.ndarray:
+        """Cosine similarity of one user vector against every job, shape (num_jobs,)."""
+        query = l2_normalize(np.asarray(user_vec, dtype=np.float32).reshape(-1))
+        return self.matrix @ query
+
+    def top_k(self, user_vec: np.ndarray, top_n: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, scores) of the top_n jobs, best first."""
+        return select_top_k(self.scores(user_vec), top_n)
+
+    def top_k_batch(
+        self, user_matrix: np.ndarray, top_n: int = 3
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score many users with one matmul.
+        Returns (indices, scores), each of shape (num_users, top_n), best first per row.
+        """
+        queries = l2_normalize(np.asarray(user_matrix, dtype=np.float32).reshape(-1, self.matrix.shape[1]))
+        return select_top_k(queries @ self.matrix.T, top_n)
+
+
+def select_top_k(similarities: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """argpartition the last axis down to top_n candidates, then sort just those."""
+    n = similarities.shape[-1]
+    top_n = max(0, min(top_n, n))
+    if top_n == 0:
+        empty = np.empty(similarities.shape[:-1] + (0,), dtype=np.int64)
+        return empty, empty.astype(np.float32)
+
+    if top_n < n:
+        candidates = np.argpartition(-similarities, top_n - 1, axis=-1)[..., :top_n]
+    else:
+        candidates = np.broadcast_to(np.arange(n), similarities.shape)
+    candidate_scores = np.take_along_axis(similarities, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1)
+    return (
+        np.take_along_axis(candidates, order, axis=-1),
+        np.take_along_axis(candidate_scores, order, axis=-1),
+    )
@@ -1,34 +1,54 @@
+import asyncio
 import json
-import openai
+import logging
+import re
 from dotenv import load_dotenv
 import os
 
+from services import llm_gateway
+from services.llm_gateway import llm_deadline
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file.")
+SYSTEM_PROMPT = "You are an assistant that returns clean, concise outputs."
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# "single": one structured-output call returns the final MCQs (falls back to the
+# pipeline on failure); "pipeline": the multi-step topic -> questions -> MCQ chain.
+QUESTION_GENERATION_MODE = os.getenv("QUESTION_GENERATION_MODE", "single")
+# Budget for one generate_questions call, fallback included
+QUESTION_GENERATION_DEADLINE_SECONDS = float(os.getenv("QUESTION_GENERATION_DEADLINE_SECONDS", "240"))
 
 
-def call_openai(prompt: str, max_tokens=2000, temperature=0.2) -> str:
-    """Send a prompt to OpenAI and return the model's text output."""
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are an assistant that returns clean, concise outputs.",
-            },
-            {"role": "user", "content": prompt},
-        ],
+async def call_openai(
+    prompt: str, max_tokens=2000, temperature=0.2, response_format=None, kind: str = "generic"
+) -> str:
+    """Send a prompt to OpenAI and return the model's text output. `kind` labels the metrics."""
+    return await llm_gateway.complete(
+        prompt,
+        system=SYSTEM_PROMPT,
         max_tokens=max_tokens,
         temperature=temperature,
+        response_format=response_format,
+        kind=kind,
     )
-    return response.choices[0].message.content.strip()
+
+
+async def call_openai_stream(
+    prompt: str, max_tokens=2000, temperature=0.2, response_format=None, kind: str = "generic"
+):
+    """call_openai, yielding the output text in pieces as the model produces it."""
+    async for delta in llm_gateway.stream(
+        prompt,
+        system=SYSTEM_PROMPT,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        response_format=response_format,
+        kind=kind,
+    ):
+        yield delta
 
 
 def strip_json_codeblock(text: str) -> str:
@@ -43,119 +63,320 @@ def strip_json_codeblock(text: str) -> str:
     return text.strip()
 
 
-def generate_questions(user_input: str):
-    # 1. Extract topics
-    topics = call_openai(
-        f"""Extract all **coding-related** skills, languages, libraries, and frameworks from this statement:
-        '{user_input}'.
-        Output them as a single comma-separated list. No numbering, no explanations, no extra words."""
+# -----------------------------
+# Single-shot structured generation
+# -----------------------------
+MCQ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "follow_up_questions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["topics", "primary_language", "questions"],
+            "properties": {
+                "topics": {"type": "string"},
+                "primary_language": {"type": "string"},
+                "questions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "required": ["question", "options", "answer", "difficulty", "category"],
+                        "properties": {
+                            "question": {"type": "string"},
+                            "options": {"type": "array", "items": {"type": "string"}},
+                            "answer": {"type": "string"},
+                            "difficulty": {"type": "string", "enum": ["Easy", "Medium", "Hard"]},
+                            "category": {"type": "string", "enum": ["Coding", "Non-coding"]},
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def _valid_mcqs(questions) -> list:
+    """Keep only well-formed MCQs: 4 options and an answer that is one of them."""
+    if not isinstance(questions, list):
+        return []
+    return [
+        q
+        for q in questions
+        if isinstance(q, dict)
+        and q.get("question")
+        and isinstance(q.get("options"), list)
+        and len(q["options"]) == 4
+        and q.get("answer") in q["options"]
+    ]
+
+
+def _single_shot_prompt(user_input: str) -> str:
+    return f"""A student described their coding skills as follows:
+        '{user_input}'
+
+        1. topics: all **coding-related** skills, languages, libraries, and frameworks in the statement,
+           as a single comma-separated list.
+        2. primary_language: the primary **programming language** among them, or exactly 'None'.
+        3. questions: multiple-choice questions (MCQs) assessing those topics.
+           - If primary_language is not 'None': exactly 5 "Coding" questions, each with a short
+             self-contained code snippet in that language (≤30 lines, in triple backticks) followed by
+             a question about the snippet. Difficulty: 1 Easy, 1 Medium, 3 Hard.
+           - Exactly 10 "Non-coding" conceptual questions (definitions, theory, practical applications).
+             Difficulty: 1 Easy, 3 Medium, 6 Hard.
+           - Every question has exactly 4 options with only 1 correct; "answer" is the exact text of
+             the correct option."""
+
+
+async def _generate_questions_single_shot(user_input: str):
+    """One structured-output call that goes straight from the reflection to the final MCQs."""
+    response_text = await call_openai(
+        _single_shot_prompt(user_input),
+        max_tokens=6000,
+        response_format=MCQ_RESPONSE_FORMAT,
+        kind="questions_single_shot",
     )
-    print("\n[DEBUG] Extracted topics:", topics)
+    data = json.loads(response_text)
+    questions = _valid_mcqs(data.get("questions"))
+    if not questions:
+        raise ValueError("structured response contained no valid MCQs")
 
-    # 2. Extract primary programming language
-    language_for_scaffold = call_openai(
-        f"""From the following list of topics: '{topics}', extract the name of the primary **programming language** mentioned.
-        If none is found, return exactly 'None'."""
+    logger.debug("Single-shot topics: %s", data.get("topics"))
+    logger.debug("Total questions generated: %d", len(questions))
+    return {
+        "topics": data.get("topics", ""),
+        "primary_language": data.get("primary_language", "None"),
+        "questions": questions,
+    }
+
+
+# -----------------------------
+# Multi-step pipeline
+# -----------------------------
+def _parse_question_list(text: str) -> list:
+    """Questions are requested as a JSON list; fall back to one question per line."""
+    try:
+        parsed = json.loads(strip_json_codeblock(text))
+        if isinstance(parsed, list):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+    return [q.strip() for q in text.splitlines() if q.strip()]
+
+
+async def _convert_to_mcqs(questions: list, category: str) -> list:
+    """Convert generated questions into JSON MCQs (one OpenAI call)."""
+    mcqs_text = await call_openai(
+        f"""Convert the following {category.lower()} questions into JSON multiple-choice questions (MCQs):
+            {json.dumps(questions)}
+
+            Rules:
+            - Keep difficulty and category.
+            - Provide exactly 4 options (A, B, C, D), only 1 correct.
+            - Return **only JSON**, no extra text.
+            - Example format:
+            [
+              {{"question": "...", "options": ["A","B","C","D"], "answer":"A", "difficulty":"Easy", "category":"{category}"}}
+            ]""",
+        kind="mcq_conversion",
     )
-    print("[DEBUG] Extracted primary language:", language_for_scaffold)
+    cleaned_text = strip_json_codeblock(mcqs_text)
+    logger.debug("%s MCQs JSON: %s", category, cleaned_text)
+    try:
+        mcqs = json.loads(cleaned_text)
+        if not isinstance(mcqs, list):
+            logger.error("%s MCQs is not a list, returning empty list", category)
+            return []
+        return mcqs
+    except json.JSONDecodeError as e:
+        logger.error("Failed to parse %s MCQs JSON: %s", category, e)
+        return []
 
-    # 3. Generate coding questions if applicable
-    coding_questions = []
-    if language_for_scaffold.lower() != "none":
-        coding_questions_text = call_openai(
-            f"""Generate exactly 5 coding problems based on: '{topics}'.
-            - Include a short code snippet in '{language_for_scaffold}' (≤30 lines).
-            - Then write a question about that snippet.
-            - Difficulty ratio: 1 Easy, 1 Medium, 3 Hard.
-            - Format each question as code (triple backticks) + text.
-            - Only self-contained examples, no APIs or external files.
-            - Do NOT include answers.
-            - Return questions as JSON list, each object with:
-              {{"question": "...", "difficulty": "Easy/Medium/Hard", "category": "Coding"}}"""
-        )
-        # Robust parsing: remove empty items
-        coding_questions = [
-            q.strip()
-            for q in coding_questions_text.replace("\n", "||").split("||")
-            if q.strip()
-        ]
-
-    # 4. Generate non-coding questions
-    non_coding_questions_text = call_openai(
+
+async def _coding_branch(topics: str, language_for_scaffold: str) -> list:
+    # Generate coding questions, then convert them to MCQs
+    coding_questions_text = await call_openai(
+        f"""Generate exactly 5 coding problems based on: '{topics}'.
+        - Include a short code snippet in '{language_for_scaffold}' (≤30 lines).
+        - Then write a question about that snippet.
+        - Difficulty ratio: 1 Easy, 1 Medium, 3 Hard.
+        - Format each question as code (triple backticks) + text.
+        - Only self-contained examples, no APIs or external files.
+        - Do NOT include answers.
+        - Return questions as JSON list, each object with:
+          {{"question": "...", "difficulty": "Easy/Medium/Hard", "category": "Coding"}}""",
+        kind="coding_questions",
+    )
+    coding_questions = _parse_question_list(coding_questions_text)
+    return await _convert_to_mcqs(coding_questions, "Coding") if coding_questions else []
+
+
+async def _non_coding_branch(topics: str) -> list:
+    # Generate non-coding questions, then convert them to MCQs
+    non_coding_questions_text = await call_openai(
         f"""Generate exactly 10 non-coding conceptual questions based on: '{topics}'.
         - No coding required.
         - Cover definitions, theory, practical applications.
         - Difficulty ratio: 1 Easy, 3 Medium, 6 Hard.
         - Return questions as JSON list, each object with:
-          {{"question": "...", "difficulty": "Easy/Medium/Hard", "category": "Non-coding"}}"""
+          {{"question": "...", "difficulty": "Easy/Medium/Hard", "category": "Non-coding"}}""",
+        kind="non_coding_questions",
     )
-    non_coding_questions = [
-        q.strip()
-        for q in non_coding_questions_text.replace("\n", "||").split("||")
-        if q.strip()
-    ]
+    non_coding_questions = _parse_question_list(non_coding_questions_text)
+    return await _convert_to_mcqs(non_coding_questions, "Non-coding") if non_coding_questions else []
 
-    # 5. Convert coding questions to MCQs
-    coding_mcqs = []
-    if coding_questions:
-        coding_mcqs_text = call_openai(
-            f"""Convert the following coding questions into JSON multiple-choice questions (MCQs):
-            {coding_questions}
 
-            Rules:
-            - Keep difficulty and category.
-            - Provide exactly 4 options (A, B, C, D), only 1 correct.
-            - Return **only JSON**, no extra text.
-            - Example format:
-            [
-              {{"question": "...", "options": ["A","B","C","D"], "answer":"A", "difficulty":"Easy", "category":"Coding"}}
-            ]"""
-        )
-        cleaned_text = strip_json_codeblock(coding_mcqs_text)
-        print("[DEBUG] Coding MCQs JSON:", cleaned_text)
-        try:
-            coding_mcqs = json.loads(cleaned_text)
-            if not isinstance(coding_mcqs, list):
-                print("[ERROR] coding_mcqs is not a list, returning empty list")
-                coding_mcqs = []
-        except json.JSONDecodeError as e:
-            print("[ERROR] Failed to parse coding MCQs JSON:", e)
-            coding_mcqs = []
-
-    # 6. Convert non-coding questions to MCQs
-    non_coding_mcqs = []
-    if non_coding_questions:
-        non_coding_mcqs_text = call_openai(
-            f"""Convert the following non-coding questions into JSON multiple-choice questions (MCQs):
-            {non_coding_questions}
+async def _extract_topics(user_input: str):
+    # 1. Extract topics
+    topics = await call_openai(
+        f"""Extract all **coding-related** skills, languages, libraries, and frameworks from this statement:
+        '{user_input}'.
+        Output them as a single comma-separated list. No numbering, no explanations, no extra words.""",
+        kind="topics",
+    )
+    logger.debug("Extracted topics: %s", topics)
 
-            Rules:
-            - Keep difficulty and category.
-            - Provide exactly 4 options (A, B, C, D), only 1 correct.
-            - Return **only JSON**, no extra text.
-            - Example format:
-            [
-              {{"question": "...", "options": ["A","B","C","D"], "answer":"A", "difficulty":"Easy", "category":"Non-coding"}}
-            ]"""
+    # 2. Extract primary programming language
+    language_for_scaffold = await call_openai(
+        f"""From the following list of topics: '{topics}', extract the name of the primary **programming language** mentioned.
+        If none is found, return exactly 'None'.""",
+        kind="primary_language",
+    )
+    logger.debug("Extracted primary language: %s", language_for_scaffold)
+    return topics, language_for_scaffold
+
+
+async def _generate_questions_pipeline(user_input: str):
+    topics, language_for_scaffold = await _extract_topics(user_input)
+
+    # 3. Coding and non-coding branches are independent: run them concurrently
+    if language_for_scaffold.lower() != "none":
+        coding_mcqs, non_coding_mcqs = await asyncio.gather(
+            _coding_branch(topics, language_for_scaffold),
+            _non_coding_branch(topics),
         )
-        cleaned_text = strip_json_codeblock(non_coding_mcqs_text)
-        print("[DEBUG] Non-coding MCQs JSON:", cleaned_text)
-        try:
-            non_coding_mcqs = json.loads(cleaned_text)
-            if not isinstance(non_coding_mcqs, list):
-                print("[ERROR] non_coding_mcqs is not a list, returning empty list")
-                non_coding_mcqs = []
-        except json.JSONDecodeError as e:
-            print("[ERROR] Failed to parse non-coding MCQs JSON:", e)
-            non_coding_mcqs = []
-
-    # 7. Merge all questions and assign unique IDs
+    else:
+        coding_mcqs, non_coding_mcqs = [], await _non_coding_branch(topics)
+
+    # 4. Merge all questions
     all_questions = coding_mcqs + non_coding_mcqs
 
-    print("[DEBUG] Total questions generated:", len(all_questions))
-    # 8. Return final data
+    logger.debug("Total questions generated: %d", len(all_questions))
     return {
         "topics": topics,
         "primary_language": language_for_scaffold,
         "questions": all_questions,
     }
+
+
+async def generate_questions(user_input: str):
+    # One deadline for both attempts, so a slow single-shot failure can't double the wait
+    with llm_deadline(QUESTION_GENERATION_DEADLINE_SECONDS):
+        if QUESTION_GENERATION_MODE == "single":
+            try:
+                return await _generate_questions_single_shot(user_input)
+            except Exception as e:
+                logger.error("Single-shot question generation failed, using pipeline: %s", e)
+        return await _generate_questions_pipeline(user_input)
+
+
+# -----------------------------
+# Streaming generation
+# -----------------------------
+class _MCQStreamParser:
+    """Pulls each complete question object out of a partial single-shot JSON response."""
+
+    def __init__(self):
+        self.text = ""
+        self._decoder = json.JSONDecoder()
+        self._pos = None  # just inside the "questions" array once it has started
+        self._closed = False
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        if self._pos is None:
+            match = re.search(r'"questions"\s*:\s*\[', self.text)
+            if not match:
+                return []
+            self._pos = match.end()
+        parsed = []
+        while not self._closed:
+            while self._pos < len(self.text) and self.text[self._pos] in " \t\r\n,":
+                self._pos += 1
+            if self._pos >= len(self.text):
+                break
+            if self.text[self._pos] == "]":
+                self._closed = True
+                break
+            try:
+                obj, self._pos = self._decoder.raw_decode(self.text, self._pos)
+            except json.JSONDecodeError:
+                break  # object not complete yet
+            parsed.append(obj)
+        return parsed
+
+
+async def _stream_questions_single_shot(user_input: str):
+    parser = _MCQStreamParser()
+    count = 0
+    try:
+        async for delta in call_openai_stream(
+            _single_shot_prompt(user_input),
+            max_tokens=6000,
+            response_format=MCQ_RESPONSE_FORMAT,
+            kind="questions_single_shot",
+        ):
+            for q in _valid_mcqs(parser.feed(delta)):
+                count += 1
+                yield "question", q
+        data = json.loads(parser.text)
+    except Exception:
+        if not count:
+            raise
+        # Questions already went out; finish with what we have rather than start over
+        logger.error("Single-shot stream ended early after %d questions", count)
+        data = {}
+    if not count:
+        raise ValueError("structured response contained no valid MCQs")
+    logger.debug("Total questions streamed: %d", count)
+    yield "summary", {
+        "topics": data.get("topics", ""),
+        "primary_language": data.get("primary_language", "None"),
+    }
+
+
+async def _stream_questions_pipeline(user_input: str):
+    topics, language_for_scaffold = await _extract_topics(user_input)
+    branches = [_non_coding_branch(topics)]
+    if language_for_scaffold.lower() != "none":
+        branches.append(_coding_branch(topics, language_for_scaffold))
+    # Emit each branch's MCQs as soon as that branch finishes
+    for branch in asyncio.as_completed(branches):
+        for q in await branch:
+            yield "question", q
+    yield "summary", {"topics": topics, "primary_language": language_for_scaffold}
+
+
+async def stream_questions(user_input: str):
+    """
+    generate_questions as a stream of ("question", mcq) pairs, emitted as each
+    MCQ is parsed, followed by one ("summary", {"topics", "primary_language"}).
+    """
+    # Same shared budget as generate_questions
+    with llm_deadline(QUESTION_GENERATION_DEADLINE_SECONDS):
+        if QUESTION_GENERATION_MODE == "single":
+            started = False
+            try:
+                async for event in _stream_questions_single_shot(user_input):
+                    started = True
+                    yield event
+                return
+            except Exception as e:
+                if started:
+                    raise
+                logger.error("Single-shot question streaming failed, using pipeline: %s", e)
+        async for event in _stream_questions_pipeline(user_input):
+            yield event
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.assessment import UserProfileCache
+
+# -----------------------------
+# Config (env overridable)
+# -----------------------------
+PROFILE_CACHE_ENABLED = os.getenv("PROFILE_CACHE_ENABLED", "true").lower() == "true"
+# Entries kept in the in-process LRU in front of the user_profile_cache table.
+PROFILE_CACHE_LRU_SIZE = int(os.getenv("PROFILE_CACHE_LRU_SIZE", "1024"))
+# Bump whenever the profile prompt changes so stored texts are not reused.
+PROFILE_PROMPT_VERSION = "1"
+
+CachedProfile = Tuple[str, np.ndarray]  # (profile_text, float32 embedding)
+
+# -----------------------------
+# In-process LRU + metrics
+# -----------------------------
+_lock = threading.Lock()
+_lru: "OrderedDict[Tuple[int, str], CachedProfile]" = OrderedDict()
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _bump(key: str, n: int = 1) -> None:
+    with _lock:
+        _stats[key] += n
+
+
+def get_profile_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        stats["lru_entries"] = len(_lru)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    hits = stats["memory_hits"] + stats["db_hits"]
+    stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def _lru_get(key: Tuple[int, str]) -> Optional[CachedProfile]:
+    with _lock:
+        entry = _lru.get(key)
+        if entry is not None:
+            _lru.move_to_end(key)
+        return entry
+
+
+def _lru_put(key: Tuple[int, str], entry: CachedProfile) -> None:
+    with _lock:
+        _lru[key] = entry
+        _lru.move_to_end(key)
+        while len(_lru) > PROFILE_CACHE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _lru_drop(user_test_ids: Iterable[int]) -> None:
+    ids = set(user_test_ids)
+    with _lock:
+        for key in [k for k in _lru if k[0] in ids]:
+            del _lru[key]
+
+
+# -----------------------------
+# Keys
+# -----------------------------
+def profile_data_hash(combined_data: Dict[str, Any], encoder_key: str) -> str:
+    """
+    Stable hash of everything the profile text and embedding depend on.
+    `encoder_key` identifies the model, backend and pooling that embed the text.
+    """
+    payload = json.dumps(combined_data, sort_keys=True, default=str)
+    key = f"{PROFILE_PROMPT_VERSION}\n{encoder_key}\n{payload}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Lookup / storage / invalidation
+# -----------------------------
+async def get_cached_profile(db: AsyncSession, user_test_id: int, data_hash: str) -> Optional[CachedProfile]:
+    """LRU first, then the user_profile_cache table; None on a miss."""
+    if not PROFILE_CACHE_ENABLED:
+        return None
+    key = (user_test_id, data_hash)
+    entry = _lru_get(key)
+    if entry is not None:
+        _bump("memory_hits")
+        return entry
+
+    row = await db.scalar(
+        select(UserProfileCache)
+        .where(UserProfileCache.user_test_id == user_test_id)
+        .where(UserProfileCache.data_hash == data_hash)
+        .limit(1)
+    )
+    if row is None:
+        _bump("misses")
+        return None
+    entry = (row.profile_text, np.frombuffer(row.embedding, dtype=np.float32))
+    _lru_put(key, entry)
+    _bump("db_hits")
+    return entry
+
+
+async def store_profile(
+    db: AsyncSession, user_test_id: int, data_hash: str, profile_text: str, embedding
+) -> None:
+    """Replace the user's cached profile with this one. The caller commits."""
+    if not PROFILE_CACHE_ENABLED:
+        return
+    vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    # Only the latest assessment state is worth keeping per user
+    await db.execute(delete(UserProfileCache).where(UserProfileCache.user_test_id == user_test_id))
+    db.add(
+        UserProfileCache(
+            user_test_id=user_test_id,
+            data_hash=data_hash,
+            profile_text=profile_text,
+            embedding=vec.tobytes(),
+        )
+    )
+    _lru_drop([user_test_id])
+    _lru_put((user_test_id, data_hash), (profile_text, vec))
+
+
+async def invalidate_profiles(db: AsyncSession, user_test_ids: Iterable[int]) -> None:
+    """Drop cached profiles for users whose answers changed. The caller commits."""
+    ids = sorted(set(user_test_ids))
+    if not ids:
+        return
+    await db.execute(delete(UserProfileCache).where(UserProfileCache.user_test_id.in_(ids)))
+    _lru_drop(ids)
+    _bump("invalidations", len(ids))
+
+
+# -----------------------------
+# Bulk variants (cohort matching)
+# -----------------------------
+async def get_cached_profiles(db: AsyncSession, data_hashes: Dict[int, str]) -> Dict[int, CachedProfile]:
+    """get_cached_profile for many users in one query; users without a hit are absent."""
+    if not PROFILE_CACHE_ENABLED or not data_hashes:
+        return {}
+    found: Dict[int, CachedProfile] = {}
+    for user_test_id, data_hash in data_hashes.items():
+        entry = _lru_get((user_test_id, data_hash))
+        if entry is not None:
+            found[user_test_id] = entry
+    _bump("memory_hits", len(found))
+
+    pending = {uid: h for uid, h in data_hashes.items() if uid not in found}
+    if pending:
+        rows = (
+            await db.scalars(
+                select(UserProfileCache).where(UserProfileCache.user_test_id.in_(sorted(pending)))
+            )
+        ).all()
+        for row in rows:
+            if pending.get(row.user_test_id) == row.data_hash:
+                entry = (row.profile_text, np.frombuffer(row.embedding, dtype=np.float32))
+                _lru_put((row.user_test_id, row.data_hash), entry)
+                found[row.user_test_id] = entry
+                _bump("db_hits")
+    _bump("misses", len(data_hashes) - len(found))
+    return found
+
+
+async def store_profiles(db: AsyncSession, entries: Dict[int, Tuple[str, str, Any]]) -> None:
+    """store_profile for many users: {user_test_id: (data_hash, profile_text, embedding)}. The caller commits."""
+    if not PROFILE_CACHE_ENABLED or not entries:
+        return
+    ids = sorted(entries)
+    await db.execute(delete(UserProfileCache).where(UserProfileCache.user_test_id.in_(ids)))
+    _lru_drop(ids)
+    rows = []
+    for user_test_id in ids:
+        data_hash, profile_text, embedding = entries[user_test_id]
+        vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        rows.append(
+            {
+                "user_test_id": user_test_id,
+                "data_hash": data_hash,
+                "profile_text": profile_text,
+                "embedding": vec.tobytes(),
+            }
+        )
+        _lru_put((user_test_id, data_hash), (profile_text, vec))
+    await db.execute(insert(UserProfileCache), rows)
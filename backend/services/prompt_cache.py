@@ -0,0 +1,168 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from core.metrics import LLM_PROMPT_CACHE
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Config (env overridable)
+# -----------------------------
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+PROMPT_CACHE_PATH = os.getenv("PROMPT_CACHE_PATH", os.path.join("data", "prompt_cache.sqlite"))
+# Prompt kinds whose output is a function of the prompt alone (extraction, summaries).
+# Question and profile generation stay out: they have their own caches/banks.
+PROMPT_CACHE_KINDS = frozenset(
+    k.strip()
+    for k in os.getenv(
+        "PROMPT_CACHE_KINDS", "topics,primary_language,job_summary,job_skills,job_knowledge"
+    ).split(",")
+    if k.strip()
+)
+PROMPT_CACHE_MAX_MB = float(os.getenv("PROMPT_CACHE_MAX_MB", "256"))
+PROMPT_CACHE_TTL_DAYS = float(os.getenv("PROMPT_CACHE_TTL_DAYS", "30"))
+# On overflow, evict least recently used entries down to this fraction of the cap
+_EVICT_TO = 0.9
+
+
+def cacheable(kind: str) -> bool:
+    return PROMPT_CACHE_ENABLED and kind in PROMPT_CACHE_KINDS
+
+
+# -----------------------------
+# Persistent cache (SQLite)
+# -----------------------------
+class PromptCache:
+    """request key (hash of model, messages and parameters) -> response text, LRU + TTL bounded."""
+
+    def __init__(
+        self,
+        path: str = PROMPT_CACHE_PATH,
+        max_bytes: int = int(PROMPT_CACHE_MAX_MB * 1024 * 1024),
+        ttl_seconds: float = PROMPT_CACHE_TTL_DAYS * 86400,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS prompt_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_prompt_cache_last_used ON prompt_cache (last_used)")
+            self._conn.commit()
+            self._bytes = self._stored_bytes()
+        return self._conn
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM prompt_cache").fetchone()[0]
+
+    def _bump(self, kind: str, result: str) -> None:
+        counts = self._stats.setdefault(kind, {"hits": 0, "misses": 0})
+        counts["hits" if result == "hit" else "misses"] += 1
+        LLM_PROMPT_CACHE.labels(kind=kind, result=result).inc()
+
+    def get(self, key: str, kind: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response, created_at FROM prompt_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM prompt_cache WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row is None:
+                self._bump(kind, "miss")
+                return None
+            conn.execute("UPDATE prompt_cache SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self._bump(kind, "hit")
+        return row[0]
+
+    def put(self, key: str, kind: str, response: str) -> None:
+        now = time.time()
+        size = len(key) + len(response.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, response, size, now, now),
+            )
+            conn.commit()
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under the cap (lock held)."""
+        conn = self._conn
+        conn.execute("DELETE FROM prompt_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        # Re-read rather than trust the running total: other workers share the file
+        self._bytes = self._stored_bytes()
+        excess = self._bytes - int(self.max_bytes * _EVICT_TO)
+        if excess > 0:
+            victims, freed = [], 0
+            for key, size in conn.execute("SELECT key, size FROM prompt_cache ORDER BY last_used"):
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM prompt_cache WHERE key = ?", victims)
+            self._bytes -= freed
+            logger.info("Prompt cache evicted %d entries (%d bytes)", len(victims), freed)
+        conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM prompt_cache").fetchone()[0]
+            by_kind = {kind: dict(counts) for kind, counts in self._stats.items()}
+            size = self._bytes
+        hits = sum(c["hits"] for c in by_kind.values())
+        lookups = hits + sum(c["misses"] for c in by_kind.values())
+        return {
+            "enabled": PROMPT_CACHE_ENABLED,
+            "kinds": sorted(PROMPT_CACHE_KINDS),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "by_kind": by_kind,
+        }
+
+
+_cache = PromptCache()
+
+
+def get_cached_response(key: str, kind: str) -> Optional[str]:
+    return _cache.get(key, kind)
+
+
+def store_response(key: str, kind: str, response: str) -> None:
+    _cache.put(key, kind, response)
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
@@ -0,0 +1,368 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from models.assessment import QuestionBankQuestion, QuestionBankSet
+from services.embedding_store import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Config (env overridable)
+# -----------------------------
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "true").lower() == "true"
+# Minimum cosine similarity between skill reflections for a set to be reused.
+QUESTION_BANK_SIMILARITY = float(os.getenv("QUESTION_BANK_SIMILARITY", "0.90"))
+# Up to this many similar sets are pooled to build a fresh mix.
+QUESTION_BANK_MAX_POOLED_SETS = int(os.getenv("QUESTION_BANK_MAX_POOLED_SETS", "5"))
+# Aging/eviction: sets older than this, or served this often, are retired.
+QUESTION_BANK_MAX_AGE_DAYS = int(os.getenv("QUESTION_BANK_MAX_AGE_DAYS", "30"))
+QUESTION_BANK_MAX_SERVES = int(os.getenv("QUESTION_BANK_MAX_SERVES", "50"))
+QUESTION_BANK_MAX_SETS = int(os.getenv("QUESTION_BANK_MAX_SETS", "5000"))
+# The in-process set index is reloaded this often to pick up other workers' sets.
+QUESTION_BANK_INDEX_REFRESH_SECONDS = float(os.getenv("QUESTION_BANK_INDEX_REFRESH_SECONDS", "300"))
+
+# Mix served from the bank, matching what generate_questions produces.
+CODING_QUESTIONS = 5
+NON_CODING_QUESTIONS = 10
+
+# -----------------------------
+# Metrics
+# -----------------------------
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stored_sets": 0, "evicted_sets": 0}
+
+
+def _bump(key: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += n
+
+
+def get_bank_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def normalize_topics(topics: str) -> str:
+    """'React, python ,SQL' -> 'python,react,sql'."""
+    return ",".join(sorted({t.strip().lower() for t in (topics or "").split(",") if t.strip()}))
+
+
+def _language(bank_set: QuestionBankSet) -> str:
+    return (bank_set.primary_language or "none").strip().lower()
+
+
+def _is_coding(q) -> bool:
+    return (q.question_type or "").lower() == "coding"
+
+
+def _to_mcq(q: QuestionBankQuestion) -> dict:
+    return {
+        "question": q.question_text,
+        "options": json.loads(q.options) if q.options else [],
+        "answer": q.answer,
+        "difficulty": q.difficulty,
+        "category": q.question_type,
+    }
+
+
+# -----------------------------
+# In-process set index
+# -----------------------------
+# Reflection embeddings of live sets, so a lookup is one matrix-vector product
+# instead of reading every set's blob. _store_set / evict_stale_sets keep it
+# current within this process; it is reloaded every
+# QUESTION_BANK_INDEX_REFRESH_SECONDS for sets written by other workers.
+_index_lock = threading.Lock()
+_index: Dict[str, Any] = {
+    "ids": np.empty(0, dtype=np.int64),
+    "matrix": np.empty((0, 0), dtype=np.float32),
+    "created_at": np.empty(0, dtype="datetime64[us]"),
+    "dim": 0,
+    "loaded_at": None,
+}
+
+
+async def _load_index(db: AsyncSession, dim: int) -> None:
+    rows = (
+        await db.execute(
+            select(QuestionBankSet.id, QuestionBankSet.reflection_embedding, QuestionBankSet.created_at).where(
+                QuestionBankSet.times_served < QUESTION_BANK_MAX_SERVES
+            )
+        )
+    ).all()
+    # Sets embedded by a different model (other dim) can never match; leave them out
+    rows = [r for r in rows if len(r.reflection_embedding) == dim * 4]
+    with _index_lock:
+        _index["ids"] = np.array([r.id for r in rows], dtype=np.int64)
+        _index["matrix"] = (
+            np.stack([np.frombuffer(r.reflection_embedding, dtype=np.float32) for r in rows])
+            if rows
+            else np.empty((0, dim), dtype=np.float32)
+        )
+        _index["created_at"] = np.array([r.created_at for r in rows], dtype="datetime64[us]")
+        _index["dim"] = dim
+        _index["loaded_at"] = time.monotonic()
+
+
+def _index_add(set_id: int, reflection_vec: np.ndarray, created_at: datetime) -> None:
+    with _index_lock:
+        if _index["loaded_at"] is None or _index["dim"] != reflection_vec.shape[0]:
+            return  # picked up by the first load
+        _index["ids"] = np.append(_index["ids"], set_id)
+        _index["matrix"] = np.vstack([_index["matrix"], reflection_vec.astype(np.float32)[None, :]])
+        _index["created_at"] = np.append(_index["created_at"], np.datetime64(created_at, "us"))
+
+
+def _index_drop(set_ids: List[int]) -> None:
+    with _index_lock:
+        keep = ~np.isin(_index["ids"], set_ids)
+        for key in ("ids", "matrix", "created_at"):
+            _index[key] = _index[key][keep]
+
+
+# -----------------------------
+# Lookup
+# -----------------------------
+async def _similar_sets(db: AsyncSession, reflection_vec: np.ndarray) -> List[QuestionBankSet]:
+    """
+    Live sets whose reflection embedding is within QUESTION_BANK_SIMILARITY, most
+    similar first, limited to the best match's primary language so coding
+    snippets in one assessment never mix languages.
+    """
+    dim = reflection_vec.shape[0]
+    with _index_lock:
+        loaded_at = _index["loaded_at"]
+        stale = loaded_at is None or _index["dim"] != dim
+    if stale or time.monotonic() - loaded_at > QUESTION_BANK_INDEX_REFRESH_SECONDS:
+        await _load_index(db, dim)
+    with _index_lock:
+        ids, matrix, created_at = _index["ids"], _index["matrix"], _index["created_at"]
+    if not len(ids):
+        return []
+
+    sims = matrix @ reflection_vec
+    cutoff = np.datetime64(datetime.utcnow() - timedelta(days=QUESTION_BANK_MAX_AGE_DAYS), "us")
+    sims[created_at < cutoff] = -np.inf
+    candidates = np.flatnonzero(sims >= QUESTION_BANK_SIMILARITY)
+    if not len(candidates):
+        return []
+    # Headroom for sets served out since the index was loaded or in another language
+    candidates = candidates[np.argsort(-sims[candidates])][: QUESTION_BANK_MAX_POOLED_SETS * 4]
+    candidate_ids = [int(i) for i in ids[candidates]]
+
+    rows = (
+        await db.scalars(
+            select(QuestionBankSet)
+            .options(defer(QuestionBankSet.reflection_embedding))
+            .where(QuestionBankSet.id.in_(candidate_ids))
+            .where(QuestionBankSet.times_served < QUESTION_BANK_MAX_SERVES)
+        )
+    ).all()
+    by_id = {s.id: s for s in rows}
+    sets = [by_id[i] for i in candidate_ids if i in by_id]
+    if not sets:
+        return []
+    language = _language(sets[0])
+    return [s for s in sets if _language(s) == language][:QUESTION_BANK_MAX_POOLED_SETS]
+
+
+async def _serve_from_bank(db: AsyncSession, reflection_vec: np.ndarray) -> Optional[Dict[str, Any]]:
+    """A fresh random mix from similar sets, or None if coverage is insufficient."""
+    sets = await _similar_sets(db, reflection_vec)
+    if not sets:
+        return None
+
+    pool = (
+        await db.scalars(
+            select(QuestionBankQuestion).where(QuestionBankQuestion.set_id.in_([s.id for s in sets]))
+        )
+    ).all()
+    seen, unique = set(), []
+    for q in pool:
+        if q.question_text not in seen:
+            seen.add(q.question_text)
+            unique.append(q)
+
+    coding = [q for q in unique if _is_coding(q)]
+    non_coding = [q for q in unique if not _is_coding(q)]
+    # All pooled sets share one language; without one there are legitimately no coding questions
+    wants_coding = _language(sets[0]) != "none"
+    if len(non_coding) < NON_CODING_QUESTIONS or (wants_coding and len(coding) < CODING_QUESTIONS):
+        return None
+
+    picked = random.sample(coding, CODING_QUESTIONS) if wants_coding else []
+    picked += random.sample(non_coding, NON_CODING_QUESTIONS)
+
+    now = datetime.utcnow()
+    for s in sets:
+        s.times_served = (s.times_served or 0) + 1
+        s.last_served_at = now
+
+    best = sets[0]
+    return {
+        "topics": best.topics,
+        "primary_language": best.primary_language,
+        "questions": [_to_mcq(q) for q in picked],
+        "source": "bank",
+    }
+
+
+# -----------------------------
+# Storage & eviction
+# -----------------------------
+async def _store_set(db: AsyncSession, reflection_vec: np.ndarray, result: Dict[str, Any]) -> None:
+    bank_set = QuestionBankSet(
+        topics=normalize_topics(result.get("topics", "")),
+        primary_language=result.get("primary_language"),
+        reflection_embedding=reflection_vec.astype(np.float32).tobytes(),
+        created_at=datetime.utcnow(),
+        times_served=1,
+        last_served_at=datetime.utcnow(),
+    )
+    db.add(bank_set)
+    await db.flush()
+    _index_add(bank_set.id, reflection_vec, bank_set.created_at)
+    rows = [
+        {
+            "set_id": bank_set.id,
+            "question_text": q.get("question"),
+            "options": json.dumps(q.get("options", [])),
+            "answer": q.get("answer"),
+            "difficulty": q.get("difficulty", "easy"),
+            "question_type": q.get("category", "general"),
+        }
+        for q in result.get("questions", [])
+        if q.get("question") and q.get("options")
+    ]
+    if rows:
+        await db.execute(insert(QuestionBankQuestion), rows)
+    _bump("stored_sets")
+
+
+async def evict_stale_sets(db: AsyncSession) -> int:
+    """Drop aged-out and over-served sets, then trim to QUESTION_BANK_MAX_SETS by least recent use."""
+    cutoff = datetime.utcnow() - timedelta(days=QUESTION_BANK_MAX_AGE_DAYS)
+    stale_ids = list(
+        await db.scalars(
+            select(QuestionBankSet.id).where(
+                (QuestionBankSet.created_at < cutoff)
+                | (QuestionBankSet.times_served >= QUESTION_BANK_MAX_SERVES)
+            )
+        )
+    )
+    live = await db.scalar(select(func.count(QuestionBankSet.id))) - len(stale_ids)
+    if live > QUESTION_BANK_MAX_SETS:
+        stale_ids += list(
+            await db.scalars(
+                select(QuestionBankSet.id)
+                .where(~QuestionBankSet.id.in_(stale_ids))
+                .order_by(QuestionBankSet.last_served_at.asc().nullsfirst())
+                .limit(live - QUESTION_BANK_MAX_SETS)
+            )
+        )
+    if stale_ids:
+        await db.execute(delete(QuestionBankQuestion).where(QuestionBankQuestion.set_id.in_(stale_ids)))
+        await db.execute(delete(QuestionBankSet).where(QuestionBankSet.id.in_(stale_ids)))
+        _index_drop(stale_ids)
+        _bump("evicted_sets", len(stale_ids))
+    return len(stale_ids)
+
+
+# -----------------------------
+# Entry point
+# -----------------------------
+async def get_or_generate_questions(db: AsyncSession, skill_reflection: str) -> Dict[str, Any]:
+    """
+    Serve a fresh mix of banked MCQs for a similar skill reflection, or fall back
+    to generate_questions on a miss and bank its output. The caller commits.
+    """
+    from services.embedding_service import get_embeddings_async
+    from services.openai_service import generate_questions
+
+    if not QUESTION_BANK_ENABLED:
+        return await generate_questions(skill_reflection)
+
+    try:
+        embedding = await get_embeddings_async(skill_reflection)
+        reflection_vec = l2_normalize(np.asarray(embedding, dtype=np.float32))
+    except Exception as e:
+        logger.warning("Question bank unavailable (%s); generating questions", e)
+        return await generate_questions(skill_reflection)
+
+    served = await _serve_from_bank(db, reflection_vec)
+    if served is not None:
+        _bump("hits")
+        return served
+
+    _bump("misses")
+    # Nothing is pending on a miss; hand the connection back to the pool during generation
+    await db.commit()
+    result = await generate_questions(skill_reflection)
+    if result.get("questions"):
+        await _store_set(db, reflection_vec, result)
+        await evict_stale_sets(db)
+    return result
+
+
+async def stream_or_generate_questions(db: AsyncSession, skill_reflection: str):
+    """
+    get_or_generate_questions as a stream: ("question", mcq) pairs as soon as each
+    is available (all at once on a bank hit), then ("summary", {...}) with
+    topics, primary_language and source. Bank bookkeeping is pending on the
+    session when the summary is yielded; the caller commits.
+    """
+    from services.embedding_service import get_embeddings_async
+    from services.openai_service import stream_questions
+
+    reflection_vec = None
+    if QUESTION_BANK_ENABLED:
+        try:
+            embedding = await get_embeddings_async(skill_reflection)
+            reflection_vec = l2_normalize(np.asarray(embedding, dtype=np.float32))
+        except Exception as e:
+            logger.warning("Question bank unavailable (%s); generating questions", e)
+
+    if reflection_vec is not None:
+        served = await _serve_from_bank(db, reflection_vec)
+        if served is not None:
+            _bump("hits")
+            for q in served["questions"]:
+                yield "question", q
+            yield "summary", {
+                "topics": served["topics"],
+                "primary_language": served["primary_language"],
+                "source": "bank",
+            }
+            return
+        _bump("misses")
+        await db.commit()
+
+    questions, summary = [], {}
+    async for kind, payload in stream_questions(skill_reflection):
+        if kind == "question":
+            questions.append(payload)
+            yield kind, payload
+        else:
+            summary = payload
+
+    if reflection_vec is not None and questions:
+        await _store_set(db, reflection_vec, {**summary, "questions": questions})
+        await evict_stale_sets(db)
+    yield "summary", {**summary, "source": "generated"}
@@ -0,0 +1,366 @@
+import json
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+import numpy as np
+
+from services.embedding_store import l2_normalize
+from services.matching_kernel import ScoringKernel, select_top_k
+
+# -----------------------------
+# Config (env overridable)
+# -----------------------------
+# "exact", "ivfpq" or "auto" (ivfpq once the corpus reaches VECTOR_INDEX_ANN_THRESHOLD rows)
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "auto")
+VECTOR_INDEX_ANN_THRESHOLD = int(os.getenv("VECTOR_INDEX_ANN_THRESHOLD", "200000"))
+# Inverted lists scanned per query; the main recall/latency knob for ivfpq.
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+# Sub-quantizers per vector (0 = store full residuals, i.e. IVF-Flat).
+VECTOR_INDEX_PQ_M = int(os.getenv("VECTOR_INDEX_PQ_M", "48"))
+# PQ candidates re-scored exactly against the full matrix, as a multiple of top_n.
+VECTOR_INDEX_REFINE = int(os.getenv("VECTOR_INDEX_REFINE", "10"))
+
+
+# -----------------------------
+# Interface
+# -----------------------------
+class VectorIndex(ABC):
+    """
+    Cosine top-k over job vectors, addressed by row position.
+    Backends implement build/add/search and save/load; vectors are L2-normalized
+    on the way in so scores are cosine similarities. search() returns
+    min(top_n, len(index)) rows for every query, so batches stack.
+    """
+
+    backend = "base"
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray) -> "VectorIndex":
+        ...
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray) -> None:
+        ...
+
+    @abstractmethod
+    def search(self, query: np.ndarray, top_n: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, scores) for one query, best first."""
+        ...
+
+    def search_batch(self, queries: np.ndarray, top_n: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, scores) of shape (num_queries, top_n)."""
+        results = [self.search(q, top_n) for q in np.asarray(queries)]
+        return np.stack([r[0] for r in results]), np.stack([r[1] for r in results])
+
+    @abstractmethod
+    def save(self, base_path: str) -> None:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def _write_meta(self, base_path: str, params: dict) -> None:
+        meta = {"backend": self.backend, "count": len(self), "params": params, "created_at": int(time.time())}
+        with open(f"{base_path}.meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+
+def load_index(base_path: str, refine_matrix: Optional[np.ndarray] = None) -> VectorIndex:
+    """Load an index saved with VectorIndex.save, dispatching on the backend in its header."""
+    with open(f"{base_path}.meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["backend"] == ExactIndex.backend:
+        return ExactIndex.load(base_path)
+    if meta["backend"] == IVFPQIndex.backend:
+        return IVFPQIndex.load(base_path, refine_matrix=refine_matrix)
+    raise ValueError(f"Unknown vector index backend: {meta['backend']}")
+
+
+def read_index_meta(base_path: str) -> Optional[dict]:
+    path = f"{base_path}.meta.json"
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# -----------------------------
+# Exact backend
+# -----------------------------
+class ExactIndex(VectorIndex):
+    """Brute-force scan via ScoringKernel; the reference for recall measurements."""
+
+    backend = "exact"
+
+    def __init__(self, matrix: Optional[np.ndarray] = None, normalized: bool = False):
+        self._kernel = ScoringKernel(matrix, normalized=normalized) if matrix is not None else None
+
+    def build(self, vectors: np.ndarray, normalized: bool = False) -> "ExactIndex":
+        self._kernel = ScoringKernel(vectors, normalized=normalized)
+        return self
+
+    def add(self, vectors: np.ndarray) -> None:
+        new_rows = l2_normalize(np.asarray(vectors).reshape(-1, self._kernel.matrix.shape[1]))
+        self._kernel = ScoringKernel(np.concatenate([self._kernel.matrix, new_rows]), normalized=True)
+
+    def search(self, query, top_n=3):
+        return self._kernel.top_k(query, top_n)
+
+    def search_batch(self, queries, top_n=3):
+        return self._kernel.top_k_batch(queries, top_n)
+
+    def save(self, base_path: str) -> None:
+        np.save(f"{base_path}.npy", np.asarray(self._kernel.matrix))
+        self._write_meta(base_path, {})
+
+    @classmethod
+    def load(cls, base_path: str) -> "ExactIndex":
+        return cls(np.load(f"{base_path}.npy", mmap_mode="r"), normalized=True)
+
+    def __len__(self) -> int:
+        return 0 if self._kernel is None else len(self._kernel)
+
+
+# -----------------------------
+# IVF-PQ backend
+# -----------------------------
+def _nearest_centroid(x: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """argmin squared L2 distance, chunked so (rows x k) never gets large."""
+    c_sq = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), chunk):
+        block = x[start : start + chunk]
+        out[start : start + chunk] = np.argmin(c_sq - 2.0 * (block @ centroids.T), axis=1)
+    return out
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest_centroid(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        present = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[present]
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[present] = sums / counts[present, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQIndex(VectorIndex):
+    """
+    Inverted-file index with product-quantized residuals (pure numpy, CPU only).
+
+    A coarse k-means splits the corpus into `nlist` cells; each vector is stored
+    in its cell as `m` one-byte codes of its residual. A query scans the
+    `nprobe` closest cells using per-query lookup tables, then optionally
+    re-scores the best `refine * top_n` candidates exactly against the full
+    matrix (e.g. the memory-mapped embedding store) to recover recall.
+    """
+
+    backend = "ivfpq"
+    KSUB = 256  # centroids per sub-quantizer -> uint8 codes
+
+    def __init__(
+        self,
+        nlist: int = 0,
+        m: int = VECTOR_INDEX_PQ_M,
+        nprobe: int = VECTOR_INDEX_NPROBE,
+        refine: int = VECTOR_INDEX_REFINE,
+        refine_matrix: Optional[np.ndarray] = None,
+    ):
+        self.nlist = nlist
+        self.m = m
+        self.nprobe = nprobe
+        self.refine = refine
+        self.refine_matrix = refine_matrix
+        self.dim = 0
+        self.coarse: Optional[np.ndarray] = None  # (nlist, dim)
+        self.codebooks: Optional[np.ndarray] = None  # (m, KSUB, dim // m)
+        self._list_ids: list = []  # per cell: int64 row positions
+        self._list_codes: list = []  # per cell: uint8 (n, m) codes, or float32 residuals if m == 0
+        self._count = 0
+
+    # -- training / encoding --
+    def build(self, vectors: np.ndarray, sample_size: int = 100_000, seed: int = 0) -> "IVFPQIndex":
+        x = l2_normalize(vectors)
+        n, self.dim = x.shape
+        if self.nlist <= 0:
+            self.nlist = max(1, int(math.sqrt(n)))
+        if self.m and self.dim % self.m:
+            raise ValueError(f"PQ m={self.m} must divide the vector dim {self.dim}")
+
+        rng = np.random.default_rng(seed)
+        sample = x[rng.choice(n, min(n, sample_size), replace=False)]
+        print(f"Training IVF{self.nlist}{f',PQ{self.m}' if self.m else ''} on {len(sample)} vectors...")
+        self.coarse = _kmeans(sample, self.nlist, seed=seed)
+        self.nlist = len(self.coarse)
+
+        if self.m:
+            pq_sample = sample[: self.KSUB * 128]
+            residuals = pq_sample - self.coarse[_nearest_centroid(pq_sample, self.coarse)]
+            dsub = self.dim // self.m
+            self.codebooks = np.stack(
+                [
+                    _kmeans(residuals[:, j * dsub : (j + 1) * dsub], self.KSUB, iters=15, seed=seed + j)
+                    for j in range(self.m)
+                ]
+            )
+
+        self._list_ids = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._list_codes = [self._empty_codes() for _ in range(self.nlist)]
+        self._count = 0
+        self._add_normalized(x)
+        return self
+
+    def _empty_codes(self) -> np.ndarray:
+        if self.m:
+            return np.empty((0, self.m), dtype=np.uint8)
+        return np.empty((0, self.dim), dtype=np.float32)
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        if not self.m:
+            return residuals.astype(np.float32)
+        dsub = self.dim // self.m
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest_centroid(residuals[:, j * dsub : (j + 1) * dsub], self.codebooks[j])
+        return codes
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Append vectors without retraining; they get row positions len(self)...len(self)+n-1."""
+        if self.coarse is None:
+            raise ValueError("Index must be built before vectors can be added")
+        self._add_normalized(l2_normalize(np.asarray(vectors).reshape(-1, self.dim)))
+
+    def _add_normalized(self, x: np.ndarray) -> None:
+        cells = _nearest_centroid(x, self.coarse)
+        codes = self._encode(x - self.coarse[cells])
+        ids = np.arange(self._count, self._count + len(x), dtype=np.int64)
+        for cell in np.unique(cells):
+            mask = cells == cell
+            self._list_ids[cell] = np.concatenate([self._list_ids[cell], ids[mask]])
+            self._list_codes[cell] = np.concatenate([self._list_codes[cell], codes[mask]])
+        self._count += len(x)
+
+    # -- search --
+    def search(self, query, top_n=3):
+        q = l2_normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        coarse_scores = self.coarse @ q
+        # Probe the nprobe closest cells, then keep widening until they hold at least
+        # top_n candidates (small or skewed cells would otherwise return short results)
+        order = np.argsort(-coarse_scores)
+        sizes = np.fromiter((len(self._list_ids[c]) for c in order), dtype=np.int64, count=len(order))
+        needed = min(top_n, self._count)
+        nprobe = max(1, min(self.nprobe, self.nlist))
+        if sizes[:nprobe].sum() < needed:
+            nprobe = int(np.searchsorted(np.cumsum(sizes), needed)) + 1
+        probe = order[:nprobe]
+
+        if self.m:
+            dsub = self.dim // self.m
+            # lut[j, c] = q_j . codebook_j[c]; a code's score is a sum of m lookups
+            lut = np.einsum("jkd,jd->jk", self.codebooks, q.reshape(self.m, dsub))
+            cols = np.arange(self.m)
+
+        cand_ids, cand_scores = [], []
+        for cell in probe:
+            ids = self._list_ids[cell]
+            if not len(ids):
+                continue
+            codes = self._list_codes[cell]
+            if self.m:
+                partial = lut[cols, codes].sum(axis=1)
+            else:
+                partial = codes @ q
+            cand_ids.append(ids)
+            cand_scores.append(coarse_scores[cell] + partial)
+
+        if not cand_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate(cand_ids)
+        scores = np.concatenate(cand_scores).astype(np.float32)
+
+        if self.m and self.refine > 0 and self.refine_matrix is not None:
+            shortlist, _ = select_top_k(scores, top_n * self.refine)
+            order = np.argsort(ids[shortlist])  # sorted row reads are kinder to an mmap
+            ids, scores = ids[shortlist][order], scores[shortlist][order]
+            # rows added after the refine matrix was loaded keep their PQ score
+            known = ids < len(self.refine_matrix)
+            scores[known] = np.asarray(self.refine_matrix[ids[known]]) @ q
+
+        top, top_scores = select_top_k(scores, top_n)
+        return ids[top], top_scores
+
+    # -- persistence --
+    def save(self, base_path: str) -> None:
+        lengths = np.array([len(ids) for ids in self._list_ids], dtype=np.int64)
+        np.savez(
+            f"{base_path}.npz",
+            coarse=self.coarse,
+            codebooks=self.codebooks if self.m else np.empty(0, dtype=np.float32),
+            list_lengths=lengths,
+            ids=np.concatenate(self._list_ids),
+            codes=np.concatenate(self._list_codes),
+        )
+        self._write_meta(base_path, {"nlist": self.nlist, "m": self.m, "dim": self.dim})
+
+    @classmethod
+    def load(cls, base_path: str, refine_matrix: Optional[np.ndarray] = None) -> "IVFPQIndex":
+        with open(f"{base_path}.meta.json", encoding="utf-8") as f:
+            params = json.load(f)["params"]
+        data = np.load(f"{base_path}.npz")
+        index = cls(nlist=params["nlist"], m=params["m"], refine_matrix=refine_matrix)
+        index.dim = params["dim"]
+        index.coarse = data["coarse"]
+        index.codebooks = data["codebooks"] if index.m else None
+        bounds = np.concatenate([[0], np.cumsum(data["list_lengths"])])
+        ids, codes = data["ids"], data["codes"]
+        index._list_ids = [ids[bounds[i] : bounds[i + 1]] for i in range(index.nlist)]
+        index._list_codes = [codes[bounds[i] : bounds[i + 1]] for i in range(index.nlist)]
+        index._count = int(bounds[-1])
+        return index
+
+    def __len__(self) -> int:
+        return self._count
+
+
+# -----------------------------
+# Recall measurement
+# -----------------------------
+def measure_recall(
+    index: VectorIndex,
+    exact: VectorIndex,
+    queries: np.ndarray,
+    top_n: int = 10,
+) -> Tuple[float, float]:
+    """
+    Recall@top_n of `index` against the exact scan over `queries`,
+    plus the p99 search latency of `index` in milliseconds.
+    """
+    hits, latencies = 0, []
+    for q in np.asarray(queries):
+        start = time.perf_counter()
+        got, _ = index.search(q, top_n)
+        latencies.append((time.perf_counter() - start) * 1000)
+        want, _ = exact.search(q, top_n)
+        hits += len(np.intersect1d(got, want))
+    recall = hits / (len(queries) * top_n) if len(queries) else 1.0
+    return recall, float(np.percentile(latencies, 99)) if latencies else 0.0
+
+
+def choose_backend(num_rows: int, backend: str = VECTOR_INDEX_BACKEND) -> str:
+    if backend == "auto":
+        return IVFPQIndex.backend if num_rows >= VECTOR_INDEX_ANN_THRESHOLD else ExactIndex.backend
+    return backend
@@ -0,0 +1,37 @@
+"""
+Parity of the optimized encoder backends against full-precision torch: the
+same check as benchmarks/bench_encoder_backends.py, on a smaller sample.
+Needs onnxruntime, torch and the model weights (downloaded on first run).
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from benchmarks.bench_encoder_backends import HF_MODEL_NAME, _sample_texts  # noqa: E402
+from services.embedding_store import l2_normalize  # noqa: E402
+from services.encoder_backends import load_encoder, parse_backend_spec  # noqa: E402
+
+MIN_COSINE = 0.99
+
+
+@pytest.fixture(scope="module")
+def texts():
+    return _sample_texts(32, "data")
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    return l2_normalize(load_encoder(HF_MODEL_NAME, "torch", "none").encode(texts))
+
+
+@pytest.mark.parametrize("spec", ["onnx", "onnx:int8", "torch:int8"])
+def test_backend_matches_torch(spec, texts, reference):
+    backend, quantize = parse_backend_spec(spec)
+    embeddings = l2_normalize(load_encoder(HF_MODEL_NAME, backend, quantize).encode(texts))
+
+    cosines = np.sum(embeddings * reference, axis=1)
+
+    assert cosines.min() >= MIN_COSINE, f"{spec}: min cosine {cosines.min():.4f}"
@@ -0,0 +1,107 @@
+"""
+services.enrichment_pipeline against a local fake OpenAI client: transient
+429s are retried by the LLM gateway, finished jobs are checkpointed to the
+SQLite store, and a re-run resumes without calling the model for them again.
+"""
+import asyncio
+import csv
+import random
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from services import llm_gateway, prompt_cache
+from services.enrichment_pipeline import run_pipeline
+from services.job_corpus import CLASSIFICATION_COLUMN, DESCRIPTION_COLUMN, TITLE_COLUMN
+from services.job_enrichment import EnrichmentCache
+
+WORDS = "python sql react docker kubernetes pandas airflow spark terraform java golang rust kafka redis".split()
+NUM_JOBS = 5
+
+
+class FakeCompletions:
+    """chat.completions stand-in: the first attempt of every prompt gets a 429, retries succeed."""
+
+    def __init__(self, fail_first_attempt: bool = True, broken_job: str = ""):
+        self.fail_first_attempt = fail_first_attempt
+        self.broken_job = broken_job
+        self.calls = 0
+        self.rate_limited = 0
+        self._seen = set()
+
+    async def create(self, messages, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        if self.fail_first_attempt and prompt not in self._seen:
+            self._seen.add(prompt)
+            self.rate_limited += 1
+            response = httpx.Response(429, request=httpx.Request("POST", "http://fake/v1/chat/completions"))
+            raise openai.RateLimitError("rate limited (fake)", response=response, body=None)
+        if self.broken_job and self.broken_job in prompt:
+            raise ValueError("unparseable completion (fake)")
+        text = "Python, SQL, Communication" if "EXTRACT" in prompt else "Builds data pipelines."
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    def install(**kwargs):
+        fake = FakeCompletions(**kwargs)
+        monkeypatch.setattr(llm_gateway, "client", SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+        return fake
+
+    monkeypatch.setattr(llm_gateway, "LLM_BACKOFF_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(llm_gateway, "LLM_DEADLINE_SECONDS", 0)
+    monkeypatch.setattr(prompt_cache, "PROMPT_CACHE_ENABLED", False)
+    return install
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = random.Random(0)
+    folder = tmp_path / "jobs"
+    folder.mkdir()
+    with open(folder / "jobs.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow((TITLE_COLUMN, CLASSIFICATION_COLUMN, DESCRIPTION_COLUMN))
+        for i in range(NUM_JOBS):
+            body = " ".join(rng.choice(WORDS) for _ in range(60))
+            writer.writerow((f"Engineer {i}", "Information & Communication Technology", f"JOB-{i} {body}"))
+    return str(folder)
+
+
+async def _call_llm(prompt: str, max_tokens: int = 2000, kind: str = "generic") -> str:
+    return await llm_gateway.complete(prompt, system="test", max_tokens=max_tokens, kind=kind)
+
+
+def _run(corpus: str, cache: EnrichmentCache) -> dict:
+    return asyncio.run(run_pipeline(_call_llm, folder_path=corpus, cache=cache, concurrency=2, checkpoint_every=2))
+
+
+def test_pipeline_retries_checkpoints_and_resumes(corpus, tmp_path, fake_openai):
+    cache = EnrichmentCache(str(tmp_path / "enrichment.sqlite"))
+
+    # First run: every prompt is rate-limited once, and one job never succeeds
+    fake = fake_openai(broken_job="JOB-3 ")
+    first = _run(corpus, cache)
+
+    assert first == {"total": NUM_JOBS, "enriched": NUM_JOBS - 1, "skipped": 0, "failed": 1}
+    assert fake.rate_limited == 3 * NUM_JOBS  # each of the 3 prompts per job hit a 429 first...
+    assert fake.calls == 2 * 3 * NUM_JOBS  # ...and was retried once
+    assert len(cache.known_hashes()) == NUM_JOBS - 1  # finished jobs were checkpointed
+
+    # Second run: only the failed job is sent to the model
+    fake = fake_openai(fail_first_attempt=False)
+    second = _run(corpus, cache)
+
+    assert second == {"total": NUM_JOBS, "enriched": 1, "skipped": NUM_JOBS - 1, "failed": 0}
+    assert fake.calls == 3
+    assert len(cache.known_hashes()) == NUM_JOBS
+
+    # Third run: nothing left to do, the model is never called
+    fake = fake_openai(fail_first_attempt=False)
+    assert _run(corpus, cache)["enriched"] == 0
+    assert fake.calls == 0
@@ -0,0 +1,52 @@
+"""
+services.job_corpus deduplication: near-duplicate postings are folded together,
+but missing, stub and boilerplate descriptions never merge distinct jobs.
+"""
+import csv
+import random
+
+from services.job_corpus import CLASSIFICATION_COLUMN, DESCRIPTION_COLUMN, TITLE_COLUMN, load_jobs
+
+WORDS = "python sql react docker kubernetes pandas airflow spark terraform java golang rust kafka redis".split()
+STUB = "Apply for this job Cognite Home Page Jobs powered by"
+
+
+def _write_corpus(folder, rows):
+    folder.mkdir()
+    with open(folder / "jobs.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow((TITLE_COLUMN, CLASSIFICATION_COLUMN, DESCRIPTION_COLUMN))
+        for title, desc in rows:
+            writer.writerow((title, "Information & Communication Technology", desc))
+    return str(folder)
+
+
+def test_missing_and_boilerplate_descriptions_are_not_near_duplicates(tmp_path):
+    rng = random.Random(0)
+    body = " ".join(rng.choice(WORDS) for _ in range(200))
+    folder = _write_corpus(
+        tmp_path / "jobs",
+        [
+            ("Web Development Sr. Specialist", ""),
+            ("Mandarin Speaking Business Development Manager - PJ", ""),
+            ("Mandarin Speaking Business Development Manager - PJ", ""),  # exact duplicate
+            ("Senior Data Engineer", STUB),
+            ("Machine Learning Engineer", STUB),
+            ("Backend Developer", body),
+            ("Backend Developer (Remote)", body + " apply now"),  # re-post: merged
+            ("Accounts Payable Executive", body),  # same text, unrelated title: kept
+        ],
+    )
+
+    store, sources, report = load_jobs(folder)
+
+    assert sorted(store.titles) == [
+        "Accounts Payable Executive",
+        "Backend Developer",
+        "Machine Learning Engineer",
+        "Mandarin Speaking Business Development Manager - PJ",
+        "Senior Data Engineer",
+        "Web Development Sr. Specialist",
+    ]
+    assert report == {"rows": 8, "exact_duplicates": 1, "near_duplicates": 1, "unique": 6}
+    assert sorted(len(rows) for rows in sources.values()) == [1, 1, 1, 1, 2, 2]
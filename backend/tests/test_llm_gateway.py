@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import llm_gateway, openai_service, prompt_cache
+
+
+class FakeCompletions:
+    def __init__(self, content="ok"):
+        self.content = content
+        self.calls = []
+
+    async def create(self, messages, stream=False, **kwargs):
+        # Record the deadline every upstream call runs under
+        self.calls.append((messages[-1]["content"], llm_gateway._deadline.get()))
+        if stream:
+            raise ValueError("streaming unavailable (fake)")
+        message = SimpleNamespace(content=self.content, refusal="I can't help with that" if self.content is None else None)
+        choice = SimpleNamespace(message=message, finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=None)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    completions = FakeCompletions()
+    monkeypatch.setattr(llm_gateway, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(prompt_cache, "PROMPT_CACHE_ENABLED", False)
+    return completions
+
+
+def test_missing_content_raises_without_retry(fake):
+    fake.content = None
+
+    with pytest.raises(llm_gateway.EmptyCompletion, match="can't help"):
+        asyncio.run(llm_gateway.complete("hello", system="test", kind="generic"))
+
+    assert len(fake.calls) == 1
+
+
+def test_identical_concurrent_calls_share_one_request(fake):
+    async def burst():
+        return await asyncio.gather(*[llm_gateway.complete("same", system="test") for _ in range(5)])
+
+    assert asyncio.run(burst()) == ["ok"] * 5
+    assert len(fake.calls) == 1
+
+
+def test_stream_questions_fallback_runs_under_the_question_deadline(fake, monkeypatch):
+    monkeypatch.setattr(openai_service, "QUESTION_GENERATION_MODE", "single")
+    fake.content = "None"  # topics/language "None": only the non-coding branch runs
+
+    async def consume():
+        return [event async for event in openai_service.stream_questions("I like SQL")]
+
+    asyncio.run(consume())
+
+    # The failed single-shot stream and every pipeline call share one deadline
+    deadlines = {deadline for _, deadline in fake.calls}
+    assert len(fake.calls) > 1 and len(deadlines) == 1 and None not in deadlines
@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+pytest.importorskip("aiosqlite")
+
+from core.database import Base  # noqa: E402
+from services import question_bank  # noqa: E402
+from services.embedding_store import l2_normalize  # noqa: E402
+
+
+def _mcqs(category: str, n: int, tag: str) -> list:
+    return [
+        {"question": f"{tag} {category} {i}", "options": ["a", "b", "c", "d"], "answer": "a",
+         "difficulty": "Medium", "category": category}
+        for i in range(n)
+    ]
+
+
+def _result(language: str, tag: str) -> dict:
+    coding = _mcqs("Coding", 5, tag) if language != "None" else []
+    return {"topics": "python", "primary_language": language, "questions": coding + _mcqs("Non-coding", 10, tag)}
+
+
+async def _scenario():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    base = l2_normalize(np.random.default_rng(0).standard_normal(16).astype(np.float32))
+    near = l2_normalize(base + 0.01)
+    try:
+        async with session_factory() as db:
+            await question_bank._store_set(db, base, _result("Python", "py"))
+            await question_bank._store_set(db, near, _result("Java", "java"))
+            await db.commit()
+
+            served = await question_bank._serve_from_bank(db, base)
+            await db.commit()
+            # A new set for an unrelated reflection is found without a reload
+            other = l2_normalize(np.random.default_rng(1).standard_normal(16).astype(np.float32))
+            await question_bank._store_set(db, other, _result("None", "other"))
+            await db.commit()
+            found_other = await question_bank._similar_sets(db, other)
+        return served, found_other
+    finally:
+        await engine.dispose()
+
+
+def test_bank_pools_one_language_and_tracks_new_sets(monkeypatch):
+    monkeypatch.setitem(question_bank._index, "loaded_at", None)
+
+    served, found_other = asyncio.run(_scenario())
+
+    coding = [q["question"] for q in served["questions"] if q["category"] == "Coding"]
+    assert len(coding) == question_bank.CODING_QUESTIONS
+    assert all(q.startswith("py ") for q in coding)
+    assert served["primary_language"] == "Python"
+    assert [s.primary_language for s in found_other] == ["None"]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from services.vector_index import ExactIndex, IVFPQIndex, VectorIndex
+
+
+def _vectors(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_vector_index_is_abstract():
+    with pytest.raises(TypeError):
+        VectorIndex()
+
+
+@pytest.mark.parametrize("m", [0, 4])
+def test_ivfpq_search_batch_fills_top_n_when_probed_cells_are_small(m):
+    # 300 vectors over 64 cells: one probed cell holds ~5 candidates, fewer than top_n
+    vectors = _vectors(300)
+    index = IVFPQIndex(nlist=64, m=m, nprobe=1, refine_matrix=vectors).build(vectors)
+    queries = _vectors(20, seed=1)
+
+    ids, scores = index.search_batch(queries, top_n=10)
+
+    assert ids.shape == (20, 10) and scores.shape == (20, 10)
+    for row in ids:
+        assert len(set(row.tolist())) == 10
+
+
+def test_ivfpq_search_caps_at_index_size():
+    vectors = _vectors(8)
+    index = IVFPQIndex(nlist=4, m=0, nprobe=1).build(vectors)
+
+    ids, _ = index.search_batch(_vectors(3, seed=1), top_n=20)
+
+    assert ids.shape == (3, 8)
+
+
+def test_exact_and_ivf_flat_agree_with_full_probe():
+    vectors = _vectors(200)
+    exact = ExactIndex(vectors)
+    ivf = IVFPQIndex(nlist=8, m=0, nprobe=8).build(vectors)
+    query = _vectors(1, seed=2)[0]
+
+    assert set(exact.search(query, 5)[0].tolist()) == set(ivf.search(query, 5)[0].tolist())